@@ -1,42 +1,31 @@
 """data process"""
 import os
-import pickle
 
 import numpy as np
 
+from mindaudio.data.feature_store import FeatureStore
+
 np.random.seed(58)
 
 
 class DatasetGeneratorBatchEval:
     def __init__(self, data_path, read_limit=5000000):
-        self.batchlist = []
-        self.index_sample = {}
-        self.memmaps_sample = {}
-        self.memmaps_label = {}
         self.reads = 0
         self.read_limit = read_limit
-        dataset_index = pickle.load(open(os.path.join(data_path, "ind_sample.p"), "rb"))
-        for utterance, (file_ind, offset, length) in dataset_index.items():
-            file_path = os.path.join(data_path, f"{file_ind}.npy")
-            self.index_sample[utterance] = (file_path, offset, length)
-            self.batchlist.append(utterance)
+        self.store_sample = FeatureStore(os.path.join(data_path, "fea"))
+        self.batchlist = self.store_sample.keys.tolist()
 
     def __getitem__(self, index):
         utt = self.batchlist[index]
-        utt_path, offset_utt, length_utt = self.index_sample[utt]
-        if utt_path not in self.memmaps_sample:
-            self.memmaps_sample[utt_path] = np.load(utt_path, mmap_mode="r")
         self.reads += 1
         if self.reads >= self.read_limit:
             self.flush_memmaps()
-        fea = self.memmaps_sample[utt_path][offset_utt : offset_utt + length_utt]
+        fea = self.store_sample[index]
         label = utt
         return fea.reshape((1, 301, 80)), label
 
     def flush_memmaps(self):
-        for file_path in self.memmaps_sample:
-            self.memmaps_sample[file_path] = None
-            self.memmaps_sample[file_path] = np.load(file_path, mmap_mode="r")
+        self.store_sample.close()
         self.reads = 0
 
     def __len__(self):
@@ -98,54 +87,31 @@ class DatasetGeneratorTrain:
 class DatasetGeneratorBatch:
     def __init__(self, data_paths, read_limit=5000000):
         self.batchlist = []
-        self.index_sample = {}
-        self.index_label = {}
-        self.memmaps_sample = {}
-        self.memmaps_label = {}
+        self.stores_sample = []
+        self.stores_label = []
         self.reads = 0
         self.read_limit = read_limit
         if isinstance(data_paths, str):
             data_paths = [data_paths]
-        for data_path in data_paths:
-            dataset_index = pickle.load(
-                open(os.path.join(data_path, "ind_sample.p"), "rb")
-            )
-            local_batchlist = []
-            for utterance, (file_ind, offset, length) in dataset_index.items():
-                file_path = os.path.join(data_path, f"{file_ind}.npy")
-                self.index_sample[utterance] = (file_path, offset, length)
-                local_batchlist.append(utterance)
-            label_index = pickle.load(
-                open(os.path.join(data_path, "ind_label.p"), "rb")
-            )
-            for utterance, (file_ind, offset, length) in label_index.items():
-                file_path = os.path.join(data_path, f"{file_ind}_label.npy")
-                self.index_label[utterance] = (file_path, offset, length)
-            local_batchlist.sort()
-            self.batchlist += local_batchlist
+        for store_ind, data_path in enumerate(data_paths):
+            store_sample = FeatureStore(os.path.join(data_path, "fea"))
+            self.stores_sample.append(store_sample)
+            self.stores_label.append(FeatureStore(os.path.join(data_path, "label")))
+            # keys of a store are sorted
+            self.batchlist += [(store_ind, utt) for utt in store_sample.keys.tolist()]
 
     def __getitem__(self, index):
-        utt = self.batchlist[index]
-        utt_path, offset_utt, length_utt = self.index_sample[utt]
-        label_path, offset_l, length_l = self.index_label[utt]
-        if utt_path not in self.memmaps_sample:
-            self.memmaps_sample[utt_path] = np.load(utt_path, mmap_mode="r")
-        if label_path not in self.memmaps_label:
-            self.memmaps_label[label_path] = np.load(label_path, mmap_mode="r")
+        store_ind, utt = self.batchlist[index]
         self.reads += 1
         if self.reads >= self.read_limit:
             self.flush_memmaps()
-        fea = self.memmaps_sample[utt_path][offset_utt : offset_utt + length_utt]
-        label = self.memmaps_label[label_path][offset_l : offset_l + length_l]
+        fea = self.stores_sample[store_ind][utt]
+        label = self.stores_label[store_ind][utt]
         return fea.reshape((-1, 301, 80)), label
 
     def flush_memmaps(self):
-        for file_path in self.memmaps_sample:
-            self.memmaps_sample[file_path] = None
-            self.memmaps_sample[file_path] = np.load(file_path, mmap_mode="r")
-        for label_path in self.memmaps_label:
-            self.memmaps_label[label_path] = None
-            self.memmaps_label[label_path] = np.load(label_path, mmap_mode="r")
+        for store in self.stores_sample + self.stores_label:
+            store.close()
         self.reads = 0
 
     def __len__(self):
@@ -11,7 +11,6 @@ import wget
 from mindspore import Tensor, context, load_checkpoint, load_param_into_net
 from reader import DatasetGenerator
 from scipy.spatial.distance import cosine
-from sklearn.metrics.pairwise import cosine_similarity
 from spec_augment import InputNormalization
 from voxceleb_prepare import prepare_voxceleb
 
@@ -19,6 +18,7 @@ import mindaudio.data.io as io
 from mindaudio.data.features import fbank
 from mindaudio.data.processing import stereo_to_mono
 from mindaudio.metric.eer import get_eer_from_scores
+from mindaudio.metric.scoring import cosine_scoring
 from mindaudio.models.ecapatdnn import EcapaTDNN
 from mindaudio.utils.config import config as hparams
 
@@ -575,82 +575,32 @@ def evaluate2(spk2emb, utt2emb, norm_dict, params, trials):
     if norm_dict is not None:
         train_cohort = norm_dict
         print("train_cohort shape:", train_cohort.shape)
-    positive_scores = []
-    negative_scores = []
+    labels, pairs = [], []
     with open(trials, "r") as f:
-        lines = f.readlines()
-        print_dur = 100
-        for idx_c, trial in enumerate(lines):
-            if idx_c % print_dur == 0:
-                print(
-                    f"{datetime.datetime.now()}, \
-                    processing {idx_c}/{len(lines)}"
-                )
-            trial = trial.strip()
-            label, spk_utt, test_utt = trial.split(" ")
-            spk_utt = spk_utt[:-4]
-            test_utt = test_utt[:-4]
-            enrol = spk2emb[spk_utt]
-            test = utt2emb[test_utt]
-            if train_cohort is not None:
-                score_e_c = cosine_similarity(enrol.reshape(1, -1), train_cohort)
-                score_e_c = np.squeeze(score_e_c)
-                if hasattr(params, "cohort_size"):
-                    score_e_c = np.partition(score_e_c, kth=-params.cohort_size)[
-                        -params.cohort_size :
-                    ]
-                mean_e_c = np.mean(score_e_c)
-                std_e_c = np.std(score_e_c)
-                # Getting norm stats for test impostors
-                score_t_c = cosine_similarity(test.reshape(1, -1), train_cohort)
-                score_t_c = np.squeeze(score_t_c)
-                if hasattr(params, "cohort_size"):
-                    score_t_c = np.partition(score_t_c, kth=-params.cohort_size)[
-                        -params.cohort_size :
-                    ]
-                mean_t_c = np.mean(score_t_c)
-                std_t_c = np.std(score_t_c)
-            # Compute the score for the given sentence
-            score = cosine_similarity(enrol.reshape(1, -1), test.reshape(1, -1)).item()
-            # Perform score normalization
-            if hasattr(params, "score_norm"):
-                if params.score_norm == "z-norm":
-                    score = (score - mean_e_c) / std_e_c
-                elif params.score_norm == "t-norm":
-                    score = (score - mean_t_c) / std_t_c
-                elif params.score_norm == "s-norm":
-                    score_e = (score - mean_e_c) / std_e_c
-                    score_t = (score - mean_t_c) / std_t_c
-                    score = 0.5 * (score_e + score_t)
-            if label == "1":
-                positive_scores.append(score)
-            else:
-                negative_scores.append(score)
-    return positive_scores, negative_scores
+        for trial in f:
+            label, spk_utt, test_utt = trial.strip().split(" ")
+            labels.append(label == "1")
+            pairs.append((spk_utt[:-4], test_utt[:-4]))
+    print(f"{datetime.datetime.now()}, scoring {len(pairs)} trials")
+    score_norm = None
+    if train_cohort is not None and hasattr(params, "score_norm"):
+        score_norm = params.score_norm
+    scores = cosine_scoring(
+        spk2emb,
+        utt2emb,
+        pairs,
+        cohort=train_cohort,
+        score_norm=score_norm,
+        cohort_size=getattr(params, "cohort_size", None),
+    )
+    labels = np.array(labels)
+    return scores[labels].tolist(), scores[~labels].tolist()
 
 
 def EER(pos_arr, neg_arr):
-    thresholds = np.sort(np.concatenate((pos_arr, neg_arr)))
-    thresholds = np.unique(thresholds)
-
-    interm_thresholds = (thresholds[0:-1] + thresholds[1:]) / 2
-    thresholds = np.sort(np.concatenate((thresholds, interm_thresholds)))
-    pos_scores = np.repeat(np.expand_dims(pos_arr, 0), len(thresholds), axis=0)
-    pos_scores_threshold = np.transpose(pos_scores) <= thresholds
-    FRR = (pos_scores_threshold.sum(0)) / pos_scores.shape[1]
-    del pos_scores
-    del pos_scores_threshold
-
-    neg_scores = np.repeat(np.expand_dims(neg_arr, 0), len(thresholds), axis=0)
-    neg_scores_threshold = np.transpose(neg_scores) > thresholds
-    FAR = (neg_scores_threshold.sum(0)) / neg_scores.shape[1]
-    del neg_scores
-    del neg_scores_threshold
-    # Finding the threshold for EER
-    min_index = np.argmin(np.absolute(FAR - FRR))
-    # It is possible that eer != fpr != fnr. We return (FAR  + FRR) / 2 as EER.
-    equal_error_rate = (FAR[min_index] + FRR[min_index]) / 2
-    return equal_error_rate
+    scores = np.concatenate((pos_arr, neg_arr))
+    labels = np.concatenate((np.ones(len(pos_arr)), np.zeros(len(neg_arr))))
+    return get_eer_from_scores(scores, labels)[0]
 
 
 def emb_mean(g_mean, increment, emb_dict):
@@ -6,6 +6,7 @@ import numpy as np
 import wget
 
 import mindaudio.data.io as io
+from mindaudio.data.audio_bank import NoiseBank, RIRBank
 from mindaudio.data.augment import (
     add_babble,
     add_noise,
@@ -70,6 +71,14 @@ class InputNormalization:
         return current_mean, current_std
 
 
+def read_wav_list(csv_file):
+    """The sorted wav paths of a csv file."""
+    dataset = ms.dataset.CSVDataset(dataset_files=csv_file, shuffle=False)
+    dataset = dataset.project(columns=["wav"])
+    iterator = dataset.create_dict_iterator(num_epochs=1, output_numpy=True)
+    return sorted(str(batch["wav"]) for batch in iterator)
+
+
 class AddNoise:
     """
     This class additively combines a noise signal to the input signal.
@@ -98,15 +107,12 @@ class AddNoise:
         self.mix_prob = mix_prob
         self.start_index = start_index
         self.normalize = normalize
-        self.noise_data = []
-        noise_dataset = ms.dataset.CSVDataset(dataset_files=self.csv_file, shuffle=True)
-        noise_dataset = noise_dataset.project(columns=["wav"])
-
-        iterator = noise_dataset.create_dict_iterator(num_epochs=1)
-
-        for batch in iterator:
-            wav_file = batch["wav"]
-            self.noise_data.append(str(wav_file))
+        # the noises are loaded and normalized once, next to the csv file
+        self.noise_data = NoiseBank.build(
+            os.path.splitext(self.csv_file)[0] + "_bank",
+            read_wav_list(self.csv_file),
+            num_workers=max(1, num_workers),
+        )
 
     def construct(self, waveforms):
         noisy_waveform = add_noise(
@@ -135,15 +141,9 @@ class AddReverb:
     ):
         self.csv_file = csv_file
         self.reverb_prob = reverb_prob
-        self.rir_data = []
-        rir_dataset = ms.dataset.CSVDataset(dataset_files=self.csv_file, shuffle=True)
-        rir_dataset = rir_dataset.project(columns=["wav"])
-
-        iterator = rir_dataset.create_dict_iterator(num_epochs=1)
-
-        for batch in iterator:
-            wav_file = batch["wav"]
-            self.rir_data.append(str(wav_file))
+        self.rir_data = RIRBank.build(
+            os.path.splitext(self.csv_file)[0] + "_bank", read_wav_list(self.csv_file)
+        )
 
     def construct(self, waveforms):
         rev_waveform = add_reverb(waveforms, self.rir_data, self.reverb_prob)
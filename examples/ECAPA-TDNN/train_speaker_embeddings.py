@@ -3,7 +3,6 @@ Recipe for training speaker embeddings using the VoxCeleb Dataset.
 """
 import math
 import os
-import pickle
 import random
 import time
 from datetime import datetime
@@ -30,6 +29,7 @@ from sampler import DistributedSampler
 from spec_augment import EnvCorrupt, InputNormalization, TimeDomainSpecAugment
 
 import mindaudio.data.io as io
+from mindaudio.data.feature_store import write_feature_store
 from mindaudio.data.features import fbank
 from mindaudio.data.processing import stereo_to_mono
 from mindaudio.data.voxceleb import prepare_voxceleb
@@ -101,69 +101,12 @@ def dataio_prep():
     return train_datalist
 
 
-def preprocess_raw_new(
-    fidx,
-    fea_utt_lst,
-    label_utt_lst,
-    samples_dict_global,
-    labels_dict_global,
-    output_path,
-):
-    """merge single files into one
-
-    :param samples_per_file: Number of samples per file
-    :return: None
-    """
-    # initialize
-    samples = []
-    labels = []
-    samples_dict = {}
-    labels_dict = {}
-    offset = 0
-    offset_label = 0
-    file_ind = fidx
-    count = 0
-    interval = 500
-    for fea_path, label_path in zip(fea_utt_lst, label_utt_lst):
-        fea = np.load(fea_path)
-        label = np.load(label_path)
-        nplabel = None
-        if label.shape[0] != fea.shape[0]:
-            print("shape not same：", label.shape[0], "!=", fea.shape[0])
-            break
-        else:
-            nplabel = label.squeeze()
-        fea_flat = fea.flatten()
-        utt = fea_path[fea_path.rfind("/") + 1 :]
-        samples_dict[utt[utt.rfind("/") + 1 :]] = (
-            file_ind,
-            offset,
-            fea_flat.shape[0],
-        )
-        labels_dict[utt[utt.rfind("/") + 1 :]] = (
-            file_ind,
-            offset_label,
-            nplabel.shape[0],
-        )
-        samples.append(fea_flat)
-        labels.append(nplabel)
-        offset += fea_flat.shape[0]
-        offset_label += nplabel.shape[0]
-        count += 1
-        if count % interval == 0:
-            print("process", fidx, count)
-
-    labels = np.hstack(labels)
-    np.save(os.path.join(output_path, f"{file_ind}_label.npy"), labels)
-    samples = np.hstack(samples)
-    np.save(os.path.join(output_path, f"{file_ind}.npy"), samples)
-    print("save to", os.path.join(output_path))
-    samples_dict_global.update(samples_dict)
-    labels_dict_global.update(labels_dict)
-    print("process", fidx, "done")
+def load_label(label_path):
+    return np.load(label_path).reshape(-1)
 
 
 def data_trans_dp(datasetPath, dataSavePath):
+    """pack the per-utterance feature and label files into feature stores"""
     if not os.path.exists(dataSavePath):
         os.makedirs(dataSavePath)
     fea_lst = os.path.join(datasetPath, "fea.lst")
@@ -190,57 +133,25 @@ def data_trans_dp(datasetPath, dataSavePath):
         label_utt_lst_new.append(label_utt_lst[idx])
 
     print(len(fea_utt_lst_new), len(label_utt_lst_new))
-    fea_utt_lst = fea_utt_lst_new
-    label_utt_lst = label_utt_lst_new
+    utts = [os.path.basename(fea_path) for fea_path in fea_utt_lst_new]
 
     samples_per_file = 4000
-    total_process_num = math.ceil(len(fea_utt_lst) / samples_per_file)
-    print(
-        "samples_per_file, total_process_num:",
-        samples_per_file,
-        total_process_num,
-    )
-    samples_dict = Manager().dict()
-    labels_dict = Manager().dict()
-
     thread_num = 4
     print(datetime.now().strftime("%m-%d-%H:%M:%S"))
-    batchnum = math.ceil(total_process_num / thread_num)
-    print("batch num:", batchnum)
-    for batchid in range(batchnum):
-        threadlist = []
-        for idx in range(thread_num):
-            start = (batchid * thread_num + idx) * samples_per_file
-            end = (batchid * thread_num + idx + 1) * samples_per_file
-            if start >= len(fea_utt_lst):
-                break
-            if end > len(fea_utt_lst):
-                end = len(fea_utt_lst)
-            print(batchid * thread_num + idx, "start, end:", start, end)
-            p = Process(
-                target=preprocess_raw_new,
-                args=(
-                    batchid * thread_num + idx,
-                    fea_utt_lst[start:end],
-                    label_utt_lst[start:end],
-                    samples_dict,
-                    labels_dict,
-                    dataSavePath,
-                ),
-            )
-            p.start()
-            threadlist.append(p)
-        for p in threadlist:
-            p.join()
-    print(datetime.now().strftime("%m-%d-%H:%M:%S"))
-    pickle.dump(
-        dict(samples_dict),
-        open(os.path.join(dataSavePath, "ind_sample.p"), "wb"),
+    write_feature_store(
+        os.path.join(dataSavePath, "fea"),
+        zip(utts, fea_utt_lst_new),
+        num_workers=thread_num,
+        shard_size=samples_per_file,
     )
-    pickle.dump(
-        dict(labels_dict),
-        open(os.path.join(dataSavePath, "ind_label.p"), "wb"),
+    write_feature_store(
+        os.path.join(dataSavePath, "label"),
+        zip(utts, label_utt_lst_new),
+        load_label,
+        num_workers=thread_num,
+        shard_size=samples_per_file,
     )
+    print(datetime.now().strftime("%m-%d-%H:%M:%S"))
 
 
 def create_dataset(cfg, data_home, shuffle=False):
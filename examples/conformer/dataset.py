@@ -1,7 +1,9 @@
 """ASR Training Data Generator."""
 
 import codecs
+import collections
 import csv
+import functools
 import math
 import multiprocessing as mp
 import os
@@ -12,6 +14,8 @@ import mindspore.dataset.engine as de
 import numpy as np
 
 import mindaudio
+from mindaudio.data.augment import SpecAugment
+from mindaudio.data.features import FeatureExtractor
 from mindaudio.utils.common import IGNORE_ID, add_sos_eos, pad_sequence
 from mindaudio.utils.distributed import DistributedSampler
 from mindaudio.utils.log import get_logger
@@ -53,181 +57,220 @@ def get_waveform(batch, sample_rate=16000):
     return sorted_uttids, sorted_wavs, sorted_lengths, sorted_labels
 
 
-def inverse_mel_scale(mel_freq):
-    return 700.0 * (np.exp(mel_freq / 1127.0) - 1.0)
-
-
-def mel_scale(freq):
-    return 1127.0 * np.log(1.0 + freq / 700.0)
-
-
-def mel_scale_scalar(freq: float) -> float:
-    return 1127.0 * math.log(1.0 + freq / 700.0)
-
-
-def get_mel_banks(
-    num_bins: int,
-    window_length_padded: int,
-    sample_freq: float,
-    low_freq: float,
-    high_freq: float,
-):
-    """Get mel banks for extracting features.
-
-    Args:
-        num_bins (int): number of mel bins.
-        window_length_padded (int): length of windows to split frame.
-        sample_freq (int): sample rate of audios.
-        low_freq (float): lowest frequency.
-        high_freq (float): highest frequency.
-    """
-
-    num_fft_bins = window_length_padded // 2
-
-    # fft-bin width [think of it as Nyquist-freq / half-window-length]
-    fft_bin_width = sample_freq / window_length_padded
-    mel_low_freq = mel_scale_scalar(low_freq)
-    mel_high_freq = mel_scale_scalar(high_freq)
-
-    # divide by num_bins+1 in next line because of end-effects where the bins
-    # spread out to the sides.
-    mel_freq_delta = (mel_high_freq - mel_low_freq) / (num_bins + 1)
-
-    bins = np.arange(num_bins).reshape(-1, 1)
-    left_mel = mel_low_freq + bins * mel_freq_delta  # size(num_bins, 1)
-    center_mel = mel_low_freq + (bins + 1.0) * mel_freq_delta  # size(num_bins, 1)
-    right_mel = mel_low_freq + (bins + 2.0) * mel_freq_delta  # size(num_bins, 1)
-
-    center_freqs = inverse_mel_scale(center_mel)  # size (num_bins)
-    # size(1, num_fft_bins)
-    # mel = mel_scale(fft_bin_width * np.arange(num_fft_bins)).unsqueeze(0)
-    mel = np.expand_dims(mel_scale(fft_bin_width * np.arange(num_fft_bins)), 0)
-    # size (num_bins, num_fft_bins)
-    up_slope = (mel - left_mel) / (center_mel - left_mel)
-    down_slope = (right_mel - mel) / (right_mel - center_mel)
-    # left_mel < center_mel < right_mel so we can min the two slopes and clamp negative values
-    feat = np.where(up_slope > down_slope, down_slope, up_slope)
-    feat = np.where(feat < 0, 0, feat)
-    feat = np.pad(feat, ((0, 0), (0, 1)), "constant")
-
-    return feat, center_freqs
-
+@functools.lru_cache(maxsize=8)
+def _fbank_extractor(sample_rate, frame_len, frame_shift, mel_bin):
+    """Kaldi-style fbank extractor, built once per configuration."""
+    return FeatureExtractor(
+        sample_rate,
+        n_fft=512,
+        win_length=sample_rate * frame_len // 1000,
+        hop_length=sample_rate * frame_shift // 1000,
+        window="povey",
+        n_mels=mel_bin,
+        f_min=20,
+        f_max=8000,
+        mel_scale="kaldi",
+        preemphasis=0.97,
+        remove_dc_offset=True,
+    )
 
-# Enframe with Hamming window function
-def preemphasis(signal):
-    """Perform preemphasis on the input signal."""
-    return np.append(signal[0], signal[1:] - 0.97 * signal[:-1])
 
+def compute_fbank_feats(wav, sample_rate, frame_len, frame_shift, mel_bin):
+    """compute fbank feats, a num_frames by mel_bin array."""
+    extractor = _fbank_extractor(sample_rate, frame_len, frame_shift, mel_bin)
+    return extractor(wav).T
 
-def enframe(signal, frame_len, frame_shift):
-    """Enframe with Hamming widow function."""
 
-    num_samples = signal.size
-    win = np.power(np.hanning(frame_len), 0.85)
-    num_frames = np.floor((num_samples - frame_len) / frame_shift) + 1
-    frames = np.zeros((int(num_frames), frame_len))
-    for i in range(int(num_frames)):
-        frames[i, :] = signal[i * frame_shift : i * frame_shift + frame_len]
-        frames[i, :] = frames[i, :] * win
-    return frames
+def get_padding_length(length, frame_bucket_limits):
+    """Get the padding length through th bucket limitation."""
+    for limit in frame_bucket_limits:
+        if limit > length:
+            return limit
+    return frame_bucket_limits[-1]
 
 
-def get_spectrum(frames, fft_len):
-    """Get spectrum using fft."""
-    c_fft = np.fft.rfft(frames, n=fft_len)
-    spectrum = np.abs(c_fft) ** 2
-    return spectrum
+TokenizedManifest = collections.namedtuple(
+    "TokenizedManifest",
+    ["uttids", "wav_paths", "durations", "tokens", "token_offsets", "output_dim"],
+)
+TokenizedManifest.__doc__ = """Utterances of an ASR manifest as flat arrays.
 
+    The token ids of utterance i are ``tokens[token_offsets[i]:token_offsets[i + 1]]``.
+"""
 
-def fbank(spectrum, num_filter, fs):
-    """Get mel filter bank features from spectrum.
 
-    args:
-        spectrum: a num_frames by fft_len/2+1 array(real)
-        num_filter: mel filters number, default 23
+def load_vocab(dict_file):
+    """Map every single character entry of the dict to its line number.
 
-    return:
-        fbank feature, a num_frames by num_filter array
+    Returns:
+        tuple: (sorted unicode code points, their token ids, dict size)
+    """
+    codes = {}
+    num_labels = 0
+    with open(dict_file, "r", encoding="utf-8") as f:
+        for row in f:
+            label = row.split()[0]
+            if len(label) == 1:
+                # the first occurrence wins, as with list.index
+                codes.setdefault(ord(label), num_labels)
+            num_labels += 1
+    keys = np.array(sorted(codes), dtype=np.uint32)
+    ids = np.array([codes[k] for k in keys.tolist()], dtype=np.int32)
+    return keys, ids, num_labels
+
+
+def tokenize(texts, vocab, unk_id=1):
+    """Convert transcripts to flat token ids and offsets, spaces are ignored.
+
+    All transcripts are decoded to code points at once and looked up in the
+    sorted vocabulary with a binary search, characters out of the vocabulary
+    being mapped to `unk_id`.
     """
-    mel_energies = get_mel_banks(num_filter, 512, fs * 2, 20, 8000)[0]
-    feats = np.dot(spectrum, mel_energies.T)
-    feats = np.where(feats == 0, np.finfo(float).eps, feats)
-    feats = np.log(feats)
-    return feats
+    keys, ids, _ = vocab
+    texts = [text.replace(" ", "") for text in texts]
+    lengths = np.fromiter((len(text) for text in texts), np.int64, len(texts))
+    codes = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32)
+    tokens = np.full(len(codes), unk_id, dtype=np.int32)
+    if len(keys) > 0:
+        pos = np.minimum(np.searchsorted(keys, codes), len(keys) - 1)
+        found = keys[pos] == codes
+        tokens[found] = ids[pos[found]]
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return tokens, offsets
+
+
+def _load_range(args):
+    """Parse and tokenize the manifest lines starting in [start, end)."""
+    data_file, start, end, vocab, frame_factor = args
+    lines = []
+    with open(data_file, "rb") as f:
+        if start > 0:
+            # skip the line overlapping the previous range
+            f.seek(start - 1)
+            f.readline()
+        else:
+            f.readline()  # header
+        pos = f.tell()
+        while pos < end:
+            line = f.readline()
+            if not line:
+                break
+            pos += len(line)
+            lines.append(line.decode("utf-8"))
+    rows = [row for row in csv.reader(lines) if row]
+    uttids = [row[2].split("/")[-1] for row in rows]
+    wav_paths = [row[2] for row in rows]
+    durations = np.array([float(row[1]) for row in rows], dtype=np.float64)
+    durations = (durations * frame_factor).astype(np.int64)
+    tokens, offsets = tokenize([row[3] for row in rows], vocab)
+    return uttids, wav_paths, durations, tokens, offsets
+
+
+def _cache_signature(data_file, dict_file, frame_factor):
+    data_stat, dict_stat = os.stat(data_file), os.stat(dict_file)
+    return np.array(
+        [
+            data_stat.st_size,
+            data_stat.st_mtime_ns,
+            dict_stat.st_size,
+            dict_stat.st_mtime_ns,
+            frame_factor,
+        ],
+        dtype=np.int64,
+    )
 
 
-def compute_fbank_feats(wav, sample_rate, frame_len, frame_shift, mel_bin):
-    """compute fbank feats."""
-    signal = preemphasis(wav)
-    frame_len = sample_rate * frame_len // 1000
-    frame_shift = sample_rate * frame_shift // 1000
-    frames = enframe(signal, frame_len=frame_len, frame_shift=frame_shift)
-    frames -= np.mean(frames)
-    spectrum = get_spectrum(frames, fft_len=512)
-    fbank_feats = fbank(spectrum, num_filter=mel_bin, fs=sample_rate / 2)
-    return fbank_feats
+def load_manifest(
+    data_file, dict_file, frame_factor=100, workers=8, cache=True, cache_dir=None
+):
+    """Load and tokenize a csv manifest (ID, duration, wav, transcript).
 
+    The file is split in `workers` byte ranges, each parsed by one worker, and
+    the tokenized manifest is cached as `<data_file>.tokens.npz`, next to it or
+    in `cache_dir`. The cache is reused as long as the manifest, the dict and
+    `frame_factor` are unchanged, so later runs only load a few flat arrays. If
+    the cache cannot be written, e.g. on a read-only mount, the manifest is
+    loaded without it.
 
-def get_padding_length(length, frame_bucket_limits):
-    """Get the padding length through th bucket limitation."""
-    for limit in frame_bucket_limits:
-        if limit > length:
-            return limit
-    return frame_bucket_limits[-1]
+    Args:
+        data_file (str): input csv manifest.
+        dict_file (str): input dict file e.g.lang_char.txt.
+        frame_factor (int): number of frames per second of audio.
+        workers (int): number of worker processes.
+        cache (bool): whether to read and write the cache.
+        cache_dir (str): directory of the cache, None for the directory of
+            `data_file`.
 
+    Returns:
+        TokenizedManifest: the utterances of the manifest in file order.
+    """
+    assert os.path.exists(data_file)
+    cache_file = data_file + ".tokens.npz"
+    if cache_dir is not None:
+        cache_file = os.path.join(cache_dir, os.path.basename(cache_file))
+    signature = _cache_signature(data_file, dict_file, frame_factor)
+    if cache and os.path.isfile(cache_file):
+        with np.load(cache_file) as cached:
+            if np.array_equal(cached["signature"], signature):
+                return TokenizedManifest(
+                    cached["uttids"],
+                    cached["wav_paths"],
+                    cached["durations"],
+                    cached["tokens"],
+                    cached["token_offsets"],
+                    int(cached["output_dim"]),
+                )
 
-def load_samples(data_file, dict_file, worker_id, frame_factor, workers_num):
-    """Load all training samples from data file."""
-    data = []
-    labels = []
-    with open(dict_file, "r") as f:
-        lines = f.readlines()
-        i = 0
-        for row in lines:
-            labels.append(row.split()[0])
-            i += 1
-
-    with open(data_file, "r") as csvfile:
-        csvreader = csv.reader(csvfile)
-        datanum = 0
-        for row in csvreader:
-            if datanum > 0:
-                # arr = row.split("\t")
-                uttid = row[2].split("/")[-1]
-                tokenid = row[3]
-
-                output_dim = len(labels) + 1
-                wav_path = row[2]
-                duration = int(float(row[1]) * frame_factor)
-                newid = ""
-                for x in list(tokenid.replace(" ", "")):
-                    if x in labels:
-                        newid = newid + str(labels.index(x)) + " "
-                    else:
-                        newid = newid + str(1) + " "
-                # newid = str(labels.index(x) for x in list(tokenid.replace(' ','')))
-                data.append((uttid, wav_path, duration, newid, output_dim))
-            datanum += 1
-    return data
-
-
-def parse_file(path, dict_file, frame_factor, workers=8):
-    """parse index file."""
-    assert os.path.exists(path)
-    results = []
-    workers_thread = []
-    pool = Pool(processes=workers)
-    for i in range(workers):
-        w = pool.apply_async(
-            load_samples, args=(path, dict_file, i, frame_factor, workers)
-        )
-        workers_thread.append(w)
-    pool.close()
-    pool.join()
-    for w in workers_thread:
-        result = w.get()
-        results += result
-    return results
+    vocab = load_vocab(dict_file)
+    size = os.path.getsize(data_file)
+    workers = max(1, min(workers, size // (1 << 20) + 1))
+    bounds = np.linspace(0, size, workers + 1).astype(np.int64).tolist()
+    tasks = [
+        (data_file, bounds[i], bounds[i + 1], vocab, frame_factor)
+        for i in range(workers)
+    ]
+    if workers > 1:
+        with Pool(processes=workers) as pool:
+            parts = pool.map(_load_range, tasks)
+    else:
+        parts = [_load_range(task) for task in tasks]
+
+    token_offsets = [np.zeros(1, dtype=np.int64)]
+    num_tokens = 0
+    for part in parts:
+        token_offsets.append(part[4][1:] + num_tokens)
+        num_tokens += part[4][-1]
+    manifest = TokenizedManifest(
+        np.array([u for part in parts for u in part[0]], dtype=str),
+        np.array([w for part in parts for w in part[1]], dtype=str),
+        np.concatenate([part[2] for part in parts]),
+        np.concatenate([part[3] for part in parts]),
+        np.concatenate(token_offsets),
+        vocab[2] + 1,
+    )
+    if cache:
+        tmp_file = cache_file + ".tmp.npz"
+        try:
+            if cache_dir is not None:
+                os.makedirs(cache_dir, exist_ok=True)
+            np.savez(tmp_file, signature=signature, **manifest._asdict())
+            os.replace(tmp_file, cache_file)
+        except OSError as e:
+            logger.warning("Cannot write the manifest cache %s: %s", cache_file, e)
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+    return manifest
+
+
+def manifest_row(manifest, index):
+    """(uttid, wav_path, token ids as a space separated string) of an utterance."""
+    start, end = manifest.token_offsets[index], manifest.token_offsets[index + 1]
+    return (
+        str(manifest.uttids[index]),
+        str(manifest.wav_paths[index]),
+        " ".join(map(str, manifest.tokens[start:end].tolist())),
+    )
 
 
 class BucketDatasetBase:
@@ -263,10 +306,10 @@ class BucketDatasetBase:
         self.bucket_select_dict = self.bucket_init(self.frame_bucket_limit)
 
         # load all samples
-        data = parse_file(data_file, dict_file, frame_factor, workers=1)
-        # sort all date according to their lengths
-        # each item of data include [uttid, wav_path, duration, tokenid, output_dim, kmeans_id (optional)]
-        self.data = sorted(data, key=lambda x: x[2])
+        self.manifest = load_manifest(data_file, dict_file, frame_factor, workers=8)
+        self.output_dim = self.manifest.output_dim
+        # sort all data according to their lengths
+        self.order = np.argsort(self.manifest.durations, kind="stable")
         # implement by subclass, each item includes: [data, max_limit_frame]
         self.batches = []
 
@@ -328,34 +371,30 @@ class BucketASRDataset(BucketDatasetBase):
             group_size=group_size,
         )
         self.token_max_length = token_max_length
-        # load all samples
-        num_sample = 0
-        tot_num_sample = len(self.data)
+        # remove too lang or too short utt for both input and output
+        lengths = self.manifest.durations[self.order]
+        token_lengths = np.diff(self.manifest.token_offsets)[self.order]
+        keep = (
+            (lengths <= max_length)
+            & (lengths >= min_length)
+            & (token_lengths <= token_max_length)
+            & (token_lengths >= token_min_length)
+        )
+        num_sample = int(keep.sum())
+        tot_num_sample = len(self.order)
         self.batches = []
         caches = {}  # caches to store data
         for idx, max_frame in enumerate(self.frame_bucket_limit):
             # caches[idx]: [data, num_sentence, max_frame]
             caches[idx] = [[], 0, max_frame]
-        for i in range(len(self.data)):
-            length = self.data[i][2]
-            token_length = len(self.data[i][3].split())
-            self.output_dim = self.data[i][4]
-            # remove too lang or too short utt for both input and output
-            if length > max_length or length < min_length:
-                continue
-            elif token_length > token_max_length or token_length < token_min_length:
-                continue
-            else:
-                num_sample += 1
-                bucket_idx = self.bucket_select_dict[length]
-                caches[bucket_idx][0].append(
-                    (self.data[i][0], self.data[i][1], self.data[i][3])
-                )
-                caches[bucket_idx][1] += 1
+        for i, length in zip(self.order[keep].tolist(), lengths[keep].tolist()):
+            bucket_idx = self.bucket_select_dict[length]
+            caches[bucket_idx][0].append(i)
+            caches[bucket_idx][1] += 1
 
-                if caches[bucket_idx][1] >= self.batch_bucket_limit[bucket_idx]:
-                    self.batches.append((caches[bucket_idx][0], caches[bucket_idx][2]))
-                    caches[bucket_idx] = [[], 0, self.frame_bucket_limit[bucket_idx]]
+            if caches[bucket_idx][1] >= self.batch_bucket_limit[bucket_idx]:
+                self.batches.append((caches[bucket_idx][0], caches[bucket_idx][2]))
+                caches[bucket_idx] = [[], 0, self.frame_bucket_limit[bucket_idx]]
 
         # handle the left samples which are not able to form a complete batch
         for key, value in caches.items():
@@ -377,7 +416,9 @@ class BucketASRDataset(BucketDatasetBase):
         self.eos = self.output_dim - 1
 
     def __getitem__(self, index):
-        data, max_src_len = self.batches[index][0], self.batches[index][1]
+        indices, max_src_len = self.batches[index][0], self.batches[index][1]
+        # batches only keep utterance indices, the rows are built on demand
+        data = [manifest_row(self.manifest, i) for i in indices]
         return data, self.sos, self.eos, max_src_len, self.token_max_length
 
 
@@ -401,7 +442,9 @@ def speed_perturb(waveform, sample_rate):
     speed = random.choice(speeds)
 
     if speed != 1.0:
-        waveform = mindaudio.resample(waveform, sample_rate * speed, sample_rate)
+        waveform = mindaudio.resample(
+            waveform, round(sample_rate * speed), sample_rate, res_type="polyphase"
+        )
 
     return waveform
 
@@ -444,6 +487,19 @@ class CollateFunc:
         self.use_speed_perturb = use_speed_perturb
         self.use_spec_aug = use_spec_aug
         self.spec_aug_conf = spec_aug_conf
+        if use_spec_aug:
+            self.spec_aug = SpecAugment(
+                num_t_mask=spec_aug_conf.get("num_t_mask", 0),
+                num_f_mask=spec_aug_conf.get("num_f_mask", 0),
+                max_t=spec_aug_conf.get("max_t", 0),
+                max_f=spec_aug_conf.get("max_f", 0),
+                max_w=spec_aug_conf.get("max_w", 0)
+                if spec_aug_conf.get("warp_for_time", False)
+                else 0,
+                mask_prob=0.8,
+                seed=spec_aug_conf.get("seed"),
+                worker_id=rank,
+            )
         self.rank = rank
         self.group_size = group_size
         self.pool = mp.Pool(8)
@@ -490,49 +546,6 @@ class CollateFunc:
 
         return sorted_uttids, sorted_feats, sorted_labels
 
-    def spec_aug(self, xs, spec_aug_conf):
-        """Do specaugment. Inplace operation.
-
-        Args:
-            xs: Iterable[{feat}]
-            num_t_mask (int): number of time mask to apply
-            num_f_mask (int): number of freq mask to apply
-            prop_mask_t (int): mask prop of time
-            prop_mask_f (int): mask prop of freq
-            max_t (int): max width of time mask
-            max_f (int): max width of freq mask
-
-        Returns:
-            Iterable[{feat}]
-        """
-        num_t_mask = spec_aug_conf.get("num_t_mask", 0.0)
-        num_f_mask = spec_aug_conf.get("num_f_mask", 0.0)
-        # prop_mask_t = spec_aug_conf.get('prop_mask_t', 0.0)
-        # prop_mask_f = spec_aug_conf.get('prop_mask_f', 0.0)
-        max_t = spec_aug_conf.get("max_t", 0.0)
-        max_f = spec_aug_conf.get("max_f", 0.0)
-
-        for x in xs:
-            max_frames = x.shape[0]
-            max_freq = x.shape[1]
-            # time mask
-            for _ in range(num_t_mask):
-                start = random.randint(0, max_frames - 1)
-                # length = random.randint(1, int(prop_mask_t * max_frames))
-                length = random.randint(1, max_t)
-                end = min(max_frames, start + length)
-                if random.randint(1, 100) > 20:
-                    x[start:end, :] = 0
-            # freq mask
-            for _ in range(num_f_mask):
-                start = random.randint(0, max_freq - 1)
-                # length = random.randint(1, int(prop_mask_f * max_frames))
-                length = random.randint(1, max_f)
-                end = min(max_freq, start + length)
-                if random.randint(1, 100) > 20:
-                    x[:, start:end] = 0
-        return xs
-
     def __call__(self, batch, sos=0, eos=0, max_src_len=2000, max_tgt_len=30):
         """Feature collate process, including feature extraction, data
         augmentation, feature and label padding, generating mask for feature
@@ -557,9 +570,7 @@ class CollateFunc:
         if self.feature_dither != 0.0:
             raise NotImplementedError
 
-        if self.use_spec_aug:
-            xs = self.spec_aug(xs, self.spec_aug_conf)
-
+        xs_lengths = np.array([x.shape[0] for x in xs], dtype=np.int32)
         xs_pad = pad_sequence(
             xs,
             batch_first=True,
@@ -567,6 +578,8 @@ class CollateFunc:
             padding_max_len=max_src_len,
             atype=np.float32,
         )
+        if self.use_spec_aug:
+            xs_pad = self.spec_aug(xs_pad, xs_lengths)
         ys_pad = pad_sequence(
             ys,
             batch_first=True,
@@ -613,7 +626,6 @@ class CollateFunc:
             atype=np.int32,
         )
 
-        xs_lengths = np.array([x.shape[0] for x in xs], dtype=np.int32)
         ys_lengths = np.array([len(y) for y in ys], dtype=np.int32)
 
         # make xs_masks, (B, 1, T), audio == 1, padding == 0
@@ -772,20 +784,21 @@ class AsrPredictDataset:
         self.token_max_length = token_max_length
 
         # load all samples
-        data = parse_file(data_file, dict_file, frame_factor, workers=6)
+        manifest = load_manifest(data_file, dict_file, frame_factor, workers=6)
         self.batches = []
         num_sample = 0
-        for i in range(len(data)):
-            uttid = data[i][0]
-            wav_path = data[i][1]
-            length = data[i][2]
-            tokens = [int(i) for i in data[i][3].split()]
+        for i in range(len(manifest.uttids)):
+            uttid = str(manifest.uttids[i])
+            wav_path = str(manifest.wav_paths[i])
+            length = int(manifest.durations[i])
+            start, end = manifest.token_offsets[i], manifest.token_offsets[i + 1]
+            tokens = manifest.tokens[start:end].tolist()
             token_length = len(tokens)
 
             if length > max_length or length < min_length:
                 logger.warning(
                     "Utts %s has %d frames, out of frame limit %d ~ %d, remove it.",
-                    data[i][0],
+                    uttid,
                     length,
                     min_length,
                     max_length,
@@ -794,7 +807,7 @@ class AsrPredictDataset:
             elif token_length > token_max_length or token_length < token_min_length:
                 logger.warning(
                     "Utts %s has %d tokens, out of token limit %d ~ %d, remove it.",
-                    data[i][0],
+                    uttid,
                     token_length,
                     token_min_length,
                     token_max_length,
@@ -807,7 +820,7 @@ class AsrPredictDataset:
         logger.info(
             "Total utts: %d, remove too long/short utts: %d.",
             num_sample,
-            len(data) - num_sample,
+            len(manifest.uttids) - num_sample,
         )
 
     def __getitem__(self, index):
@@ -111,17 +111,12 @@ def main():
             hyps = [hyp.tolist() for hyp in hyps]
         elif config.decode_mode == "ctc_greedy_search":
             hyps, _ = ctc_greedy_search(model, xs_pad, xs_masks, xs_lengths)
-        # ctc_prefix_beam_search and attention_rescoring restrict the batch_size = 1
-        # and return one result in List[int]. Here change it to List[List[int]] for
-        # compatible with other batch decoding mode
         elif config.decode_mode == "ctc_prefix_beam_search":
-            assert xs_pad.shape[0] == 1
             hyps, _, _ = ctc_prefix_beam_search(
                 model, xs_pad, xs_masks, config.beam_size, xs_lengths
             )
-            hyps = [hyps[0][0]]
+            hyps = [list(utt_hyps[0][0]) for utt_hyps in hyps]
         elif config.decode_mode == "attention_rescoring":
-            assert xs_pad.shape[0] == 1
             hyps, _ = attention_rescoring(
                 model_ctc,
                 model_rescore,
@@ -133,7 +128,7 @@ def main():
                 config.beam_size,
                 config.ctc_weight,
             )
-            hyps = [hyps]
+            hyps = [list(hyp) for hyp in hyps]
         else:
             raise NotImplementedError
 
@@ -95,7 +95,7 @@ def main(args):
         momentum=args.momentum,
     )
 
-    my_loss = Convtasnet_Loss()
+    my_loss = Convtasnet_Loss(num_spk=args.C)
     net_with_loss = NetWithLoss(net, my_loss)
     model = Model(net_with_loss, optimizer=optimizer)
 
@@ -2,10 +2,12 @@ import os
 import sys
 from multiprocessing import cpu_count
 
+import mindspore as ms
 import numpy as np
-from ljspeech import LJSpeech, create_ljspeech_tts_dataset
+from ljspeech import LJSpeech
 
-from mindaudio.models.fastspeech2.utils import get_mask_from_lengths_np
+from mindaudio.data.bucketing import BucketBatchSampler
+from mindaudio.models.fastspeech2.utils import expand_phonemes, get_mask_from_lengths_np
 from mindaudio.models.transformer import get_sinusoid_encoding_table
 
 sys.path.append("..")
@@ -77,104 +79,132 @@ data_columns = [
 ]
 
 
+def feature_path(data_path, audio_path, key):
+    base = os.path.basename(str(audio_path)).replace(".wav", "")
+    return os.path.join(data_path, all_dirs[key], base + all_postfix[key])
+
+
+def read_feat(data_path, audio_path):
+    data = []
+    for key in feature_columns:
+        x = np.load(feature_path(data_path, audio_path, key))
+        if key == "mel":
+            x = x.T
+        if key not in ["phoneme", "duration"]:
+            x = x.astype(np.float32)
+        else:
+            x = x.astype(np.int32)
+        data.append(x)
+    return tuple(data)
+
+
+def read_lengths(data_path, audio_paths):
+    """Phoneme and mel lengths of every utterance, [N, 2], from the file headers."""
+    lengths = np.zeros((len(audio_paths), 2), np.int64)
+    for i, audio_path in enumerate(audio_paths):
+        for j, key in enumerate(["phoneme", "mel"]):
+            x = np.load(feature_path(data_path, audio_path, key), mmap_mode="r")
+            lengths[i, j] = x.shape[-1]
+    return lengths
+
+
+def pad_to_max(xs, T=None):
+    B = len(xs)
+    if T is None:
+        T = max(x.shape[0] for x in xs)
+    shape = [B, T] + list(xs[0].shape[1:])
+    ys = np.zeros(shape, dtype=xs[0].dtype)
+    lengths = np.zeros(B, np.int32)
+    for i, x in enumerate(xs):
+        ys[i, : x.shape[0]] = x
+        lengths[i] = x.shape[0]
+    return ys, lengths, np.array(T, np.int32)
+
+
+def batch_collate(items, max_src_len, max_mel_len):
+    """Pad a batch of utterances to the static shape (max_src_len, max_mel_len)."""
+    phonemes, wavs, mels, pitch, energy, duration = zip(*items)
+    B = len(phonemes)
+    dtype = np.float16 if hps.use_fp16 else np.float32
+    phonemes, src_lens, max_src_len = pad_to_max(phonemes, T=max_src_len)
+    mels, mel_lens, max_mel_len = pad_to_max(mels, T=max_mel_len)
+    pitch, _, _ = pad_to_max(pitch, T=max_mel_len)
+    energy, _, _ = pad_to_max(energy, T=max_mel_len)
+    duration, _, _ = pad_to_max(duration, T=max_src_len)
+    speakers = np.zeros(B, dtype)
+    positions_encoder = positional_embeddings[None, :max_src_len].repeat(B, 0)
+    positions_decoder = positional_embeddings[None, :max_mel_len].repeat(B, 0)
+    expanded_phonemes = expand_phonemes(phonemes, duration, mel_lens, max_mel_len)
+    src_masks = get_mask_from_lengths_np(src_lens, max_src_len)
+    mel_masks = get_mask_from_lengths_np(mel_lens, max_mel_len)
+    return (
+        speakers.astype(dtype),
+        phonemes.astype(np.int32),
+        src_lens,
+        max_src_len,
+        positions_encoder.astype(dtype),
+        positions_decoder.astype(dtype),
+        mels.astype(dtype),
+        mel_lens,
+        max_mel_len,
+        pitch.astype(dtype),
+        energy.astype(dtype),
+        duration.astype(np.int32),
+        expanded_phonemes.astype(np.int32),
+        mel_lens,
+        max_mel_len,
+        src_masks,
+        mel_masks,
+    )
+
+
+class BucketBatchDataset:
+    """Collated batches of the utterances planned by a `BucketBatchSampler`."""
+
+    def __init__(self, data_path, audio_paths, sampler):
+        self.data_path = data_path
+        self.audio_paths = audio_paths
+        self.sampler = sampler
+
+    def __getitem__(self, index):
+        bucket, ids = self.sampler.batch(index)
+        items = [read_feat(self.data_path, self.audio_paths[i]) for i in ids]
+        return batch_collate(
+            items, self.sampler.src_pads[bucket], self.sampler.tgt_pads[bucket]
+        )
+
+    def __len__(self):
+        return len(self.sampler)
+
+
 def create_dataset(
-    data_path, manifest_path, batch_size, is_train=True, rank=0, group_size=1
+    data_path,
+    manifest_path,
+    batch_size,
+    is_train=True,
+    rank=0,
+    group_size=1,
+    max_batch_frames=None,
+    bucket_mel_lens=None,
 ):
     ds = LJSpeech(
         data_path=data_path,
         manifest_path=manifest_path,
         is_train=is_train,
     )
-    ds = create_ljspeech_tts_dataset(ds, rank=rank, group_size=group_size)
-
-    def read_feat(filename):
-        filename = str(filename).replace("b'", "").replace("'", "")
-        base = filename[filename.rfind("/") + 1 :].replace(".wav", "")
-
-        data = []
-        for key in feature_columns:
-            x = np.load(os.path.join(data_path, all_dirs[key], base + all_postfix[key]))
-            if key == "mel":
-                x = x.T
-            if key not in ["phoneme", "duration"]:
-                x = x.astype(np.float32)
-            else:
-                x = x.astype(np.int32)
-            data.append(x)
-        return tuple(data)
-
-    ds = ds.map(
-        input_columns=["audio"],
-        output_columns=feature_columns,
-        column_order=feature_columns,
-        operations=[read_feat],
-        num_parallel_workers=cpu_count(),
+    audio_paths = [audio_path for audio_path, _ in ds.bins]
+    if bucket_mel_lens is None:
+        bucket_mel_lens = hps.bucket_mel_lens
+    sampler = BucketBatchSampler(
+        read_lengths(data_path, audio_paths),
+        bucket_mel_lens,
+        batch_size=batch_size,
+        max_batch_frames=max_batch_frames,
+        rank=rank,
+        group_size=group_size,
+        shuffle=is_train,
     )
 
-    def pad_to_max(xs, T=None):
-        B = len(xs)
-        if T is None:
-            T = max(x.shape[0] for x in xs)
-        shape = [B, T] + list(xs[0].shape[1:])
-        ys = np.zeros(shape, dtype=xs[0].dtype)
-        lengths = np.zeros(B, np.int32)
-        for i, x in enumerate(xs):
-            ys[i, : x.shape[0]] = x
-            lengths[i] = x.shape[0]
-        return ys, lengths, np.array(T, np.int32)
-
-    def batch_collate(
-        phonemes, wavs, mels, pitch, energy, duration, unused_batch_info=None
-    ):
-        B = len(phonemes)
-        dtype = np.float16 if hps.use_fp16 else np.float32
-        dataset_max_src_len = 135
-        dataset_max_mel_len = 742
-        phonemes, src_lens, max_src_len = pad_to_max(phonemes, T=dataset_max_src_len)
-        mels, mel_lens, max_mel_len = pad_to_max(mels, T=dataset_max_mel_len)
-        pitch, _, _ = pad_to_max(pitch, T=dataset_max_mel_len)
-        energy, _, _ = pad_to_max(energy, T=dataset_max_mel_len)
-        duration, _, _ = pad_to_max(duration, T=dataset_max_src_len)
-        speakers = np.zeros(B, dtype)
-        positions_encoder = positional_embeddings[None, :max_src_len].repeat(B, 0)
-        max_duration = duration.sum(-1).max().astype(np.int32)
-        max_duration = max_mel_len
-        positions_decoder = positional_embeddings[None, :max_duration].repeat(B, 0)
-        expanded_phonemes = []
-        for p, d, y in zip(phonemes, duration, mels):
-            xh = np.repeat(p, d)
-            x = np.zeros(y.shape[0], dtype=xh.dtype)
-            x[: xh.shape[0]] = xh
-            expanded_phonemes.append(x)
-        expanded_phonemes, expanded_src_lens, expanded_max_src_len = pad_to_max(
-            expanded_phonemes, T=dataset_max_mel_len
-        )
-        src_masks = get_mask_from_lengths_np(src_lens, max_src_len)
-        mel_masks = (
-            get_mask_from_lengths_np(mel_lens, max_mel_len)
-            if mel_lens is not None
-            else None
-        )
-        return (
-            speakers.astype(dtype),
-            phonemes.astype(np.int32),
-            src_lens,
-            max_src_len,
-            positions_encoder.astype(dtype),
-            positions_decoder.astype(dtype),
-            mels.astype(dtype),
-            mel_lens,
-            max_mel_len,
-            pitch.astype(dtype),
-            energy.astype(dtype),
-            duration.astype(np.int32),
-            expanded_phonemes.astype(np.int32),
-            expanded_src_lens,
-            expanded_max_src_len,
-            src_masks,
-            mel_masks,
-        )
-
     global data_columns
     dc = data_columns + [
         "expanded_phonemes",
@@ -183,15 +213,12 @@ def create_dataset(
         "src_masks",
         "mel_masks",
     ]
-    ds = ds.batch(
-        batch_size,
-        per_batch_map=batch_collate,
-        input_columns=feature_columns,
-        output_columns=dc,
-        column_order=dc,
-        drop_remainder=True,
+    ds = ms.dataset.GeneratorDataset(
+        BucketBatchDataset(data_path, audio_paths, sampler),
+        column_names=dc,
+        sampler=sampler,
+        num_parallel_workers=min(cpu_count(), 8),
         python_multiprocessing=False,
-        num_parallel_workers=cpu_count(),
     )
 
     return ds
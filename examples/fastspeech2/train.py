@@ -126,7 +126,11 @@ class SaveCallBack(Callback):
         )
         for name, loss in zip(cb_params.train_network.network.loss_fn.names, losses):
             info += " [%s] %.2f" % (name, loss)
-        np.save("mel_predictions.npy", net.mel_predictions.asnumpy())
+        mel_prediction_len = int(net.mel_prediction_len.asnumpy())
+        np.save(
+            "mel_predictions.npy",
+            net.mel_predictions.asnumpy()[:, :mel_prediction_len],
+        )
         print(info)  # , cb_params["train_network"].network.scale)
         cur_step = cb_params.cur_step_num + self.global_step
         if cur_step % self.save_step != 0:
@@ -175,6 +179,7 @@ def main():
         is_train=True,
         rank=rank,
         group_size=group,
+        max_batch_frames=hps.max_batch_frames // group,
     )
     print("[info] num batches: %d" % ds.get_dataset_size())
     lr = nn.exponential_decay_lr(
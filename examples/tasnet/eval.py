@@ -100,7 +100,7 @@ def evaluate(args):
         # mixture_lengths_with_list = get_input_with_list(args.data_dir)
         estimate_source = model(padded_mixture)
 
-        my_loss = Separation_Loss()
+        my_loss = Separation_Loss(num_spk=args.nspk)
         loss, max_snr, estimate_source, reorder_estimate_source = my_loss(
             padded_source, estimate_source, mixture_lengths
         )
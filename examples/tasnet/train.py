@@ -134,7 +134,7 @@ if __name__ == "__main__":
     optimizer = nn.Adam(
         net.get_parameters(), learning_rate=lr, weight_decay=args.l2, loss_scale=0.01
     )
-    my_loss = Separation_Loss()
+    my_loss = Separation_Loss(num_spk=args.nspk)
     loss_cb = LossMonitor()
     time_cb = TimeMonitor()
     net_with_loss = NetWithLoss(net, my_loss)
@@ -1,9 +1,13 @@
 from .aishell import *  # noqa: F401
+from .audio_bank import *  # noqa: F401
 from .augment import *  # noqa: F401
+from .bucketing import *  # noqa: F401
+from .feature_store import *  # noqa: F401
 from .features import *  # noqa: F401
 from .filters import *  # noqa: F401
 from .io import *  # noqa: F401
 from .librispeech import *  # noqa: F401
 from .processing import *  # noqa: F401
+from .sharding import *  # noqa: F401
 from .spectrum import *  # noqa: F401
 from .voxceleb import *  # noqa: F401
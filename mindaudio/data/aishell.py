@@ -8,8 +8,13 @@ import shutil
 import wget
 
 import mindaudio
+from mindaudio.data.sharding import map_shards
 
 logger = logging.getLogger(__name__)
+AISHELL_INFO_INDEX = "wav_info_index.pkl"
+
+# Shared with the preparation workers, see `_set_info_index`
+_info_index = None
 
 __all__ = ["prepare_aishell"]
 
@@ -38,7 +43,39 @@ def download_aishell(data_folder):
             os.remove(tgz)
 
 
-def save_aishell_info(data_folder, save_folder):
+def _set_info_index(info_index):
+    global _info_index
+    _info_index = info_index
+
+
+def _csv_rows(items):
+    """
+    Computes the csv lines of a shard of (ID, wav, transcript) items, together
+    with the `InfoIndex` entries of those files.
+    """
+    entry = []
+    wavs = []
+    for ID, wav, transcript_ in items:
+        duration = _info_index.info(wav).frames / 16000
+        csv_line = [
+            ID,
+            str(duration),
+            wav,
+            transcript_,
+        ]
+        entry.append(csv_line)
+        wavs.append(wav)
+    return entry, _info_index.export(wavs)
+
+
+def save_aishell_info(data_folder, save_folder, num_workers=1, shard_size=1000):
+    """
+    Writes the train/dev/test csv files of AISHELL-1.
+
+    The wav files of each split are processed in shards of `shard_size` by
+    `num_workers` processes. An interrupted run resumes from the last
+    completed shard of the split it was working on.
+    """
     # Create filename-to-transcript dictionary
     filename2transcript = {}
     with open(
@@ -59,6 +96,8 @@ def save_aishell_info(data_folder, save_folder):
         "test",
     ]
     ID_start = 0  # needed to have a unique ID for each audio
+    # Durations are probed from the wav headers and remembered across runs
+    info_index = mindaudio.InfoIndex(os.path.join(save_folder, AISHELL_INFO_INDEX))
     for split in splits:
         new_filename = os.path.join(save_folder, split) + ".csv"
         if os.path.exists(new_filename):
@@ -66,25 +105,31 @@ def save_aishell_info(data_folder, save_folder):
         logger.info("Preparing %s..." % new_filename)
 
         csv_output = [["ID", "duration", "wav", "transcript"]]
-        entry = []
 
         all_wavs = glob.glob(
             os.path.join(data_folder, "data_aishell/wav") + "/" + split + "/*/*.wav"
         )
+        items = []
         for i in range(len(all_wavs)):
             filename = all_wavs[i].split("/")[-1].split(".wav")[0]
             if filename not in filename2transcript:
                 continue
-            signal, _ = mindaudio.read(all_wavs[i])
-            duration = signal.shape[0] / 16000
-            transcript_ = filename2transcript[filename]
-            csv_line = [
-                ID_start + i,
-                str(duration),
-                all_wavs[i],
-                transcript_,
-            ]
-            entry.append(csv_line)
+            items.append((ID_start + i, all_wavs[i], filename2transcript[filename]))
+
+        shard_dir = os.path.join(save_folder, split) + "_shards"
+        shards = map_shards(
+            _csv_rows,
+            items,
+            shard_dir,
+            num_workers=num_workers,
+            shard_size=shard_size,
+            initializer=_set_info_index,
+            initargs=(info_index,),
+        )
+        entry = []
+        for rows, probed in shards:
+            entry.extend(rows)
+            info_index.update(probed)
 
         csv_output = csv_output + entry
 
@@ -95,16 +140,18 @@ def save_aishell_info(data_folder, save_folder):
             for line in csv_output:
                 csv_writer.writerow(line)
 
+        info_index.save()
+        shutil.rmtree(shard_dir)
         msg = "\t%s successfully created!" % (new_filename)
         logger.info(msg)
 
         ID_start += len(all_wavs)
 
 
-def prepare_aishell(data_path, download=False):
+def prepare_aishell(data_path, download=False, num_workers=1, shard_size=1000):
     if download:
         download_aishell(data_path)
-    save_aishell_info(data_path, data_path)
+    save_aishell_info(data_path, data_path, num_workers, shard_size)
 
 
 if __name__ == "__main__":
@@ -118,5 +165,8 @@ if __name__ == "__main__":
         default=False,
         help="set true to download aishell datasets",
     )
+    parser.add_argument(
+        "--num_workers", type=int, default=1, help="number of preparation processes"
+    )
     arg = parser.parse_args()
-    prepare_aishell(arg.data_path, arg.download)
+    prepare_aishell(arg.data_path, arg.download, arg.num_workers)
@@ -0,0 +1,206 @@
+"""
+Noise and room impulse response corpora, loaded once into one memory-mapped
+buffer.
+
+An audio bank is a directory holding `audio.f32`, the mono float32 samples of
+every clip of a corpus concatenated, and an `index.npz` file with the source
+file, offset and length of every clip. Building a bank reads, downmixes,
+resamples and normalizes the corpus once; afterwards a crop is a slice of the
+buffer. The buffer is opened read-only and lazily, so a bank can be handed to
+data-loader worker processes, which all share the page cache of one file.
+"""
+
+import os
+from functools import partial
+from multiprocessing import Pool
+
+import numpy as np
+
+from .io import read
+from .processing import resample, stereo_to_mono
+
+__all__ = ["AudioBank", "NoiseBank", "RIRBank"]
+
+DATA_FILE = "audio.f32"
+INDEX_FILE = "index.npz"
+
+
+def _load_clip(path, sample_rate, normalize):
+    """Mono float32 samples of `path` at `sample_rate`, RMS normalized."""
+    audio, sr = read(path)
+    audio = stereo_to_mono(np.asarray(audio, dtype=np.float32))
+    if sr != sample_rate:
+        res_type = "polyphase" if float(sr).is_integer() else "fft"
+        audio = resample(audio[np.newaxis], sr, sample_rate, res_type=res_type)[0]
+    if normalize:
+        audio = audio / (np.sqrt(np.mean(np.square(audio))) + 1e-8)
+    return np.ascontiguousarray(audio, dtype=np.float32)
+
+
+class AudioBank:
+    """
+    Read the clips of an audio bank.
+
+    Clips are addressed by position and returned as read-only views of the
+    memory-mapped buffer. Use `build` to create a bank from audio files.
+
+    Args:
+        root (str): Directory of the audio bank.
+
+    Attributes:
+        files (np.ndarray): Source file of every clip.
+        offsets (np.ndarray): Offset of every clip in the buffer, in samples.
+        lengths (np.ndarray): Number of samples of every clip.
+        sample_rate (int): Sampling rate of the clips.
+
+    Examples:
+        >>> bank = AudioBank.build("./rir_bank", rir_files, sample_rate=16000)
+        >>> rir = bank[0]
+    """
+
+    normalize = False
+
+    def __init__(self, root):
+        if not os.path.isfile(os.path.join(root, INDEX_FILE)):
+            raise FileNotFoundError(f"No audio bank index found in {root}.")
+        self.root = root
+        with np.load(os.path.join(root, INDEX_FILE)) as index:
+            self.files = index["files"]
+            self.offsets = index["offsets"]
+            self.lengths = index["lengths"]
+            self.sample_rate = int(index["sample_rate"])
+            self.normalized = bool(index["normalized"])
+        self._data = None
+
+    @classmethod
+    def build(cls, root, files, sample_rate=16000, num_workers=1):
+        """
+        Load a corpus into an audio bank, unless `root` already holds a bank of
+        the same files at the same sampling rate.
+
+        Every file is read, downmixed to mono, resampled to `sample_rate` and,
+        for a `NoiseBank`, RMS normalized, then appended to the buffer.
+
+        Args:
+            root (str): Directory of the audio bank.
+            files (list): Paths of the audio files.
+            sample_rate (int, optional): Sampling rate of the bank. Default: 16000.
+            num_workers (int, optional): Number of processes loading the files.
+                Default: 1.
+
+        Returns:
+            The bank, an instance of `cls`.
+        """
+        files = [str(path) for path in files]
+        if os.path.isfile(os.path.join(root, INDEX_FILE)):
+            bank = cls(root)
+            if (
+                bank.files.tolist() == files
+                and bank.sample_rate == sample_rate
+                and bank.normalized == cls.normalize
+            ):
+                return bank
+        if not files:
+            raise ValueError("An audio bank needs at least one file.")
+        os.makedirs(root, exist_ok=True)
+        load_fn = partial(_load_clip, sample_rate=sample_rate, normalize=cls.normalize)
+        lengths = []
+        tmp_path = os.path.join(root, DATA_FILE + ".tmp")
+        with open(tmp_path, "wb") as f:
+            if num_workers > 1:
+                with Pool(num_workers) as pool:
+                    for clip in pool.imap(load_fn, files, chunksize=4):
+                        f.write(clip.tobytes())
+                        lengths.append(len(clip))
+            else:
+                for path in files:
+                    clip = load_fn(path)
+                    f.write(clip.tobytes())
+                    lengths.append(len(clip))
+        os.replace(tmp_path, os.path.join(root, DATA_FILE))
+
+        lengths = np.asarray(lengths, dtype=np.int64)
+        tmp_path = os.path.join(root, INDEX_FILE + ".tmp.npz")
+        np.savez(
+            tmp_path,
+            files=np.asarray(files, dtype=str),
+            offsets=np.cumsum(lengths) - lengths,
+            lengths=lengths,
+            sample_rate=sample_rate,
+            normalized=cls.normalize,
+        )
+        os.replace(tmp_path, os.path.join(root, INDEX_FILE))
+        return cls(root)
+
+    @property
+    def data(self):
+        """The samples of all the clips, a read-only memory map."""
+        if self._data is None:
+            self._data = np.memmap(
+                os.path.join(self.root, DATA_FILE), dtype=np.float32, mode="r"
+            )
+        return self._data
+
+    def __getstate__(self):
+        # the memory map is reopened by every worker process
+        state = self.__dict__.copy()
+        state["_data"] = None
+        return state
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __getitem__(self, index):
+        start = self.offsets[index]
+        return self.data[start : start + self.lengths[index]]
+
+    def sample(self):
+        """A random clip of the bank."""
+        return self[np.random.randint(len(self))]
+
+
+class NoiseBank(AudioBank):
+    """
+    An audio bank of RMS normalized background noises, serving random crops.
+
+    Examples:
+        >>> bank = NoiseBank.build("./musan_bank", noise_files, num_workers=8)
+        >>> noise = bank.crop(32000)
+    """
+
+    normalize = True
+
+    def crop(self, length):
+        """
+        A random crop of `length` samples of the noise corpus.
+
+        The crop starts at a random sample of the buffer and runs over the
+        following clips, wrapping around at the end of the buffer. It is a view
+        of the buffer unless it wraps around.
+
+        Args:
+            length (int): Number of samples.
+
+        Returns:
+            np.ndarray, the crop, (length,).
+        """
+        data = self.data
+        start = np.random.randint(len(data))
+        if start + length <= len(data):
+            return data[start : start + length]
+        pieces = [data[start:]]
+        missing = length - len(pieces[0])
+        while missing > 0:
+            pieces.append(data[:missing])
+            missing -= len(pieces[-1])
+        return np.concatenate(pieces)
+
+
+class RIRBank(AudioBank):
+    """
+    An audio bank of room impulse responses, kept at their original amplitude.
+
+    Examples:
+        >>> bank = RIRBank.build("./rir_bank", rir_files)
+        >>> rir = bank.sample()
+    """
@@ -1,10 +1,11 @@
+import collections
 import random
 
-import mindspore as ms
 import mindspore.dataset.audio as msaudio
 import numpy as np
-from mindspore.nn import Conv1d
+import scipy.fft
 
+from .audio_bank import NoiseBank, RIRBank
 from .filters import notch_filter
 from .io import read
 from .processing import resample, rescale
@@ -13,6 +14,8 @@ from .spectrum import _pad_shape, compute_amplitude, dB_to_amplitude, istft, stf
 __all__ = [
     "frequencymasking",
     "timemasking",
+    "SpecAugment",
+    "batch_convolve",
     "reverberate",
     "add_noise",
     "add_reverb",
@@ -98,6 +101,182 @@ def timemasking(
     return time_masking(waveform)
 
 
+class SpecAugment:
+    """
+    Batched SpecAugment: time warping, time masking and frequency masking of
+    a padded batch of features.
+
+    The positions of all the warps and masks of a batch are drawn with a single
+    call to the random generator, and the masks are built with broadcasted
+    comparisons against the frame and bin indices, so the cost does not grow
+    with a Python loop over utterances and masks. Only the valid frames of
+    every utterance are warped or masked, the padding is left untouched.
+
+    A time mask starts at a frame drawn uniformly in the valid frames and is
+    ``[1, max_t]`` frames wide, clipped at the end of the utterance; frequency
+    masks are drawn the same way over the bins. Every mask is applied with
+    probability `mask_prob`.
+
+    Args:
+        num_t_mask (int): Number of time masks per utterance (default=2).
+        num_f_mask (int): Number of frequency masks per utterance (default=2).
+        max_t (int): Maximum width of a time mask, in frames (default=50).
+        max_f (int): Maximum width of a frequency mask, in bins (default=10).
+        max_w (int): Maximum time warp, in frames, 0 to disable time warping
+            (default=0).
+        mask_prob (float): Probability to apply each mask (default=1.0).
+        mask_value (float): Value of the masked features (default=0.0).
+        seed (int): Seed of the random generator, None for a random seed
+            (default=None).
+        worker_id (int): Index of the worker using this instance. Workers
+            sharing a `seed` draw from independent, reproducible streams
+            (default=0).
+
+    Examples:
+        >>> import numpy as np
+        >>> import mindaudio.data.augment as augment
+        >>> spec_aug = augment.SpecAugment(max_t=50, max_f=10, max_w=80, seed=0)
+        >>> feats = np.random.randn(8, 1000, 80).astype(np.float32)
+        >>> masked = spec_aug(feats, lengths=np.arange(300, 1100, 100))
+    """
+
+    def __init__(
+        self,
+        num_t_mask=2,
+        num_f_mask=2,
+        max_t=50,
+        max_f=10,
+        max_w=0,
+        mask_prob=1.0,
+        mask_value=0.0,
+        seed=None,
+        worker_id=0,
+    ):
+        self.num_t_mask = num_t_mask
+        self.num_f_mask = num_f_mask
+        self.max_t = max_t
+        self.max_f = max_f
+        self.max_w = max_w
+        self.mask_prob = mask_prob
+        self.mask_value = mask_value
+        self.rng = np.random.default_rng(
+            np.random.SeedSequence(seed, spawn_key=(worker_id,))
+        )
+
+    def time_warp(self, feats, lengths, center, warped):
+        """
+        Warp the time axis of every utterance, moving frame `center` to frame
+        `warped` and stretching both sides linearly.
+
+        Args:
+            feats (np.ndarray): Features of shape `[batch, time, freq]`.
+            lengths (np.ndarray): Number of valid frames of every utterance.
+            center (np.ndarray): Frame moved by the warp, `[batch]`.
+            warped (np.ndarray): Where it is moved to, `[batch]`. Utterances
+                with ``warped == center`` are not warped.
+
+        Returns:
+            np.ndarray, the warped features.
+        """
+        frames = np.arange(feats.shape[1])
+        lengths, center, warped = (x[:, None] for x in (lengths, center, warped))
+        left = frames < warped
+        # source position of every output frame, sampled at the frame centers
+        src = np.where(
+            left,
+            (frames + 0.5) * center / np.maximum(warped, 1) - 0.5,
+            center
+            + (frames - warped + 0.5)
+            * (lengths - center)
+            / np.maximum(lengths - warped, 1)
+            - 0.5,
+        )
+        src = np.clip(
+            src, np.where(left, 0, center), np.where(left, center, lengths) - 1
+        )
+        src = np.where((frames < lengths) & (warped != center), src, frames)
+        low = np.floor(src).astype(np.int64)
+        high = np.minimum(low + 1, np.where(left, center, lengths) - 1)
+        high = np.where(frames < lengths, np.maximum(high, low), low)
+        weight = (src - low)[..., None].astype(feats.dtype)
+        rows = np.arange(feats.shape[0])[:, None]
+        low_feats = feats[rows, low]
+        warped_feats = feats[rows, high]
+        warped_feats -= low_feats
+        warped_feats *= weight
+        warped_feats += low_feats
+        return warped_feats
+
+    def __call__(self, feats, lengths=None):
+        """
+        Augment a batch of features.
+
+        Args:
+            feats (np.ndarray): Features of shape `[batch, time, freq]`, padded
+                to the longest utterance, augmented in place.
+            lengths (np.ndarray): Number of valid frames of every utterance,
+                None if they are not padded (default=None).
+
+        Returns:
+            np.ndarray, the augmented features, `[batch, time, freq]`.
+        """
+        batch, num_frames, num_bins = feats.shape
+        if lengths is None:
+            lengths = np.full(batch, num_frames, dtype=np.int64)
+        lengths = np.minimum(np.asarray(lengths, dtype=np.int64), num_frames)
+        num_masks = self.num_t_mask + self.num_f_mask
+        draws = self.rng.random((batch, 2 + 3 * num_masks))
+
+        if self.max_w > 0:
+            # warp a frame in [max_w, length - max_w) by less than max_w frames
+            can_warp = lengths > 2 * self.max_w
+            center = self.max_w + np.floor(draws[:, 0] * (lengths - 2 * self.max_w))
+            shift = np.floor(draws[:, 1] * 2 * self.max_w) - self.max_w + 1
+            center = np.where(can_warp, center, 0).astype(np.int64)
+            warped = np.where(can_warp, center + shift, 0).astype(np.int64)
+            rows = np.flatnonzero(warped != center)
+            if len(rows) > 0:
+                feats[rows] = self.time_warp(
+                    feats[rows], lengths[rows], center[rows], warped[rows]
+                )
+
+        starts, widths, keep = np.moveaxis(
+            draws[:, 2:].reshape(batch, num_masks, 3), -1, 0
+        )
+        sizes = np.concatenate(
+            [
+                np.tile(lengths[:, None], self.num_t_mask),
+                np.full((batch, self.num_f_mask), num_bins),
+            ],
+            axis=1,
+        )
+        max_widths = np.array(
+            [self.max_t] * self.num_t_mask + [self.max_f] * self.num_f_mask
+        )
+        starts = np.floor(starts * sizes).astype(np.int64)
+        ends = np.minimum(
+            starts + 1 + np.floor(widths * max_widths).astype(np.int64), sizes
+        )
+        ends = np.where(keep < self.mask_prob, ends, starts)
+
+        t_starts, f_starts = starts[:, : self.num_t_mask], starts[:, self.num_t_mask :]
+        t_ends, f_ends = ends[:, : self.num_t_mask], ends[:, self.num_t_mask :]
+        frames = np.arange(num_frames)
+        bins = np.arange(num_bins)
+        time_mask = (
+            (frames >= t_starts[..., None]) & (frames < t_ends[..., None])
+        ).any(axis=1)
+        freq_mask = ((bins >= f_starts[..., None]) & (bins < f_ends[..., None])).any(
+            axis=1
+        )
+        # only the masked rows and bins are written, a pass over the whole
+        # padded batch costs more than the masks themselves
+        feats[time_mask] = self.mask_value
+        for row in np.flatnonzero(freq_mask.any(axis=1)):
+            feats[row, : lengths[row], freq_mask[row]] = self.mask_value
+        return feats
+
+
 def reverberate(waveforms, rir_waveform, rescale_amp="avg"):
     """
     Reverberate a given signal with given a Room Impulse Response (RIR).
@@ -174,6 +353,123 @@ def reverberate(waveforms, rir_waveform, rescale_amp="avg"):
     return waveforms
 
 
+# kernel spectra, keyed by the kernel bytes and the FFT size, so a RIR reused
+# over many calls is only transformed once per block size
+_KERNEL_SPECTRA = collections.OrderedDict()
+_KERNEL_SPECTRA_SIZE = 32
+
+
+def _kernel_spectrum(kernels, n_fft):
+    key = (kernels.shape, kernels.dtype.str, n_fft, kernels.tobytes())
+    spectrum = _KERNEL_SPECTRA.get(key)
+    if spectrum is None:
+        spectrum = scipy.fft.rfft(kernels, n_fft, axis=-1)
+        _KERNEL_SPECTRA[key] = spectrum
+        if len(_KERNEL_SPECTRA) > _KERNEL_SPECTRA_SIZE:
+            _KERNEL_SPECTRA.popitem(last=False)
+    else:
+        _KERNEL_SPECTRA.move_to_end(key)
+    return spectrum
+
+
+def _fft_size(length, kernel_size):
+    """FFT size minimizing the cost of `length` overlap-save outputs."""
+    # a single block covering the whole output, or blocks of a few kernels
+    sizes = {scipy.fft.next_fast_len(length + kernel_size - 1, True)}
+    size = 2 * kernel_size
+    while size < length + kernel_size - 1:
+        sizes.add(scipy.fft.next_fast_len(size, True))
+        size *= 2
+
+    def cost(n_fft):
+        num_blocks = -(-length // (n_fft - kernel_size + 1))
+        return num_blocks * n_fft * np.log2(n_fft)
+
+    return min(sizes, key=cost)
+
+
+def batch_convolve(waveforms, kernels, mode="full", method="auto"):
+    """
+    Linear convolution of a batch of waveforms with a batch of kernels.
+
+    The leading dimensions of `waveforms` and `kernels` are broadcast, so one
+    kernel can be applied to a whole batch, or every waveform convolved with
+    its own kernel, e.g. a batch of room impulse responses, in one call.
+
+    Long kernels are applied with FFTs: overlap-save blocks when the signal is
+    much longer than the kernel, a single transform otherwise, the block size
+    being picked among fast (5-smooth) FFT sizes. The kernel spectra are
+    cached, so reusing the same kernels is cheaper. Short kernels are applied
+    directly.
+
+    Args:
+        waveforms (np.ndarray): Signals, shape `[..., time]`.
+        kernels (np.ndarray): Kernels, shape `[..., kernel_size]`.
+        mode (str): "full" for the ``time + kernel_size - 1`` outputs, "valid"
+            for the ``time - kernel_size + 1`` outputs not depending on the
+            zero padding (default="full").
+        method (str): "direct", "fft" or "auto" to choose by kernel size
+            (default="auto").
+
+    Returns:
+        np.ndarray, the convolved waveforms, float32 if both inputs are.
+
+    Examples:
+        >>> import numpy as np
+        >>> import mindaudio.data.augment as augment
+        >>> waveforms = np.random.randn(8, 160000).astype(np.float32)
+        >>> rirs = np.random.randn(8, 8000).astype(np.float32)
+        >>> reverbed = augment.batch_convolve(waveforms, rirs)[..., :160000]
+    """
+    dtype = np.result_type(waveforms.dtype, kernels.dtype, np.float32)
+    waveforms = np.asarray(waveforms, dtype=dtype)
+    kernels = np.ascontiguousarray(kernels, dtype=dtype)
+    num_samples, kernel_size = waveforms.shape[-1], kernels.shape[-1]
+    if mode == "full":
+        start, length = 0, num_samples + kernel_size - 1
+    elif mode == "valid":
+        start, length = kernel_size - 1, max(num_samples - kernel_size + 1, 0)
+    else:
+        raise ValueError(f"mode must be full or valid, got {mode}.")
+    if method == "auto":
+        method = "direct" if kernel_size <= 32 else "fft"
+    if method not in ("direct", "fft"):
+        raise ValueError(f"method must be direct, fft or auto, got {method}.")
+    if length == 0:
+        # a kernel longer than the signal has no valid output
+        batch_shape = np.broadcast_shapes(waveforms.shape[:-1], kernels.shape[:-1])
+        return np.zeros(batch_shape + (0,), dtype=dtype)
+
+    # pad so output n only depends on padded[n - start : n - start + kernel_size]
+    pad_left = kernel_size - 1 - start
+    if method == "direct":
+        padded = np.pad(
+            waveforms,
+            [(0, 0)] * (waveforms.ndim - 1) + [(pad_left, pad_left)],
+        )
+        frames = np.lib.stride_tricks.sliding_window_view(padded, kernel_size, -1)
+        return np.matmul(frames, kernels[..., ::-1, np.newaxis])[..., 0]
+
+    n_fft = _fft_size(length, kernel_size)
+    step = n_fft - kernel_size + 1
+    num_blocks = max(-(-length // step), 1)
+    total = num_blocks * step + kernel_size - 1
+    padded = np.pad(
+        waveforms,
+        [(0, 0)] * (waveforms.ndim - 1)
+        + [(pad_left, max(total - pad_left - num_samples, 0))],
+    )[..., :total]
+    # blocks overlap by kernel_size - 1 samples, the first outputs of every
+    # circular convolution are wrapped around and dropped
+    blocks = np.lib.stride_tricks.sliding_window_view(padded, n_fft, -1)[..., ::step, :]
+    spectra = scipy.fft.rfft(blocks, axis=-1)
+    # out of place, the kernels may have more leading dimensions than the waveforms
+    spectra = spectra * _kernel_spectrum(kernels, n_fft)[..., np.newaxis, :]
+    convolved = scipy.fft.irfft(spectra, n_fft, axis=-1)[..., kernel_size - 1 :]
+    convolved = convolved.reshape(convolved.shape[:-2] + (-1,))[..., :length]
+    return convolved.astype(dtype, copy=False)
+
+
 def convolve1d(
     waveforms,
     kernel,
@@ -184,7 +480,7 @@ def convolve1d(
     use_fft=True,
     rotation_index=0,
 ):
-    """Use mindspore.conv1d to perform 1d padding and convolution.
+    """Perform 1d padding and convolution, see `batch_convolve`.
 
     Args:
         waveforms (np.ndarray): The audio signal to perform convolution on.
@@ -196,15 +492,16 @@ def convolve1d(
         stride (int): The number of units to stride for the
             convolution operations. If `use_fft` is True, this will not have
             effects.
-        groups (int): This option is passed to `conv1d` to split the input
-            into groups for convolution. Input channels
-            should be divisible by the number of groups.
+        groups (int): Kept for compatibility, every channel is convolved with
+            its own kernel.
         use_fft (bool): When `use_fft` is passed `True`, then compute the
-            convolution in the spectral domain using complex multiply.
+            circular convolution of the signal and the kernel.
             This is more efficient on CPU when the size of the kernel is large.
             WARNING: Without padding, circular convolution occurs.
             This makes little difference in the case of reverberation,
             but may make more difference with different kernels.
+            Otherwise, compute the valid cross-correlation, as a convolution
+            layer does.
         rotation_index (int): This option only applies if `use_fft` is true.
             If so, the kernel is rolled by this amount
             before convolution to shift the output location.
@@ -230,44 +527,25 @@ def convolve1d(
 
     # Padding can be a tuple (left_pad, right_pad) or an int
     if isinstance(padding, tuple):
-        waveforms = np.pad(waveforms, pad=padding, mode=pad_type)
+        waveforms = np.pad(waveforms, [(0, 0), (0, 0), padding], mode=pad_type)
 
-    # This approach uses FFT, which is more efficient if the kernel is large
     if use_fft:
-        # Pad kernel to same length as signal, ensuring correct alignment
-        zero_length = waveforms.shape[-1] - kernel.shape[-1]
-
+        num_samples = waveforms.shape[-1]
         # Handle case where signal is shorter
-        if zero_length < 0:
-            kernel = kernel[..., :zero_length]
-            zero_length = 0
+        kernel = kernel[..., :num_samples]
 
-        # Perform rotation to ensure alignment
-        zeros = np.zeros((kernel.shape[0], kernel.shape[1], zero_length))
-
-        after_index = kernel[..., rotation_index:]
-        before_index = kernel[..., :rotation_index]
-        kernel = np.concatenate((after_index, zeros, before_index), axis=-1)
-
-        result = np.fft.rfft(waveforms) * np.fft.rfft(kernel)
-        convolved = np.fft.irfft(result, n=waveforms.shape[-1])
+        # The circular convolution, rotated by rotation_index, is the linear
+        # convolution shifted by rotation_index with its tail wrapped around
+        full = batch_convolve(waveforms, kernel, method="fft")
+        convolved = full[..., :num_samples].copy()
+        convolved[..., : full.shape[-1] - num_samples] += full[..., num_samples:]
+        if rotation_index:
+            convolved = np.roll(convolved, -rotation_index, axis=-1)
 
     else:
-        # Todo: the implementation can be optimized here.
-        conv1d = Conv1d(
-            1,
-            1,
-            kernel_size=kernel.shape[-1],
-            stride=stride,
-            group=groups,
-            padding=0,
-            pad_mode="valid",
-        )
-        weight = ms.Tensor(np.expand_dims(kernel, 0))
-        weight.set_dtype(ms.float32)
-        conv1d.weight.set_data(weight)
-        data = ms.Tensor(waveforms).astype(ms.float32)
-        convolved = conv1d(data).asnumpy()
+        # a convolution layer computes the cross-correlation
+        convolved = batch_convolve(waveforms, kernel[..., ::-1], mode="valid")
+        convolved = convolved[..., ::stride]
 
     if n_dim == 1:  # meaning num_channel and batch dimension are expanded
         convolved = np.squeeze(np.squeeze(convolved, 1), 0)
@@ -314,7 +592,9 @@ def add_noise(samples, backgroundlist, min_snr_in_db, max_snr_in_db, mix_prob=1.
     Args:
         samples (np.ndarray): The audio signal to perform convolution on.The
         shape should be`[time]` or `[batch, time]` or `[batch, channels, time]`
-        backgroundlist (list): List of paths to background audio files.
+        backgroundlist (Union[list, NoiseBank]): List of paths to background
+        audio files, or a `NoiseBank` of them, which serves the noise without
+        reading the files again.
         min_snr_in_db(int): nimimum SNR in dB
         max_snr_in_db(int): maximum SNR in dB
         mix_prob(float): The probablity that the audio signals will be mix.
@@ -342,25 +622,18 @@ def add_noise(samples, backgroundlist, min_snr_in_db, max_snr_in_db, mix_prob=1.
         samples = np.expand_dims(samples, 1)
     batch, chanel, sample_lenth = samples.shape
 
-    missing_num_samples = sample_lenth
-    pieces = None
-    while missing_num_samples > 0:
-        background_path = random.choice(backgroundlist)
-        noise_audio, sr = read(background_path)
-        background_num_samples = len(noise_audio)
-
-        if background_num_samples > missing_num_samples:
-            num_samples = missing_num_samples
-            background_samples = rms_normalize(noise_audio[:num_samples])
-            missing_num_samples = 0
-        else:
-            background_samples = rms_normalize(noise_audio)
-            missing_num_samples -= background_num_samples
-
-        if pieces is not None:
-            pieces = np.append(pieces, background_samples)
-        else:
-            pieces = background_samples
+    if isinstance(backgroundlist, NoiseBank):
+        pieces = backgroundlist.crop(sample_lenth)
+    else:
+        missing_num_samples = sample_lenth
+        pieces = []
+        while missing_num_samples > 0:
+            background_path = random.choice(backgroundlist)
+            noise_audio, sr = read(background_path)
+            noise_audio = noise_audio[:missing_num_samples]
+            pieces.append(rms_normalize(noise_audio))
+            missing_num_samples -= len(noise_audio)
+        pieces = np.concatenate(pieces)
 
     background = rms_normalize(pieces.reshape(1, sample_lenth))
 
@@ -388,7 +661,8 @@ def add_reverb(samples, rirlist, reverb_prob=1.0):
         samples (np.ndarray): The audio signal to perform convolution on.
         The shape should be `[time]` or `[batch, time]`
         or `[batch, channels, time]`
-        rirlist (list): List of paths to RIR files.
+        rirlist (Union[list, RIRBank]): List of paths to RIR files, or a
+            `RIRBank` of them.
         reverb_prob(float): The chance that the audio signal will be
             reverbed.
 
@@ -416,8 +690,10 @@ def add_reverb(samples, rirlist, reverb_prob=1.0):
         batch, chanel, times = samples.shape
         samples = np.expand_dims(samples.reshape(batch * chanel, times), axis=2)
 
-    rir_path = random.choice(rirlist)
-    rir_waveform, sr = read(rir_path)
+    if isinstance(rirlist, RIRBank):
+        rir_waveform = rirlist.sample()
+    else:
+        rir_waveform, sr = read(random.choice(rirlist))
     res = reverberate(samples, rir_waveform)
 
     if orig_shapelen == 3:
@@ -634,7 +910,8 @@ def speed_perturb(waveform, orig_freq, speeds=[90, 100, 110], perturb_prob=1.0):
     samp_index = np.random.randint(0, len(speeds), (1,))[0]
     speed = speeds[samp_index]
     new_freq = orig_freq * speed // 100
-    perturbed_waveform = resample(waveform, orig_freq, new_freq)
+    # the few speed ratios share cached filter banks
+    perturbed_waveform = resample(waveform, orig_freq, new_freq, res_type="polyphase")
     return perturbed_waveform
 
 
@@ -827,6 +1104,13 @@ def time_stretch(waveforms, rate=None) -> np.ndarray:
 
 def _phase_vocoder(matrix, rate, hop_length=None, n_fft=None):
     """
+    Phase vocoder of a spectrogram of shape (..., freq, time), e.g.
+    [batch, freq, time].
+
+    The magnitudes and phase advances of all the frames are computed once,
+    interpolated at all the fractional time steps together, and the phase is
+    accumulated with a cumulative sum.
+
     .. [#] Ellis, D. P. W. "A phase vocoder in Matlab."
         Columbia University, 2002.
         http://www.ee.columbia.edu/~dpwe/resources/matlab/pvoc/
@@ -839,36 +1123,38 @@ def _phase_vocoder(matrix, rate, hop_length=None, n_fft=None):
         hop_length = int(n_fft // 4)
 
     time_steps = np.arange(0, matrix.shape[-1], rate, dtype=np.float64)
-
-    # Create an empty output array
-    shape = list(matrix.shape)
-    shape[-1] = len(time_steps)
-    d_stretch = np.zeros_like(matrix, shape=shape)
+    if len(time_steps) == 0:
+        return np.zeros_like(matrix, shape=matrix.shape[:-1] + (0,))
+    index = time_steps.astype(np.int64)
+    alpha = np.mod(time_steps, 1.0)
 
     # Expected phase advance in each bin
-    phi_advance = np.linspace(0, np.pi * hop_length, matrix.shape[-2])
-
-    # Phase accumulator; initialize to the first sample
-    phase_acc = np.angle(matrix[..., 0])
+    phi_advance = np.linspace(0, np.pi * hop_length, matrix.shape[-2])[:, np.newaxis]
 
     # Pad 0 columns to simplify boundary logic
     padding = [(0, 0) for _ in matrix.shape]
     padding[-1] = (0, 2)
-    matrix = np.pad(matrix, padding, mode="constant")
-
-    for t, step in enumerate(time_steps):
-        columns = matrix[..., int(step) : int(step + 2)]
-        alpha = np.mod(step, 1.0)
-        mag = (1.0 - alpha) * np.abs(columns[..., 0]) + alpha * np.abs(columns[..., 1])
-        phase_complex = np.cos(phase_acc) + 1j * np.sin(phase_acc)
-        if mag is not None:
-            phase_complex *= mag
-        d_stretch[..., t] = phase_complex
-        dphase = np.angle(columns[..., 1]) - np.angle(columns[..., 0]) - phi_advance
-        dphase = dphase - 2.0 * np.pi * np.round(dphase / (2.0 * np.pi))
-        phase_acc += phi_advance + dphase
-
-    return d_stretch
+    padded = np.pad(matrix, padding, mode="constant")
+    mag = np.abs(padded)
+    phase = np.angle(padded)
+
+    # Magnitude interpolated between the two frames around every step
+    mag = (1.0 - alpha) * mag[..., index] + alpha * mag[..., index + 1]
+
+    # Phase advance of every pair of frames, wrapped to [-pi, pi]
+    dphase = np.diff(phase, axis=-1) - phi_advance
+    dphase = dphase - 2.0 * np.pi * np.round(dphase / (2.0 * np.pi))
+    advance = (phi_advance + dphase[..., index]).astype(phase.dtype)
+
+    # Phase accumulator, initialized to the first frame
+    phase_acc = np.empty_like(advance)
+    phase_acc[..., 0] = phase[..., 0]
+    np.cumsum(advance[..., :-1], axis=-1, out=phase_acc[..., 1:])
+    phase_acc[..., 1:] += phase[..., :1]
+
+    d_stretch = np.cos(phase_acc) + 1j * np.sin(phase_acc)
+    d_stretch *= mag
+    return d_stretch.astype(matrix.dtype, copy=False)
 
 
 def pitch_shift(waveforms, sr, n_steps, bins_per_octave=12):
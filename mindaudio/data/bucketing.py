@@ -0,0 +1,132 @@
+"""
+Length-bucketed batching for sequence-to-sequence datasets.
+
+Padding every batch to the longest utterance of a corpus wastes most of the
+computation on short utterances, while padding every batch to its own longest
+utterance makes graph mode compile a graph per batch shape. Bucketing keeps a
+few static shapes: utterances are grouped by target length into buckets, and
+the batches of a bucket are padded to the shape of the bucket.
+"""
+
+import numpy as np
+
+__all__ = ["BucketBatchSampler"]
+
+
+class BucketBatchSampler:
+    """
+    Length-bucketed batches for `mindspore.dataset.GeneratorDataset`.
+
+    Utterances are grouped by target length into buckets. The batches of a
+    bucket are padded to a static shape: the target length of the bucket, and
+    its longest source sequence rounded up to a multiple of `pad_multiple`. A
+    batch holds `max_batch_frames` padded target frames, or `batch_size`
+    utterances. Buckets without a full batch are skipped, and utterances longer
+    than the last bucket are left out.
+
+    Batches are shuffled within buckets and re-formed every epoch from `seed`
+    and the epoch number, and every rank takes its own batches. The sampler
+    yields ``epoch * len(sampler) + i`` for the i-th batch of the rank in the
+    epoch, so a dataset source, even when copied to worker processes, rebuilds
+    the same batch with `batch`.
+
+    Args:
+        lengths (np.ndarray): Source and target length of every utterance, [N, 2].
+        bucket_lens (list): Increasing padded target length of every bucket.
+        batch_size (int, optional): Number of utterances of a batch, used
+            without `max_batch_frames`. Default: None.
+        max_batch_frames (int, optional): Number of padded target frames of a
+            batch. Default: None.
+        rank (int, optional): Rank of the process. Default: 0.
+        group_size (int, optional): Number of processes. Default: 1.
+        shuffle (bool, optional): Shuffle the batches. Default: True.
+        seed (int, optional): Seed of the shuffles. Default: 0.
+        pad_multiple (int, optional): The source padding is a multiple of it.
+            Default: 8.
+
+    Attributes:
+        src_pads (list): Padded source length of every bucket.
+        tgt_pads (np.ndarray): Padded target length of every bucket.
+        batch_sizes (list): Number of utterances of the batches of every bucket.
+
+    Examples:
+        >>> sampler = BucketBatchSampler(lengths, [192, 384, 742], max_batch_frames=35616)
+        >>> bucket, ids = sampler.batch(next(iter(sampler)))
+    """
+
+    def __init__(
+        self,
+        lengths,
+        bucket_lens,
+        batch_size=None,
+        max_batch_frames=None,
+        rank=0,
+        group_size=1,
+        shuffle=True,
+        seed=0,
+        pad_multiple=8,
+    ):
+        if batch_size is None and max_batch_frames is None:
+            raise ValueError("Either batch_size or max_batch_frames must be given.")
+        lengths = np.asarray(lengths)
+        self.rank = rank
+        self.group_size = group_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = -1
+        self.tgt_pads = np.asarray(bucket_lens, np.int64)
+        bucket = np.searchsorted(self.tgt_pads, lengths[:, 1])
+        self.buckets = [np.flatnonzero(bucket == b) for b in range(len(self.tgt_pads))]
+        self.src_pads = [
+            int(-(-lengths[ids, 0].max() // pad_multiple) * pad_multiple)
+            if len(ids)
+            else 0
+            for ids in self.buckets
+        ]
+        if max_batch_frames is not None:
+            self.batch_sizes = [
+                max(int(max_batch_frames // t), 1) for t in self.tgt_pads
+            ]
+        else:
+            self.batch_sizes = [batch_size] * len(self.tgt_pads)
+        num_batches = sum(
+            len(ids) // size for ids, size in zip(self.buckets, self.batch_sizes)
+        )
+        self.num_batches = num_batches // group_size
+        if self.num_batches == 0:
+            raise ValueError(
+                f"No bucket holds a full batch for each of the {group_size} ranks."
+            )
+        self._plan = (None, None)
+
+    def plan(self, epoch):
+        """(bucket, utterance indices) of every batch of the rank in `epoch`."""
+        if self._plan[0] == epoch:
+            return self._plan[1]
+        rng = np.random.RandomState((self.seed + epoch) & 0xFFFFFFFF)
+        batches = []
+        for b, (ids, size) in enumerate(zip(self.buckets, self.batch_sizes)):
+            if self.shuffle:
+                ids = rng.permutation(ids)
+            n = len(ids) // size
+            if n == 0:
+                continue
+            batches.extend((b, chunk) for chunk in np.split(ids[: n * size], n))
+        if self.shuffle:
+            batches = [batches[i] for i in rng.permutation(len(batches))]
+        batches = batches[self.rank :: self.group_size][: self.num_batches]
+        self._plan = (epoch, batches)
+        return batches
+
+    def batch(self, index):
+        """(bucket, utterance indices) of the batch yielded as `index`."""
+        epoch, i = divmod(int(index), self.num_batches)
+        return self.plan(epoch)[i]
+
+    def __iter__(self):
+        self.epoch += 1
+        start = self.epoch * self.num_batches
+        return iter(range(start, start + self.num_batches))
+
+    def __len__(self):
+        return self.num_batches
@@ -0,0 +1,390 @@
+"""
+Sharded, memory-mapped storage of precomputed features.
+
+A feature store is a directory of `.npy` shards, each holding the features of
+many utterances concatenated along the first (time) axis, and an `index.npz`
+file locating every utterance by its key, shard, row offset and number of
+rows. Features only need to share their trailing dimensions, so variable
+length (T, D) features are stored without padding.
+"""
+
+import hashlib
+import os
+from functools import partial
+
+import numpy as np
+
+from .sharding import map_shards
+
+__all__ = [
+    "FeatureStore",
+    "FeatureStoreWriter",
+    "write_feature_store",
+    "merge_feature_stores",
+]
+
+INDEX_FILE = "index.npz"
+
+
+def _index_path(root):
+    return os.path.join(root, INDEX_FILE)
+
+
+def _save_npy(path, array):
+    # Write to a temporary file first so an interrupted run never leaves a
+    # truncated shard behind.
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def _write_shard(root, keys, features, name=None):
+    """Concatenate `features` into one shard file, returns its index record."""
+    if name is None:
+        digest = hashlib.md5("\n".join(keys).encode("utf-8")).hexdigest()
+        name = "shard_{}.npy".format(digest[:16])
+    lengths = np.array([len(feature) for feature in features], dtype=np.int64)
+    _save_npy(os.path.join(root, name), np.concatenate(features, axis=0))
+    return name, list(keys), lengths
+
+
+def _load_index(root):
+    """The index arrays of the store in `root`, empty if there is none yet."""
+    path = _index_path(root)
+    if not os.path.isfile(path):
+        return {
+            "files": np.zeros(0, dtype=str),
+            "keys": np.zeros(0, dtype=str),
+            "shard": np.zeros(0, dtype=np.int32),
+            "offset": np.zeros(0, dtype=np.int64),
+            "length": np.zeros(0, dtype=np.int64),
+        }
+    with np.load(path) as index:
+        return {name: index[name] for name in index.files}
+
+
+def _save_index(root, index):
+    keys = index["keys"]
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    duplicated = keys[1:][keys[1:] == keys[:-1]]
+    if len(duplicated) > 0:
+        raise ValueError(
+            f"Keys must be unique in a feature store, got duplicates {duplicated[:5].tolist()}."
+        )
+    # keys are kept sorted so a lookup is a binary search
+    arrays = {"files": index["files"], "keys": keys}
+    for name in ("shard", "offset", "length"):
+        arrays[name] = index[name][order]
+    tmp_path = _index_path(root) + ".tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, _index_path(root))
+
+
+def _add_records(root, records):
+    """Append the (file, keys, lengths) records of new shards to the index."""
+    index = _load_index(root)
+    files = index["files"].tolist()
+    keys, shard, offset, length = [index["keys"]], [index["shard"]], [], []
+    offset.append(index["offset"])
+    length.append(index["length"])
+    for name, shard_keys, shard_lengths in records:
+        if len(shard_keys) == 0:
+            continue
+        keys.append(np.asarray(shard_keys, dtype=str))
+        shard.append(np.full(len(shard_keys), len(files), dtype=np.int32))
+        offset.append(np.cumsum(shard_lengths) - shard_lengths)
+        length.append(np.asarray(shard_lengths, dtype=np.int64))
+        files.append(name)
+    _save_index(
+        root,
+        {
+            "files": np.asarray(files, dtype=str),
+            "keys": np.concatenate(keys),
+            "shard": np.concatenate(shard).astype(np.int32),
+            "offset": np.concatenate(offset).astype(np.int64),
+            "length": np.concatenate(length).astype(np.int64),
+        },
+    )
+
+
+class FeatureStoreWriter:
+    """
+    Write features to a feature store one utterance at a time.
+
+    Features are buffered and written as a new shard every `shard_size`
+    utterances; the index is updated when the writer is closed. Opening a
+    writer on an existing store appends to it.
+
+    Args:
+        root (str): Directory of the feature store.
+        shard_size (int, optional): Number of utterances per shard. Default: 1000.
+        prefix (str, optional): Prefix of the shard file names. Writers appending
+            to the same store at the same time must use different prefixes.
+            Default: "shard".
+
+    Examples:
+        >>> with FeatureStoreWriter("./fbank") as writer:
+        ...     for key, path in wav_list:
+        ...         writer.add(key, fbank(read(path)[0]).T)
+    """
+
+    def __init__(self, root, shard_size=1000, prefix="shard"):
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.shard_size = shard_size
+        self.prefix = prefix
+        self.records = []
+        self._keys, self._features = [], []
+        existing = _load_index(root)["files"]
+        self._next_shard = sum(name.startswith(prefix + "_") for name in existing)
+
+    def add(self, key, feature):
+        """Add the feature of utterance `key`, an array of shape (T, ...)."""
+        feature = np.asarray(feature)
+        if feature.ndim == 0:
+            raise ValueError(f"Feature of {key} must have a time axis, got a scalar.")
+        self._keys.append(str(key))
+        self._features.append(feature)
+        if len(self._keys) >= self.shard_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered features as a new shard."""
+        if not self._keys:
+            return
+        name = "{}_{:06d}.npy".format(self.prefix, self._next_shard)
+        self.records.append(_write_shard(self.root, self._keys, self._features, name))
+        self._next_shard += 1
+        self._keys, self._features = [], []
+
+    def close(self):
+        """Write the last shard and update the index."""
+        self.flush()
+        _add_records(self.root, self.records)
+        self.records = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+
+
+def _extract_shard(root, load_fn, items):
+    keys = [str(key) for key, _ in items]
+    features = [np.asarray(load_fn(source)) for _, source in items]
+    return _write_shard(root, keys, features)
+
+
+def write_feature_store(
+    root, items, load_fn=np.load, num_workers=1, shard_size=1000, resume=True
+):
+    """
+    Compute and write the features of many utterances in parallel.
+
+    Every shard is extracted and written by one worker of a process pool, see
+    `map_shards`. Shards completed by an interrupted run are reused when
+    `resume` is set. The new utterances are appended to the store if it
+    already exists.
+
+    Args:
+        root (str): Directory of the feature store.
+        items (list): (key, source) pairs, `source` being passed to `load_fn`.
+        load_fn (callable, optional): Picklable function returning the feature of
+            a source as an array of shape (T, ...). Default: `np.load`, to pack
+            per-utterance `.npy` files.
+        num_workers (int, optional): Number of worker processes. Default: 1.
+        shard_size (int, optional): Number of utterances per shard. Default: 1000.
+        resume (bool, optional): Keep the progress of the shards in
+            `root/.progress` to resume an interrupted run. Default: True.
+
+    Returns:
+        FeatureStore, the reader of the store.
+
+    Examples:
+        >>> def load_fbank(path):
+        ...     return fbank(read(path)[0]).T
+        >>> store = write_feature_store("./fbank", wav_list, load_fbank, num_workers=8)
+    """
+    os.makedirs(root, exist_ok=True)
+    shard_dir = os.path.join(root, ".progress") if resume else None
+    records = map_shards(
+        partial(_extract_shard, root, load_fn),
+        list(items),
+        shard_dir,
+        num_workers=num_workers,
+        shard_size=shard_size,
+    )
+    # A run interrupted after updating the index but before clearing its
+    # progress already indexed its shards, named after their keys
+    indexed = set(_load_index(root)["files"].tolist())
+    _add_records(root, [record for record in records if record[0] not in indexed])
+    if shard_dir is not None:
+        for name in os.listdir(shard_dir):
+            os.remove(os.path.join(shard_dir, name))
+        os.rmdir(shard_dir)
+    return FeatureStore(root)
+
+
+def merge_feature_stores(root, sources):
+    """
+    Merge several feature stores into one, without copying the shards.
+
+    The index of the merged store refers to the shards of the source stores by
+    relative path, so they must be kept alongside it. Keys must be unique over
+    all sources.
+
+    Args:
+        root (str): Directory of the merged store, may be one of the sources.
+        sources (list): Directories of the stores to merge.
+
+    Returns:
+        FeatureStore, the reader of the merged store.
+
+    Examples:
+        >>> store = merge_feature_stores("./fbank", ["./fbank_part1", "./fbank_part2"])
+    """
+    os.makedirs(root, exist_ok=True)
+    records = []
+    for source in sources:
+        if os.path.abspath(source) == os.path.abspath(root):
+            continue
+        index = _load_index(source)
+        for shard, name in enumerate(index["files"]):
+            mask = index["shard"] == shard
+            order = np.argsort(index["offset"][mask])
+            path = os.path.relpath(os.path.join(source, name), root)
+            records.append(
+                (path, index["keys"][mask][order], index["length"][mask][order])
+            )
+    _add_records(root, records)
+    return FeatureStore(root)
+
+
+class FeatureStore:
+    """
+    Read features from a feature store.
+
+    The shards are memory-mapped on first use, so opening a store is cheap and
+    reading an utterance only touches its rows. Utterances are addressed by
+    position in the sorted keys or by key. For a full pass over the store,
+    `iterate` reads the shards sequentially in large blocks.
+
+    Args:
+        root (str): Directory of the feature store.
+
+    Examples:
+        >>> store = FeatureStore("./fbank")
+        >>> feature = store["BAC009S0002W0122"]
+        >>> for key, feature in store.iterate():
+        ...     pass
+    """
+
+    def __init__(self, root):
+        if not os.path.isfile(_index_path(root)):
+            raise FileNotFoundError(f"No feature store index found in {root}.")
+        self.root = root
+        index = _load_index(root)
+        self.files = index["files"]
+        self.keys = index["keys"]
+        self.shard = index["shard"]
+        self.offset = index["offset"]
+        self.lengths = index["length"]
+        self._shards = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return self.position(key) is not None
+
+    def position(self, key):
+        """Position of `key` in the store, None if it is not in it."""
+        pos = int(np.searchsorted(self.keys, key))
+        if pos < len(self.keys) and self.keys[pos] == key:
+            return pos
+        return None
+
+    def _open(self, shard):
+        if shard not in self._shards:
+            path = os.path.join(self.root, self.files[shard])
+            self._shards[shard] = np.load(path, mmap_mode="r")
+        return self._shards[shard]
+
+    def __getitem__(self, item):
+        if isinstance(item, str):
+            pos = self.position(item)
+            if pos is None:
+                raise KeyError(item)
+        else:
+            pos = int(item)
+            if pos < 0:
+                pos += len(self)
+            if not 0 <= pos < len(self):
+                raise IndexError(f"Index {item} out of range for {len(self)} features.")
+        start = self.offset[pos]
+        return self._open(self.shard[pos])[start : start + self.lengths[pos]]
+
+    def get(self, key, default=None):
+        """Feature of `key`, `default` if it is not in the store."""
+        if key not in self:
+            return default
+        return self[key]
+
+    def iterate(self, positions=None, readahead=64 * 1024 * 1024):
+        """
+        Iterate over (key, feature) pairs in storage order.
+
+        Consecutive utterances of a shard are read with one sequential copy of
+        up to `readahead` bytes, rather than one page fault at a time.
+
+        Args:
+            positions (np.ndarray, optional): Positions of the utterances to read,
+                None for the whole store. Default: None.
+            readahead (int, optional): Maximum number of bytes read at once.
+                Default: 64 MiB.
+
+        Returns:
+            Iterator of (str, np.ndarray), the key and the feature in memory.
+        """
+        if positions is None:
+            positions = np.arange(len(self))
+        positions = np.asarray(positions, dtype=np.int64)
+        positions = positions[
+            np.lexsort((self.offset[positions], self.shard[positions]))
+        ]
+        row_bytes = {}
+        start = 0
+        while start < len(positions):
+            shard = self.shard[positions[start]]
+            data = self._open(shard)
+            if shard not in row_bytes:
+                row_bytes[shard] = max(data[:1].nbytes, 1)
+            # extend the block over the following utterances of the same shard
+            # while they fit in the readahead budget
+            first = self.offset[positions[start]]
+            end = start + 1
+            while (
+                end < len(positions)
+                and self.shard[positions[end]] == shard
+                and (self.offset[positions[end]] + self.lengths[positions[end]] - first)
+                * row_bytes[shard]
+                <= readahead
+            ):
+                end += 1
+            last = self.offset[positions[end - 1]] + self.lengths[positions[end - 1]]
+            block = np.array(data[first:last])
+            for pos in positions[start:end]:
+                offset = self.offset[pos] - first
+                yield str(self.keys[pos]), block[offset : offset + self.lengths[pos]]
+            start = end
+
+    def __iter__(self):
+        return self.iterate()
+
+    def close(self):
+        """Release the memory maps of the shards."""
+        self._shards = {}
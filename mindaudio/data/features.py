@@ -1,10 +1,14 @@
 import mindspore as ms
 import mindspore.dataset.audio as msaudio
 import numpy as np
+import scipy.fft
+import scipy.signal
 from mindspore import Tensor, nn
 from mindspore.dataset.audio.utils import BorderType, NormMode, WindowType, create_dct
+from numpy.lib.stride_tricks import sliding_window_view
 from scipy.ndimage import median_filter
 
+from .filters import kaldi_mel_filterbank, mel_filterbank
 from .spectrum import amplitude_to_dB, istft, magphase, melspectrogram, stft
 
 __all__ = [
@@ -16,6 +20,7 @@ __all__ = [
     "complex_norm",
     "angle",
     "harmonic",
+    "FeatureExtractor",
 ]
 
 
@@ -557,3 +562,235 @@ def harmonic(y_input, **kwargs):
     y_harm = istft(stft_harm, length=y_input.shape[-1])
 
     return y_harm
+
+
+class FeatureExtractor:
+    """
+    Reusable, batched log-mel filter bank and MFCC extractor.
+
+    The window, the mel filter-bank and the DCT matrix are built once, when the
+    extractor is created, and a whole batch is framed, transformed and
+    projected with a few vectorized NumPy calls, in float32 from end to end.
+    The optional frame processing follows Kaldi: frames are dithered, their DC
+    offset removed and pre-emphasized, one frame at a time, before windowing.
+
+    Args:
+        sample_rate (int): Sampling rate of the waveforms (default=16000).
+        n_fft (int): Size of FFT, creates n_fft // 2 + 1 bins (default=512).
+        win_length (int): Window size, no more than `n_fft` (default=400).
+        hop_length (int): Length of hop between frames (default=160).
+        window (str): Window function, which can be 'hann' or 'hamming'
+        (periodic, as used by `stft`), 'povey' (Kaldi's default, a symmetric
+        hann window to the power of 0.85) or 'rectangular' (default='hann').
+        n_mels (int): Number of Mel filters (default=80).
+        f_min (float): Minimum frequency (default=0).
+        f_max (float): Maximum frequency (default=None, will be set to
+        sample_rate // 2; if not positive, an offset from sample_rate // 2).
+        mel_scale (str): Mel filter-bank, which can be 'htk', 'slaney' (see
+        `mel_filterbank`) or 'kaldi' (see `kaldi_mel_filterbank`)
+        (default='htk').
+        mel_norm (str): Normalization of the 'htk' and 'slaney' filters, None or
+        'slaney' (default=None).
+        n_mfcc (int): Number of Mel-frequency cepstrum coefficients, None to
+        return the log-mel filter bank (default=None).
+        center (bool): Whether to reflect pad every waveform by win_length // 2
+        on both sides, so frame t is centered on sample t * hop_length
+        (default=False, frames start at the first sample, as in Kaldi).
+        preemphasis (float): Pre-emphasis coefficient, 0 to disable
+        (default=0.0, Kaldi uses 0.97).
+        dither (float): Standard deviation of the Gaussian noise added to the
+        frames, 0 to disable (default=0.0).
+        remove_dc_offset (bool): Whether to subtract the mean of every frame
+        (default=False).
+        power (float): Exponent of the magnitude spectrum (default=2.0).
+        log_floor (float): Floor of the mel energies before the log
+        (default=float32 machine epsilon).
+        seed (int): Seed of the dither noise (default=None).
+
+    Examples:
+        >>> import numpy as np
+        >>> import mindaudio.data.features as features
+        >>> extractor = features.FeatureExtractor(n_mels=80, window="povey",
+        ...     mel_scale="kaldi", f_min=20, preemphasis=0.97, remove_dc_offset=True)
+        >>> inputs = np.random.random([10, 16000])
+        >>> feats, feat_lengths = extractor(inputs, lengths=[16000] * 5 + [8000] * 5)
+        >>> feats.shape
+        (10, 80, 98)
+    """
+
+    def __init__(
+        self,
+        sample_rate=16000,
+        n_fft=512,
+        win_length=400,
+        hop_length=160,
+        window="hann",
+        n_mels=80,
+        f_min=0.0,
+        f_max=None,
+        mel_scale="htk",
+        mel_norm=None,
+        n_mfcc=None,
+        center=False,
+        preemphasis=0.0,
+        dither=0.0,
+        remove_dc_offset=False,
+        power=2.0,
+        log_floor=float(np.finfo(np.float32).eps),
+        seed=None,
+    ):
+        if win_length > n_fft:
+            raise ValueError(
+                f"win_length must be no more than n_fft, got {win_length} > {n_fft}."
+            )
+        if n_mfcc is not None and n_mfcc > n_mels:
+            raise ValueError(
+                "The number of MFCC coefficients must be no more than # mel bins."
+            )
+        self.sample_rate = sample_rate
+        self.n_fft = n_fft
+        self.win_length = win_length
+        self.hop_length = hop_length
+        self.center = center
+        self.preemphasis = float(preemphasis)
+        self.dither = float(dither)
+        self.remove_dc_offset = remove_dc_offset
+        self.power = power
+        self.log_floor = log_floor
+        self.rng = np.random.default_rng(seed)
+
+        if window == "povey":
+            self.window = np.hanning(win_length) ** 0.85
+        elif window == "rectangular":
+            self.window = np.ones(win_length)
+        elif window in ("hann", "hamming"):
+            self.window = scipy.signal.get_window(window, win_length, fftbins=True)
+        else:
+            raise ValueError(
+                "window must be hann, hamming, povey or rectangular, " f"got {window}."
+            )
+        self.window = self.window.astype(np.float32)
+
+        if mel_scale == "kaldi":
+            self.mel_fb = kaldi_mel_filterbank(
+                sample_rate, n_fft, n_mels, fmin=f_min, fmax=f_max
+            )
+        elif mel_scale in ("htk", "slaney"):
+            if f_max is not None and f_max <= 0:
+                f_max += sample_rate / 2
+            self.mel_fb = mel_filterbank(
+                sample_rate,
+                n_fft,
+                n_mels,
+                fmin=f_min,
+                fmax=f_max,
+                norm=mel_norm,
+                htk=mel_scale == "htk",
+            )
+        else:
+            raise ValueError(
+                f"mel_scale must be htk, slaney or kaldi, got {mel_scale}."
+            )
+        # (n_mfcc, n_mels), applied as dct @ log_mel
+        self.dct = None
+        if n_mfcc is not None:
+            self.dct = np.ascontiguousarray(
+                create_dct(n_mfcc, n_mels, NormMode.ORTHO).T, dtype=np.float32
+            )
+
+    @property
+    def n_feats(self):
+        """Number of features per frame."""
+        return self.mel_fb.n_mels if self.dct is None else self.dct.shape[0]
+
+    def num_frames(self, lengths):
+        """Number of frames of waveforms of `lengths` samples."""
+        lengths = np.asarray(lengths, dtype=np.int64)
+        if self.center:
+            return 1 + lengths // self.hop_length
+        frames = 1 + (lengths - self.win_length) // self.hop_length
+        return np.where(lengths < self.win_length, 0, frames)
+
+    def _pad(self, waveforms, lengths):
+        # reflect every row at its own length, not at the end of the batch
+        pad = self.win_length // 2
+        padded = np.zeros(
+            (waveforms.shape[0], waveforms.shape[1] + 2 * pad), dtype=np.float32
+        )
+        for row, (waveform, length) in enumerate(zip(waveforms, lengths)):
+            mode = "reflect" if length > pad else "constant"
+            padded[row, : length + 2 * pad] = np.pad(waveform[:length], pad, mode)
+        return padded
+
+    def _frames(self, waveforms, num_frames):
+        frames = sliding_window_view(waveforms, self.win_length, axis=-1)
+        frames = frames[:, : num_frames * self.hop_length : self.hop_length]
+        frames = frames.astype(np.float32)
+        if self.dither > 0:
+            frames += self.dither * self.rng.standard_normal(
+                frames.shape, dtype=np.float32
+            )
+        if self.remove_dc_offset:
+            frames -= frames.mean(axis=-1, keepdims=True)
+        if self.preemphasis > 0:
+            frames[..., 1:] -= self.preemphasis * frames[..., :-1]
+            frames[..., 0] *= 1 - self.preemphasis
+        frames *= self.window
+        return frames
+
+    def __call__(self, waveforms, lengths=None):
+        """
+        Extract the features of a batch of waveforms.
+
+        Args:
+            waveforms (np.ndarray): Audio signals with shape [time] or
+            [batch, time], padded to the longest one.
+            lengths (np.ndarray): Number of valid samples of every waveform,
+            None if they are not padded (default=None).
+
+        Returns:
+            - np.ndarray, float32 features with shape [n_feats, frames] or
+              [batch, n_feats, frames]. The frames past the end of a padded
+              waveform are zero.
+            - np.ndarray, the number of frames of every waveform, only
+              returned with `lengths`.
+        """
+        waveforms = np.asarray(waveforms, dtype=np.float32)
+        squeeze = waveforms.ndim == 1
+        waveforms = np.atleast_2d(waveforms)
+        if waveforms.ndim != 2:
+            raise TypeError(
+                "Input dimension must be 1 or 2, but got {}".format(waveforms.ndim)
+            )
+        if lengths is None:
+            valid = np.full(waveforms.shape[0], waveforms.shape[1], dtype=np.int64)
+        else:
+            valid = np.minimum(np.asarray(lengths, dtype=np.int64), waveforms.shape[1])
+        if self.center:
+            waveforms = self._pad(waveforms, valid)
+        feat_lengths = self.num_frames(valid)
+        # the padding is already in the waveforms, frame them as is
+        num_frames = max(
+            0, 1 + (waveforms.shape[1] - self.win_length) // self.hop_length
+        )
+
+        feats = np.zeros(
+            (waveforms.shape[0], self.n_feats, num_frames), dtype=np.float32
+        )
+        if num_frames > 0:
+            spec = scipy.fft.rfft(self._frames(waveforms, num_frames), n=self.n_fft)
+            spec = np.abs(spec)
+            if self.power != 1.0:
+                spec **= self.power
+            # (batch, frames, freq) -> (batch, freq, frames)
+            spec = np.ascontiguousarray(spec.transpose((0, 2, 1)))
+            mel = self.mel_fb(spec).astype(np.float32, copy=False)
+            feats = np.log(np.maximum(mel, self.log_floor, out=mel), out=mel)
+            if self.dct is not None:
+                feats = self.dct @ feats
+            feats *= (np.arange(num_frames) < feat_lengths[:, None])[:, None, :]
+        if squeeze:
+            feats = feats[0]
+        if lengths is None:
+            return feats
+        return feats, feat_lengths
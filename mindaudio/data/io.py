@@ -1,5 +1,7 @@
 import collections
 import io
+import os
+import pickle
 import struct
 import sys
 import warnings
@@ -10,6 +12,10 @@ import numpy as np
 __all__ = [
     "read",
     "write",
+    "open_write",
+    "iter_blocks",
+    "info",
+    "InfoIndex",
 ]
 
 
@@ -424,6 +430,36 @@ def _fmt_chunk(file_to_read, endian):
     )
 
 
+def _sample_dtype(format_tag, bit_depth, bytes_per_sample, fmt):
+    if format_tag == WaveFormat.PCM:
+        if 1 <= bit_depth <= 8:
+            return "u1"  # WAV of 8-bit integer or less are unsigned
+        elif bytes_per_sample in {3, 5, 6, 7}:
+            # No compatible dtype.  Load as raw bytes for reshaping later.
+            return "V1"
+        elif bit_depth <= 64:
+            # Remaining bit depths can map directly to signed numpy dtypes
+            return f"{fmt}i{bytes_per_sample}"
+        raise ValueError(
+            f"Unsupported bit depth: the WAV file has {bit_depth}-bit integer data."
+        )
+    elif format_tag == WaveFormat.IEEE_FLOAT:
+        if bit_depth in {32, 64}:
+            return f"{fmt}f{bytes_per_sample}"
+        raise ValueError(
+            "Unsupported bit depth: the WAV file "
+            f"has {bit_depth}-bit floating-point data."
+        )
+    try:
+        format_name = WaveFormat(format_tag).name
+    except ValueError:
+        format_name = f"{format_tag:#06x}"
+    raise ValueError(
+        f"Unknown wave file format: {format_name}. Supported "
+        "formats: " + ", ".join(x.name for x in SUPPORTED_WAVE_FORMATS)
+    )
+
+
 def _data_chunk(
     file_to_read,
     format_tag,
@@ -447,41 +483,7 @@ def _data_chunk(
     all_samples = size // bytes_per_sample
     n_samples = all_samples
 
-    if format_tag == WaveFormat.PCM:
-        if 1 <= bit_depth <= 8:
-            dtype = "u1"  # WAV of 8-bit integer or less are unsigned
-        elif bytes_per_sample in {3, 5, 6, 7}:
-            # No compatible dtype.  Load as raw bytes for reshaping later.
-            dtype = "V1"
-        elif bit_depth <= 64:
-            # Remaining bit depths can map directly to signed numpy dtypes
-            dtype = f"{fmt}i{bytes_per_sample}"
-        else:
-            raise ValueError(
-                "Unsupported bit depth: the WAV file "
-                f"has {bit_depth}-bit integer data."
-            )
-    elif format_tag == WaveFormat.IEEE_FLOAT:
-        if bit_depth in {32, 64}:
-            dtype = f"{fmt}f{bytes_per_sample}"
-            # if bit_depth == 32:
-            #     dtype = f'{fmt}nf'
-            # else:
-            #     dtype = f'{fmt}nd'
-        else:
-            raise ValueError(
-                "Unsupported bit depth: the WAV file "
-                f"has {bit_depth}-bit floating-point data."
-            )
-    else:
-        try:
-            format_name = WaveFormat(format_tag).name
-        except ValueError:
-            format_name = f"{format_tag:#06x}"
-        raise ValueError(
-            f"Unknown wave file format: {format_name}. Supported "
-            "formats: " + ", ".join(x.name for x in SUPPORTED_WAVE_FORMATS)
-        )
+    dtype = _sample_dtype(format_tag, bit_depth, bytes_per_sample, fmt)
     start = file_to_read.tell()
 
     ignore_samples = 0
@@ -549,7 +551,162 @@ def _skip_unknown_chunk(file_to_read, endian):
             file_to_read.seek(1, 1)
 
 
-def read(file, offset=0.0, duration=None):
+WavHeader = collections.namedtuple(
+    "WavHeader",
+    [
+        "format_tag",
+        "channels",
+        "samplerate",
+        "block_align",
+        "bit_depth",
+        "endian",
+        "data_offset",
+        "data_size",
+    ],
+)
+
+
+def _wav_header(file_to_read):
+    """Walk the RIFF chunks up to the data chunk without reading any samples."""
+    str1 = file_to_read.read(4)
+    if str1 == b"RIFF":
+        endian = Endian.small_endian
+        fmt = "<"
+    elif str1 == b"RIFX":
+        endian = Endian.big_endian
+        fmt = ">"
+    else:
+        raise ValueError(
+            f"File format {repr(str1)} not understood. Only "
+            "'RIFF' and 'RIFX' supported."
+        )
+    file_size = struct.unpack(f"{fmt}I", file_to_read.read(4))[0] + 8
+    str3 = file_to_read.read(4)
+    if str3 != b"WAVE":
+        raise ValueError(f"Not a WAV file. RIFF form type is {repr(str3)}.")
+
+    fmt_chunk_info = None
+    while file_to_read.tell() < file_size:
+        chunk = file_to_read.read(4)
+        if len(chunk) < 4:
+            raise ValueError("Unexpected end of file.")
+        if chunk == b"fmt ":
+            fmt_chunk_info = _fmt_chunk(file_to_read, endian)
+        elif chunk == b"data":
+            if fmt_chunk_info is None:
+                raise ValueError("No fmt chunk before data")
+            format_tag, channels, samplerate, _, block_align, bit_depth = fmt_chunk_info
+            size = struct.unpack(f"{fmt}I", file_to_read.read(4))[0]
+            return WavHeader(
+                format_tag,
+                channels,
+                samplerate,
+                block_align,
+                bit_depth,
+                endian,
+                file_to_read.tell(),
+                size,
+            )
+        else:
+            _skip_unknown_chunk(file_to_read, endian)
+    raise ValueError("No data chunk found.")
+
+
+def _scale_factor(native, dtype):
+    # Integer PCM is mapped to [-1, 1) the same way `read` always did
+    native = np.dtype(native)
+    if not np.issubdtype(dtype, np.floating) or native.kind != "i":
+        return None
+    if native.itemsize == 4:
+        return 1.0 / 2147483648
+    if native.itemsize == 2:
+        return 1.0 / 32768
+    return None
+
+
+class ScaledMemmap:
+    """
+    Read-only, lazily scaled view over a memory-mapped WAV data chunk.
+
+    Indexing returns a new array of `dtype` holding only the requested samples,
+    so cropping an hours-long recording never touches the rest of the file.
+
+    Args:
+        data (np.memmap): Native-dtype samples of shape (frames,) or (frames, channels).
+        dtype (str, np.dtype): Floating dtype of the scaled output.
+    """
+
+    def __init__(self, data, dtype="float32"):
+        self.data = data
+        self.dtype = np.dtype(dtype)
+        self.scale = _scale_factor(data.dtype, self.dtype)
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def ndim(self):
+        return self.data.ndim
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def __getitem__(self, key):
+        out = np.asarray(self.data[key]).astype(self.dtype)
+        if self.scale is not None:
+            out *= self.dtype.type(self.scale)
+        return out
+
+    def __array__(self, dtype=None):
+        out = self[...]
+        return out if dtype is None else out.astype(dtype)
+
+
+def _read_mmap(file, offset, duration, dtype):
+    if hasattr(file, "read"):
+        header = _wav_header(file)
+        file.seek(0)
+    else:
+        with open(file, "rb") as file_to_read:
+            header = _wav_header(file_to_read)
+
+    fmt = ">" if header.endian == Endian.big_endian else "<"
+    native = _sample_dtype(
+        header.format_tag,
+        header.bit_depth,
+        header.block_align // header.channels,
+        fmt,
+    )
+    if native == "V1":
+        raise ValueError(
+            f"{header.bit_depth}-bit samples have no numpy dtype and cannot be "
+            "memory-mapped, use read(..., mmap=False) instead."
+        )
+
+    n_frames = header.data_size // header.block_align
+    start = min(int(offset * header.samplerate), n_frames) if offset > 0 else 0
+    count = n_frames - start
+    if duration:
+        count = min(count, int(duration * header.samplerate))
+    shape = (count,) if header.channels == 1 else (count, header.channels)
+
+    if count == 0:
+        audio = np.empty(shape, dtype=native)
+    else:
+        audio = np.memmap(
+            file,
+            dtype=native,
+            mode="r",
+            offset=header.data_offset + start * header.block_align,
+            shape=shape,
+        )
+    if dtype is not None:
+        audio = ScaledMemmap(audio, dtype)
+    return audio, header.samplerate
+
+
+def read(file, offset=0.0, duration=None, mmap=False, dtype=None):
     """
     Open a WAV file.
     Return data and the sample rate
@@ -563,6 +720,18 @@ def read(file, offset=0.0, duration=None):
         start reading after this time (in seconds)
     duration : float
         only load up to this much audio (in seconds)
+    mmap : bool
+        Whether to memory-map the data chunk instead of reading it. The
+        returned array is a read-only `np.memmap` over the (offset/duration
+        cropped) samples, so no data is copied until it is indexed. Requires
+        a path or a real file object; 24-bit PCM cannot be mapped.
+    dtype : str or np.dtype, optional
+        Output sample type. ``None`` keeps the default behaviour: integer PCM
+        is scaled to float64 when reading eagerly, and native samples are
+        returned as-is with ``mmap=True``. A floating dtype (e.g. ``"float32"``)
+        scales integer PCM into [-1, 1) with that precision; with
+        ``mmap=True`` the scaling is applied lazily by a :class:`ScaledMemmap`
+        whenever it is indexed.
 
     Returns
     -------
@@ -640,6 +809,9 @@ def read(file, offset=0.0, duration=None):
     >>> plt.show()
 
     """
+    if mmap:
+        return _read_mmap(file, offset, duration, dtype)
+
     if hasattr(file, "read"):
         file_to_read = file
     else:
@@ -738,6 +910,13 @@ def read(file, offset=0.0, duration=None):
             file_to_read.seek(0)
 
     # Unified output format
+    if dtype is not None:
+        scale = _scale_factor(audio.dtype, dtype)
+        audio = audio.astype(dtype)
+        if scale is not None:
+            audio *= audio.dtype.type(scale)
+        return audio, samplerate
+
     audiodtype = audio.dtype
     if audiodtype == "int32":
         audio = audio / 2147483648
@@ -883,6 +1062,377 @@ def write(file, data, sr):
             fid.seek(0)
 
 
+class WavWriter:
+    """
+    Incremental WAV writer returned by :func:`open_write`.
+
+    The header is written with empty sizes when the file is opened, blocks are
+    appended as they come, and the RIFF, fact and data sizes are patched when
+    the writer is closed, so the memory used does not depend on the length of
+    the output. The output must be seekable.
+
+    Args
+    ----------
+    file : string or open file handle
+        Output wav file.
+    sr : int
+        The sample rate (in samples/sec).
+    channels : int
+        Number of channels.
+    dtype : str or np.dtype
+        Sample type of the file, as for :func:`write`. Blocks are cast to it
+        without scaling.
+    """
+
+    def __init__(self, file, sr, channels=1, dtype="float32"):
+        self.dtype = np.dtype(dtype)
+        dkind = self.dtype.kind
+        if not (
+            dkind == "i" or dkind == "f" or (dkind == "u" and self.dtype.itemsize == 1)
+        ):
+            raise ValueError("Unsupported data type '%s'" % self.dtype)
+        self.dtype = self.dtype.newbyteorder("<")
+        self.sr = sr
+        self.channels = channels
+        self.frames = 0
+        self.closed = False
+        self._own = not hasattr(file, "write")
+        self.fid = open(file, "wb") if self._own else file
+        self._start = self.fid.tell()
+
+        bit_depth = self.dtype.itemsize * 8
+        block_align = channels * self.dtype.itemsize
+        is_pcm = dkind == "i" or dkind == "u"
+        fmt_chunk_data = struct.pack(
+            "<HHIIHH",
+            WaveFormat.PCM if is_pcm else WaveFormat.IEEE_FLOAT,
+            channels,
+            sr,
+            sr * block_align,
+            block_align,
+            bit_depth,
+        )
+        if not is_pcm:
+            # add cbSize field for non-PCM files
+            fmt_chunk_data += b"\x00\x00"
+
+        header_data = b"RIFF" + b"\x00\x00\x00\x00" + b"WAVE"
+        header_data += b"fmt " + struct.pack("<I", len(fmt_chunk_data))
+        header_data += fmt_chunk_data
+        self._fact_pos = None
+        if not is_pcm:
+            # fact chunk (non-PCM files), the frame count is patched on close
+            self._fact_pos = self._start + len(header_data) + 8
+            header_data += b"fact" + struct.pack("<II", 4, 0)
+        header_data += b"data" + b"\x00\x00\x00\x00"
+        self._header_size = len(header_data)
+        self.fid.write(header_data)
+
+    def write(self, block):
+        """
+        Append a block of samples, of shape (frames,) or (frames, channels).
+        """
+        block = np.asarray(block)
+        if block.ndim == 1 and self.channels == 1:
+            frames = block.shape[0]
+        elif block.ndim == 2 and block.shape[1] == self.channels:
+            frames = block.shape[0]
+        else:
+            raise ValueError(
+                f"Expected blocks of {self.channels} channel(s), got shape {block.shape}."
+            )
+        size = (self.frames + frames) * self.channels * self.dtype.itemsize
+        if self._header_size - 8 + size > 0xFFFFFFFF:
+            raise ValueError("Data exceeds wave file size limit")
+        # ravel gives a c-contiguous buffer
+        self.fid.write(block.astype(self.dtype, copy=False).ravel().view("b").data)
+        self.frames += frames
+
+    def close(self):
+        """Patch the chunk sizes into the header and close the file."""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            data_size = self.frames * self.channels * self.dtype.itemsize
+            if data_size % 2:
+                # pad byte after an odd sized chunk
+                self.fid.write(b"\x00")
+            end = self.fid.tell()
+            self.fid.seek(self._start + 4)
+            self.fid.write(struct.pack("<I", end - self._start - 8))
+            if self._fact_pos is not None:
+                self.fid.seek(self._fact_pos)
+                self.fid.write(struct.pack("<I", self.frames))
+            self.fid.seek(self._start + self._header_size - 4)
+            self.fid.write(struct.pack("<I", data_size))
+        finally:
+            if self._own:
+                self.fid.close()
+            else:
+                self.fid.seek(self._start)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_write(file, sr, channels=1, dtype="float32"):
+    """
+    Open a WAV file to write it block by block.
+
+    Args
+    ----------
+    file : string or open file handle
+        Output wav file, must be seekable.
+    sr : int
+        The sample rate (in samples/sec).
+    channels : int
+        Number of channels.
+    dtype : str or np.dtype
+        Sample type of the file, see :func:`write` for the supported types.
+
+    Returns
+    -------
+    writer : WavWriter
+        Writer whose ``write(block)`` appends samples. Use it as a context
+        manager, or call ``close()`` to finalize the header.
+
+    Examples
+    --------
+    >>> with open_write("long.wav", 22050, dtype="int16") as writer:
+    ...     for block in iter_blocks("input.wav", 22050, dtype="float32"):
+    ...         writer.write(np.clip(block * 32768, -32768, 32767))
+    """
+    return WavWriter(file, sr, channels, dtype)
+
+
+def _readinto(file_to_read, buffer):
+    """Fill `buffer` from the file, returns the number of bytes read."""
+    total = 0
+    view = memoryview(buffer)
+    while total < len(view):
+        count = file_to_read.readinto(view[total:])
+        if not count:
+            break
+        total += count
+    return total
+
+
+def iter_blocks(file, block_size, overlap=0, dtype=None):
+    """
+    Read a WAV file as a sequence of fixed-size blocks.
+
+    Only one block is held in memory: every block is read into the same
+    buffer, after moving the `overlap` last frames of the previous block to
+    its front. Copy a block to keep it past the next iteration.
+
+    Args
+    ----------
+    file : string or open file handle
+        Input WAV file.
+    block_size : int
+        Number of frames per block.
+    overlap : int
+        Number of frames shared by consecutive blocks, the hop between blocks
+        is ``block_size - overlap``.
+    dtype : str or np.dtype, optional
+        Output sample type. ``None`` yields the native samples, a floating dtype
+        scales integer PCM into [-1, 1), as with :func:`read`.
+
+    Yields
+    ------
+    block : np.ndarray
+        Samples of shape (block_size,) or (block_size, channels). The last
+        block is shorter if the file does not end on a block boundary.
+
+    Examples
+    --------
+    >>> for block in iter_blocks('./samples/ASR/BAC009S0002W0122.wav', 16000, 400, "float32"):
+    ...     energy = np.sum(block**2)
+    """
+    if not 0 <= overlap < block_size:
+        raise ValueError(
+            f"overlap must be in [0, block_size), got {overlap} for {block_size}."
+        )
+    file_to_read = file if hasattr(file, "read") else open(file, "rb")
+    try:
+        header = _wav_header(file_to_read)
+        fmt = ">" if header.endian == Endian.big_endian else "<"
+        native = _sample_dtype(
+            header.format_tag,
+            header.bit_depth,
+            header.block_align // header.channels,
+            fmt,
+        )
+        if native == "V1":
+            raise ValueError(
+                f"{header.bit_depth}-bit samples have no numpy dtype and cannot be "
+                "read in blocks, use read() instead."
+            )
+        native = np.dtype(native)
+        shape = (block_size,) if header.channels == 1 else (block_size, header.channels)
+        frames = np.empty(shape, dtype=native)
+        raw = frames.reshape(-1).view(np.uint8)
+        frame_bytes = header.channels * native.itemsize
+        out, scale = None, None
+        if dtype is not None:
+            out = np.empty(shape, dtype=dtype)
+            scale = _scale_factor(native, out.dtype)
+
+        remaining = header.data_size // frame_bytes
+        hop = block_size - overlap
+        filled = 0
+        while remaining > 0:
+            count = min(block_size - filled, remaining)
+            buffer = raw[filled * frame_bytes : (filled + count) * frame_bytes]
+            got = _readinto(file_to_read, buffer) // frame_bytes
+            if got == 0:
+                break
+            remaining = remaining - got if got == count else 0
+            filled += got
+            if out is None:
+                yield frames[:filled]
+            else:
+                out[:filled] = frames[:filled]
+                if scale is not None:
+                    out[:filled] *= out.dtype.type(scale)
+                yield out[:filled]
+            if filled < block_size:
+                break
+            frames[:overlap] = frames[hop:]
+            filled = overlap
+    finally:
+        if not hasattr(file, "read"):
+            file_to_read.close()
+        else:
+            file_to_read.seek(0)
+
+
+AudioInfo = collections.namedtuple(
+    "AudioInfo", ["samplerate", "channels", "bit_depth", "frames"]
+)
+
+
+def info(file):
+    """
+    Read the metadata of a WAV file without decoding its samples.
+
+    Only the RIFF, fmt and data chunk headers are parsed, so the cost does not
+    depend on the length of the recording.
+
+    Args
+    ----------
+    file : string or open file handle
+        Input WAV file.
+
+    Returns
+    -------
+    info : AudioInfo
+        Named tuple of ``(samplerate, channels, bit_depth, frames)``. The
+        duration in seconds is ``frames / samplerate``.
+
+    Examples
+    --------
+    >>> meta = info('./samples/ASR/BAC009S0002W0122.wav')
+    >>> duration = meta.frames / meta.samplerate
+    """
+    if hasattr(file, "read"):
+        try:
+            header = _wav_header(file)
+        finally:
+            file.seek(0)
+    else:
+        with open(file, "rb") as file_to_read:
+            header = _wav_header(file_to_read)
+
+    return AudioInfo(
+        header.samplerate,
+        header.channels,
+        header.bit_depth,
+        header.data_size // header.block_align,
+    )
+
+
+class InfoIndex:
+    """
+    Persistent cache of :func:`info` results.
+
+    Entries are keyed by the absolute path and validated against the file's
+    modification time and size, so a stale entry is re-probed transparently.
+    The index is pickled to `index_file` on :meth:`save` (or when leaving a
+    ``with`` block), which makes re-running a dataset preparation nearly free.
+
+    Args:
+        index_file (str, optional): Where the index is stored. If None, the index
+            only lives in memory. Default: None.
+
+    Examples:
+        >>> with InfoIndex('./wav_info_index.pkl') as index:
+        ...     meta = index.info('./samples/ASR/BAC009S0002W0122.wav')
+    """
+
+    def __init__(self, index_file=None):
+        self.index_file = index_file
+        self.entries = {}
+        self.dirty = False
+        if index_file is not None and os.path.isfile(index_file):
+            with open(index_file, "rb") as f:
+                self.entries = pickle.load(f)
+
+    def info(self, path):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        entry = self.entries.get(path)
+        if (
+            entry is not None
+            and entry[0] == stat.st_mtime_ns
+            and entry[1] == stat.st_size
+        ):
+            return AudioInfo(*entry[2])
+        meta = info(path)
+        self.entries[path] = (stat.st_mtime_ns, stat.st_size, tuple(meta))
+        self.dirty = True
+        return meta
+
+    def export(self, paths):
+        """Raw entries of `paths` that are known, e.g. to hand over to another process."""
+        entries = {}
+        for path in paths:
+            path = os.path.abspath(path)
+            if path in self.entries:
+                entries[path] = self.entries[path]
+        return entries
+
+    def update(self, entries):
+        """Merge raw entries, e.g. the ones exported by another process."""
+        if entries:
+            self.entries.update(entries)
+            self.dirty = True
+
+    def save(self):
+        if self.index_file is None or not self.dirty:
+            return
+        # Write to a temporary file first so an interrupted run never leaves
+        # a truncated index behind.
+        tmp_file = self.index_file + ".tmp"
+        with open(tmp_file, "wb") as f:
+            pickle.dump(self.entries, f)
+        os.replace(tmp_file, self.index_file)
+        self.dirty = False
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.save()
+
+
 PaddedData = collections.namedtuple("PaddedData", ["data", "lengths"])
 
 
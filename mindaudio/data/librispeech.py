@@ -1,4 +1,5 @@
 import argparse
+import functools
 import json
 import os
 import shutil
@@ -7,6 +8,8 @@ from pathlib import Path
 
 import wget
 
+from mindaudio.data.sharding import map_shards
+
 LIBRI_SPEECH_URLS = {
     "train": [
         "http://www.openslr.org/resources/12/train-clean-100.tar.gz",
@@ -41,7 +44,46 @@ def creat_txt_file(content, root_path, txt_transcript_path):
         f.flush()
 
 
-def create_json_dict(data_path):
+def _move_samples(txt_paths, split_dir):
+    """
+    Writes the transcripts of a shard of LibriSpeech chapter files and moves
+    their audio into `split_dir`, returning the manifest samples.
+    """
+    wav_dir = os.path.join(split_dir, "wav")
+    samples = []
+    for txt_path in txt_paths:
+        base_path = str(txt_path).split(".")[0]
+        transcriptions = open(txt_path).read().strip().split("\n")
+        transcriptions = {t.split()[0]: " ".join(t.split()[1:]) for t in transcriptions}
+        for item in transcriptions.items():
+            new_wav_path = os.path.join("wav", str(item[0]) + ".wav")
+            new_txt_path = os.path.join("txt", str(item[0]) + ".txt")
+            transcript = item[1]
+            creat_txt_file(transcript, split_dir, new_txt_path)
+            samples.append(
+                {
+                    "wav_path": new_wav_path,
+                    "txt_path": new_txt_path,
+                }
+            )
+            wav_path = base_path + "-" + str(item[0].split("-")[-1]) + ".flac"
+            # Already moved by an interrupted run whose shard was not saved. An
+            # archive extracted again replaces the copy moved by that run.
+            if os.path.exists(wav_path):
+                shutil.move(wav_path, os.path.join(wav_dir, os.path.basename(wav_path)))
+    return samples
+
+
+def create_json_dict(data_path, num_workers=1, shard_size=100):
+    """
+    Extracts the LibriSpeech archives and writes one json manifest per split.
+
+    The chapter transcripts of each archive are processed in shards of
+    `shard_size` files by `num_workers` processes. The samples of a finished
+    archive are saved next to the manifest, so an interrupted run skips the
+    finished archives, resumes from the last completed shard of the archive it
+    was working on, and rebuilds the manifests from all the saved samples.
+    """
     for dataset_type, libri_urls in LIBRI_SPEECH_URLS.items():
         split_dir = os.path.join(data_path, dataset_type)
         if not os.path.exists(split_dir):
@@ -60,42 +102,52 @@ def create_json_dict(data_path):
         for url in libri_urls:
             filename = url.split("/")[-1]
             target_filename = os.path.join(data_path, filename)
-            tar = tarfile.open(target_filename)
-            tar.extractall(data_path)
-            tar.close()
-            data_path = os.path.join(data_path, "LibriSpeech")
-            file_paths = list(Path(data_path).rglob(f"*.{'txt'}"))
-
-            for txt_path in file_paths:
-                base_path = str(txt_path).split(".")[0]
-                transcriptions = open(txt_path).read().strip().split("\n")
-                transcriptions = {
-                    t.split()[0]: " ".join(t.split()[1:]) for t in transcriptions
-                }
-                for item in transcriptions.items():
-                    new_wav_path = os.path.join("wav", str(item[0]) + ".wav")
-                    new_txt_path = os.path.join("txt", str(item[0]) + ".txt")
-                    transcript = item[1]
-                    creat_txt_file(transcript, split_dir, new_txt_path)
-                    json_file["samples"].append(
-                        {
-                            "wav_path": new_wav_path,
-                            "txt_path": new_txt_path,
-                        }
-                    )
-                    wav_path = base_path + "-" + str(item[0].split("-")[-1]) + ".flac"
-                    shutil.move(wav_path, wav_dir)
-            output_path = Path(
-                os.path.join(split_dir, "libri_" + dataset_type + "_manifest.json")
+            extract_path = os.path.join(data_path, "LibriSpeech")
+            archive_name = filename.split(".")[0]
+            shard_dir = os.path.join(split_dir, archive_name + "_shards")
+            samples_path = os.path.join(split_dir, archive_name + "_samples.json")
+            if os.path.isfile(samples_path):
+                # Finished archive, the extracted files and the shards left
+                # if the run stopped right after finishing it belong to it
+                if os.path.isdir(shard_dir):
+                    shutil.rmtree(extract_path, ignore_errors=True)
+                    shutil.rmtree(shard_dir)
+                with open(samples_path, encoding="utf8") as f:
+                    json_file["samples"].extend(json.load(f))
+                continue
+
+            # A resumed run continues on the previously extracted archive
+            if not os.path.isdir(shard_dir) or not os.path.isdir(extract_path):
+                tar = tarfile.open(target_filename)
+                tar.extractall(data_path)
+                tar.close()
+            file_paths = sorted(str(p) for p in Path(extract_path).rglob(f"*.{'txt'}"))
+
+            shards = map_shards(
+                functools.partial(_move_samples, split_dir=split_dir),
+                file_paths,
+                shard_dir,
+                num_workers=num_workers,
+                shard_size=shard_size,
             )
-            output_path.write_text(json.dumps(json_file), encoding="utf8")
-            shutil.rmtree(data_path)
+            archive_samples = [sample for samples in shards for sample in samples]
+            tmp_path = samples_path + ".tmp"
+            Path(tmp_path).write_text(json.dumps(archive_samples), encoding="utf8")
+            os.replace(tmp_path, samples_path)
+            json_file["samples"].extend(archive_samples)
+            shutil.rmtree(extract_path)
+            shutil.rmtree(shard_dir)
+
+        output_path = Path(
+            os.path.join(split_dir, "libri_" + dataset_type + "_manifest.json")
+        )
+        output_path.write_text(json.dumps(json_file), encoding="utf8")
 
 
-def prepare_librispeech(data_path, download):
+def prepare_librispeech(data_path, download, num_workers=1, shard_size=100):
     if download:
         download_data(data_path)
-    create_json_dict(data_path)
+    create_json_dict(data_path, num_workers, shard_size)
 
 
 if __name__ == "__main__":
@@ -109,5 +161,14 @@ if __name__ == "__main__":
         default=False,
         help="set true to download librispeech datasets",
     )
+    parser.add_argument(
+        "--num_workers", type=int, default=1, help="number of preparation processes"
+    )
+    parser.add_argument(
+        "--shard_size",
+        type=int,
+        default=100,
+        help="number of transcript files per resumable shard",
+    )
     arg = parser.parse_args()
-    prepare_librispeech(arg.data_path, arg.download)
+    prepare_librispeech(arg.data_path, arg.download, arg.num_workers, arg.shard_size)
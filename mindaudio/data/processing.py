@@ -1,17 +1,25 @@
+import functools
 import math
 
 import mindspore as ms
 import mindspore.dataset.audio as msaudio
 import numpy as np
 import scipy
-from mindspore import Parameter, Tensor, ops
+from mindspore import Tensor, ops
 
-from .spectrum import amplitude_to_dB, compute_amplitude, dB_to_amplitude, frame
+from .spectrum import (
+    amplitude_to_dB,
+    compute_amplitude,
+    dB_to_amplitude,
+    frame,
+    overlap_add_frames,
+)
 
 __all__ = [
     "normalize",
     "unitarize",
     "resample",
+    "Resampler",
     "rescale",
     "stereo_to_mono",
     "trim",
@@ -129,6 +137,183 @@ def unitarize(waveforms, lengths=None, amp_type="avg", eps=1e-14):
     return waveforms / den
 
 
+DEFAULT_KAISER_BETA = 14.769656459379492
+
+
+@functools.lru_cache(maxsize=32)
+def _sinc_resample_kernel(orig_freq, new_freq, lowpass_filter_width, rolloff, beta):
+    """
+    Kaiser-windowed sinc kernels of a polyphase resampler, one row per output
+    phase, for frequencies already divided by their gcd.
+
+    Returns:
+        - np.ndarray, the kernels, (new_freq, 2 * width + orig_freq).
+        - int, the number of input samples the filter reaches on each side.
+    """
+    base_freq = min(orig_freq, new_freq) * rolloff
+    width = math.ceil(lowpass_filter_width * orig_freq / base_freq)
+    idx = np.arange(-width, width + orig_freq, dtype=np.float64) / orig_freq
+    t = np.arange(0, -new_freq, -1, dtype=np.float64)[:, None] / new_freq + idx
+    t = np.clip(t * base_freq, -lowpass_filter_width, lowpass_filter_width)
+    window = np.i0(beta * np.sqrt(1 - (t / lowpass_filter_width) ** 2)) / np.i0(beta)
+    kernels = np.sinc(t) * window * (base_freq / orig_freq)
+    kernels.setflags(write=False)
+    return kernels, width
+
+
+def _integer_freq(freq, name):
+    if float(freq) != int(freq) or freq <= 0:
+        raise ValueError(
+            f"Polyphase resampling needs positive integer frequencies, got {name}={freq}."
+        )
+    return int(freq)
+
+
+class Resampler:
+    """
+    Polyphase windowed-sinc resampler with cached kernels.
+
+    The kernels depend only on the reduced ratio `new_freq / orig_freq`, the
+    filter width, the roll-off and the Kaiser `beta`, and are cached across
+    instances. Every group of `orig_freq` input samples (after dividing both
+    rates by their gcd) gives `new_freq` output samples, computed for all the
+    groups and leading dimensions at once with one matrix product.
+
+    Calling the resampler processes whole signals. For streaming, `process`
+    accepts consecutive blocks and carries the filter context between them,
+    and `flush` returns the last samples; their concatenation equals the
+    output for the whole signal.
+
+    Args:
+        orig_freq (int): The original frequency of the signal.
+        new_freq (int): The desired frequency.
+        lowpass_filter_width (int): Controls the sharpness of the filter, more means
+            sharper but less efficient (default=6).
+        rolloff (float): The roll-off frequency of the filter, as a fraction of the
+            Nyquist, range: (0, 1] (default=0.99).
+        beta (float): The shape parameter of the Kaiser window (default=None, will
+            use 14.769656459379492).
+
+    Examples:
+        >>> resampler = Resampler(16000, 14400)
+        >>> y = resampler(np.random.randn(8, 16000))
+        >>> blocks = [resampler.process(x) for x in np.split(np.random.randn(16000), 4)]
+        >>> y = np.concatenate(blocks + [resampler.flush()])
+    """
+
+    def __init__(
+        self,
+        orig_freq,
+        new_freq,
+        lowpass_filter_width=6,
+        rolloff=0.99,
+        beta=None,
+    ):
+        orig_freq = _integer_freq(orig_freq, "orig_freq")
+        new_freq = _integer_freq(new_freq, "new_freq")
+        gcd = math.gcd(orig_freq, new_freq)
+        self.orig_freq = orig_freq // gcd
+        self.new_freq = new_freq // gcd
+        if beta is None:
+            beta = DEFAULT_KAISER_BETA
+        self.kernels, self.width = _sinc_resample_kernel(
+            self.orig_freq, self.new_freq, lowpass_filter_width, float(rolloff), beta
+        )
+        self.reset()
+
+    def reset(self):
+        """Forget the state of the stream."""
+        self._buffer = None
+        self._length = 0
+        self._emitted = 0
+
+    def output_length(self, length):
+        """Number of output samples for `length` input samples."""
+        return -(-self.new_freq * length // self.orig_freq)
+
+    def _apply(self, padded, num_groups):
+        """Output of the first `num_groups` groups of a padded signal."""
+        size = self.kernels.shape[1]
+        dtype = np.result_type(padded.dtype, np.float32)
+        frames = np.lib.stride_tricks.sliding_window_view(padded, size, axis=-1)
+        frames = frames[..., : num_groups * self.orig_freq : self.orig_freq, :]
+        # one contiguous 2-D product lets BLAS handle all groups at once
+        frames = np.ascontiguousarray(frames, dtype=dtype).reshape(-1, size)
+        out = frames @ self.kernels.T.astype(dtype)
+        return out.reshape(padded.shape[:-1] + (num_groups * self.new_freq,))
+
+    def __call__(self, waveform):
+        """
+        Resample whole signals along the last axis.
+
+        Args:
+            waveform (np.ndarray): Signals of shape `[..., time]`.
+
+        Returns:
+            np.ndarray, the resampled signals, `[..., ceil(time * new / orig)]`.
+        """
+        waveform = np.asarray(waveform)
+        length = waveform.shape[-1]
+        if self.orig_freq == self.new_freq:
+            return waveform
+        pad = [(0, 0)] * (waveform.ndim - 1)
+        padded = np.pad(waveform, pad + [(self.width, self.width + self.orig_freq)])
+        out = self._apply(padded, length // self.orig_freq + 1)
+        return out[..., : self.output_length(length)]
+
+    def process(self, block):
+        """
+        Resample the next block of a stream.
+
+        Args:
+            block (np.ndarray): The next samples, `[..., time]`, with the same
+                leading dimensions for the whole stream.
+
+        Returns:
+            np.ndarray, the output samples that can be computed so far.
+        """
+        block = np.asarray(block)
+        if self._buffer is None:
+            self._buffer = np.zeros(block.shape[:-1] + (self.width,), block.dtype)
+        self._buffer = np.concatenate([self._buffer, block], axis=-1)
+        self._length += block.shape[-1]
+        size = self.kernels.shape[1]
+        num_groups = max((self._buffer.shape[-1] - size) // self.orig_freq + 1, 0)
+        out = self._apply(self._buffer, num_groups)
+        self._buffer = self._buffer[..., num_groups * self.orig_freq :]
+        self._emitted += out.shape[-1]
+        return out
+
+    def flush(self):
+        """
+        Return the last output samples of the stream and reset it.
+
+        Returns:
+            np.ndarray, the samples depending on the end of the signal.
+        """
+        if self._buffer is None:
+            return np.zeros(0, dtype=np.float32)
+        pad = [(0, 0)] * (self._buffer.ndim - 1)
+        padded = np.pad(self._buffer, pad + [(0, self.width + self.orig_freq)])
+        size = self.kernels.shape[1]
+        num_groups = (padded.shape[-1] - size) // self.orig_freq + 1
+        out = self._apply(padded, num_groups)
+        out = out[..., : self.output_length(self._length) - self._emitted]
+        self.reset()
+        return out
+
+
+@functools.lru_cache(maxsize=32)
+def _minddata_resampler(orig_freq, new_freq, lowpass_filter_width, rolloff, beta):
+    return msaudio.Resample(
+        orig_freq=orig_freq,
+        new_freq=new_freq,
+        lowpass_filter_width=lowpass_filter_width,
+        rolloff=rolloff,
+        beta=beta,
+    )
+
+
 def resample(
     waveform,
     orig_freq=16000,
@@ -146,7 +331,9 @@ def resample(
             `[batch, num_frames, channel]`.
         orig_freq (float): The original frequency of the signal, which must be positive (default=16000).
         new_freq (float): The desired frequency, which must be positive (default=16000).
-        res_type (str): The resample method, which can be "fft","scipy","minddata".
+        res_type (str): The resample method, which can be "fft","scipy","polyphase","minddata".
+            "polyphase" applies a cached windowed-sinc filter bank, see `Resampler`, and needs integer
+            frequencies.
         lowpass_filter_width (int): Controls the shaperness of the filter, more means sharper but less
             efficient, which must be positive (default=6).
         rolloff (float): The roll-off frequency of the filter, as a fraction of the Nyquist. Lower values
@@ -163,6 +350,7 @@ def resample(
         >>> y_8k = processing.resample(waveform, orig_freq=44100, new_freq=16000)
         >>> print(waveform.shape)
         >>> print(y_8k.shape)
+        >>> y_8k = processing.resample(waveform, 44100, 16000, res_type="polyphase")
     """
     if orig_freq == new_freq:
         return waveform
@@ -175,13 +363,13 @@ def resample(
         y_hat = scipy.signal.resample(waveform, n_samples, axis=-1)
         return np.asarray(y_hat, dtype=waveform.dtype)
 
+    elif res_type == "polyphase":
+        resampler = Resampler(orig_freq, new_freq, lowpass_filter_width, rolloff, beta)
+        return resampler(waveform)
+
     else:
-        resample_function = msaudio.Resample(
-            orig_freq=orig_freq,
-            new_freq=new_freq,
-            lowpass_filter_width=lowpass_filter_width,
-            rolloff=rolloff,
-            beta=beta,
+        resample_function = _minddata_resampler(
+            orig_freq, new_freq, lowpass_filter_width, rolloff, beta
         )
         return resample_function(waveform)
 
@@ -549,13 +737,16 @@ def overlap_and_add(signal, frame_step):
     Taken from https://github.com/kaituoxu/Conv-TasNet/blob/master/src/utils.py
     To factor code for mindspore
 
+    A NumPy `signal` is overlap-added on the host by `spectrum.overlap_add_frames`, without a round trip
+    through MindSpore.
+
     Args:
-        signal(mindspore.tensor): Shape of [..., frames, frame_length]. All dimensions may be unknown,
+        signal(mindspore.tensor, np.ndarray): Shape of [..., frames, frame_length]. All dimensions may be unknown,
             and rank must be at least 2.
         frame_step(int): An integer denoting overlap offsets. Must be less than or equal to frame_length.
 
     Returns:
-        overlapped(mindspore.tensor): With shape [..., output_size] containing the overlap-added frames
+        overlapped(mindspore.tensor, np.ndarray): With shape [..., output_size] containing the overlap-added frames
             of signal's inner-most two dimensions. output_size = (frames - 1) * frame_step + frame_length
     Based on
     https://github.com/tensorflow/tensorflow/blob/r1.12/tensorflow/contrib/signal/python/ops/reconstruction_ops.py
@@ -566,6 +757,8 @@ def overlap_and_add(signal, frame_step):
         >>> overlapped = overlap_and_add(signal, 20)
         >>> overlapped.shape
     """
+    if isinstance(signal, np.ndarray):
+        return overlap_add_frames(signal, frame_step)
 
     outer_dimensions = signal.shape[:-2]
     frames, frame_length = signal.shape[-2:]
@@ -582,12 +775,11 @@ def overlap_and_add(signal, frame_step):
     )[::cal_frame_step, :]
     frame = Tensor(frame.reshape(-1), ms.int32)
 
-    new_zeros = ops.Zeros()
-    result = new_zeros(
-        (*outer_dimensions, output_subframes, cal_frame_length), ms.float32
-    )
-    # result.index_add_(-2, frame, subframe_signal)
-    subframe_signal = signal.view(*outer_dimensions, -1, cal_frame_length)
-    result = ops.index_add(Parameter(result), frame, subframe_signal, 1)
+    # sum the subframes landing on the same output subframe, which is
+    # functional where an in-place index_add into a fresh Parameter is not
+    subframe_signal = signal.view(-1, frames * subframes_per_frame, cal_frame_length)
+    subframe_signal = subframe_signal.transpose(1, 0, 2)
+    result = ops.unsorted_segment_sum(subframe_signal, frame, output_subframes)
+    result = result.transpose(1, 0, 2)
     result = result.view(*outer_dimensions, -1)
     return result
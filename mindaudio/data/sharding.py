@@ -0,0 +1,130 @@
+"""
+Parallel, resumable execution of dataset preparation steps.
+"""
+
+import logging
+import os
+import pickle
+from multiprocessing import Pool
+
+from tqdm import tqdm
+
+__all__ = ["map_shards"]
+
+logger = logging.getLogger(__name__)
+
+
+def _shard_path(shard_dir, index):
+    return os.path.join(shard_dir, "shard_{:06d}.pkl".format(index))
+
+
+def _load_shard(path, items):
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            shard = pickle.load(f)
+    except (EOFError, pickle.UnpicklingError):
+        return None
+    # A shard only counts as done if it was built from the same work list
+    if shard["items"] != items:
+        return None
+    return shard
+
+
+def _run_shard(args):
+    func, index, items, path = args
+    result = func(items)
+    if path is not None:
+        # Write to a temporary file first so an interrupted run never leaves
+        # a truncated shard behind.
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"items": items, "result": result}, f)
+        os.replace(tmp_path, path)
+    return index, result
+
+
+def map_shards(
+    func,
+    items,
+    shard_dir=None,
+    num_workers=1,
+    shard_size=1000,
+    initializer=None,
+    initargs=(),
+):
+    """
+    Apply `func` to consecutive chunks of `items`, optionally in a process pool.
+
+    Every chunk (shard) is processed as a whole by ``func(chunk)`` and its result
+    is pickled as a partial manifest into `shard_dir`. Shards that were already
+    written by an earlier, interrupted run for the same work list are loaded
+    instead of being recomputed, so a preparation restarts from the last
+    completed shard rather than from scratch.
+
+    Args:
+        func (callable): Picklable function mapping a list of items to the partial
+            result of that shard, e.g. a list of manifest rows.
+        items (list): The full work list, e.g. audio paths.
+        shard_dir (str, optional): Directory for the partial manifests. If None,
+            nothing is persisted and the run is not resumable. Default: None.
+        num_workers (int, optional): Number of worker processes. With 1 the shards
+            are processed in the calling process. Default: 1.
+        shard_size (int, optional): Number of items per shard. Default: 1000.
+        initializer (callable, optional): Called once in every worker (or once in
+            the calling process when `num_workers` is 1) before any shard is
+            processed. Default: None.
+        initargs (tuple, optional): Arguments passed to `initializer`. Default: ().
+
+    Returns:
+        list, the results of all shards in the order of `items`, ready to be merged.
+
+    Examples:
+        >>> from mindaudio.data.io import info
+        >>> def durations(paths):
+        ...     return [(p, info(p).frames) for p in paths]
+        >>> shards = map_shards(durations, wav_list, "./shards", num_workers=8)
+        >>> rows = [row for shard in shards for row in shard]
+    """
+    items = list(items)
+    shards = [items[i : i + shard_size] for i in range(0, len(items), shard_size)]
+    results = [None] * len(shards)
+
+    tasks = []
+    for index, shard_items in enumerate(shards):
+        path = None
+        if shard_dir is not None:
+            path = _shard_path(shard_dir, index)
+            shard = _load_shard(path, shard_items)
+            if shard is not None:
+                results[index] = shard["result"]
+                continue
+        tasks.append((func, index, shard_items, path))
+
+    if shard_dir is not None:
+        os.makedirs(shard_dir, exist_ok=True)
+        if len(tasks) < len(shards):
+            logger.info(
+                "Resuming from %s: %d of %d shards already done",
+                shard_dir,
+                len(shards) - len(tasks),
+                len(shards),
+            )
+
+    if num_workers > 1 and len(tasks) > 1:
+        with Pool(num_workers, initializer, initargs) as pool:
+            for index, result in tqdm(
+                pool.imap_unordered(_run_shard, tasks),
+                total=len(tasks),
+                dynamic_ncols=True,
+            ):
+                results[index] = result
+    else:
+        if initializer is not None and tasks:
+            initializer(*initargs)
+        for task in tqdm(tasks, dynamic_ncols=True):
+            index, result = _run_shard(task)
+            results[index] = result
+
+    return results
@@ -1,15 +1,21 @@
+import functools
+
 import mindspore as ms
 import mindspore.dataset.audio as msaudio
 import numpy as np
 from mindspore.dataset.audio.utils import BorderType, MelType, NormType, WindowType
 from numpy import fft
+from scipy import fft as sp_fft
 from scipy.signal import get_window
 
 __all__ = [
     "amplitude_to_dB",
     "dB_to_amplitude",
     "stft",
+    "STFT",
     "istft",
+    "overlap_add_frames",
+    "StreamingOverlapAdd",
     "compute_amplitude",
     "spectrogram",
     "melspectrogram",
@@ -113,15 +119,6 @@ def dB_to_amplitude(wavform, ref, power):
     return ref_value * np.power(np.power(10.0, 0.1 * wavform), power)
 
 
-def _expand_to(x, ndim, axes):
-    axes_tup = tuple([axes])  # type: ignore
-
-    shape = [1] * ndim
-    for i, axi in enumerate(axes_tup):
-        shape[axi] = x.shape[i]
-    return x.reshape(shape)
-
-
 def stft(
     waveforms,
     n_fft=512,
@@ -164,118 +161,142 @@ def stft(
         >>> matrix = spectrum.stft(waveform)
         (257, 9)
     """
-    if win_length is None:
-        win_length = n_fft
-
-    if hop_length is None:
-        hop_length = win_length // 4
+    engine = _stft_engine(n_fft, win_length, hop_length, window, center, pad_mode)
+    return engine(waveforms, return_complex=return_complex)
 
-    fft_window = get_window(window, win_length, fftbins=True)
-    # Pad the window out to n_fft size
-    fft_window = _pad_center(fft_window, n_fft)
 
-    # Reshape so that the window can be broadcast
-    fft_window = _expand_to(fft_window, ndim=1 + waveforms.ndim, axes=-2)
-
-    # Pad the time series so that frames are centered
-    if center:
-        if n_fft > waveforms.shape[-1]:
-            raise ValueError(
-                "n_fft={} is too small for input signal of length={}".format(
-                    n_fft, waveforms.shape[-1]
-                )
-            )
-
-        # Set up the padding array to be empty, and we'll fix the target dimension later
-        padding = [(0, 0) for _ in range(waveforms.ndim)]
-
-        # How many frames depend on left padding?
-        start_k = int(np.ceil(n_fft // 2 / hop_length))
+class STFT:
+    """
+    Reusable short-time Fourier transform engine.
 
-        # What's the first frame that depends on extra right-padding?
-        tail_k = (waveforms.shape[-1] + n_fft // 2 - n_fft) // hop_length + 1
+    The window, its padding to `n_fft` and the centering pad widths are computed once when the engine is created.
+    Each call frames the whole ``[..., time]`` input through a strided view (no copy), and runs a single real FFT
+    over all frames of all signals of the batch, block by block so that temporaries stay bounded.
 
-        if tail_k <= start_k:
-            # If tail and head overlap, then just copy-pad the signal and carry on
-            start = 0
-            extra = 0
-            padding[-1] = (n_fft // 2, n_fft // 2)
-            waveforms = np.pad(waveforms, padding, mode=pad_mode)
-        else:
-            # If tail and head do not overlap, then we can implement padding on each part separately
-            # and avoid a full copy-pad
+    Args:
+        n_fft (int): Number of fft point of the STFT. Default: 512.
+        win_length (int): Number of frames the sliding window used to compute the STFT. If None, win_length = n_fft.
+        hop_length (int): Number of frames for the hop of the sliding window used to compute the STFT. If None,
+            hop_length will be set to 1/4*win_length.
+        window (str): Name of window function specified for STFT. Default: "hann".
+        center (bool): If True (default), the input will be padded on both sides so that the t-th frame is centered at
+            time t*hop_length. Otherwise, the t-th frame begins at time t*hop_length.
+        pad_mode (str): Padding mode passed to `np.pad` when `center` is True. Default: "constant".
+        workers (int): Number of threads used by `scipy.fft` for each transform. Default: 1.
 
-            # "Middle" of the signal starts here, and does not depend on head padding
-            start = start_k * hop_length - n_fft // 2
-            padding[-1] = (n_fft // 2, 0)
+    Examples:
+        >>> import numpy as np
+        >>> import mindaudio.data.spectrum as spectrum
+        >>> engine = spectrum.STFT(n_fft=512, hop_length=160)
+        >>> waveforms = np.random.randn(8, 16000).astype(np.float32)
+        >>> matrix = engine(waveforms)
+        (8, 257, 101)
+        >>> out = np.empty(engine.output_shape(waveforms.shape), dtype=np.complex64)
+        >>> matrix = engine(waveforms, out=out)
+    """
 
-            waveforms_pre = np.pad(
-                waveforms[..., : (start_k - 1) * hop_length - n_fft // 2 + n_fft + 1],
-                padding,
-                mode=pad_mode,
-            )
-            af_frames = frame(waveforms_pre, frame_length=n_fft, hop_length=hop_length)[
-                ..., :start_k
-            ]
-            the_shape_of_frames = af_frames.shape
-            extra = the_shape_of_frames[-1]
-
-            if (
-                tail_k * hop_length - n_fft // 2 + n_fft
-                <= waveforms.shape[-1] + n_fft // 2
-            ):
-                padding[-1] = (0, n_fft // 2)
-                y_post = np.pad(
-                    waveforms[..., (tail_k) * hop_length - n_fft // 2 :],
-                    padding,
-                    mode=pad_mode,
-                )
-                y_frames_post = frame(y_post, frame_length=n_fft, hop_length=hop_length)
-                extra += y_frames_post.shape[-1]
-            else:
-                # the end padding
-                post_shape = list(the_shape_of_frames.shape)
-                post_shape[-1] = 0
-                y_frames_post = np.empty_like(af_frames, shape=post_shape)
-    else:
-        start = 0
-        extra = 0
-        if n_fft > waveforms.shape[-1]:
+    def __init__(
+        self,
+        n_fft=512,
+        win_length=None,
+        hop_length=None,
+        window="hann",
+        center=True,
+        pad_mode="constant",
+        workers=1,
+    ):
+        if win_length is None:
+            win_length = n_fft
+        if hop_length is None:
+            hop_length = win_length // 4
+        if hop_length < 1:
+            raise ValueError("Invalid hop_length: {:d}".format(hop_length))
+
+        self.n_fft = n_fft
+        self.win_length = win_length
+        self.hop_length = hop_length
+        self.center = center
+        self.pad_mode = pad_mode
+        self.workers = workers
+        # Pad the window out to n_fft size
+        self.window = _pad_center(get_window(window, win_length, fftbins=True), n_fft)
+        self.padding = (n_fft // 2, n_fft // 2) if center else (0, 0)
+
+    def num_frames(self, length):
+        """Number of STFT frames of a signal with `length` samples."""
+        padded = length + sum(self.padding)
+        if self.n_fft > padded:
             raise ValueError(
-                f"n_fft={n_fft} is too large for uncentered analysis of input signal of length={waveforms.shape[-1]}"
+                f"n_fft={self.n_fft} is too large for input signal of length={length}"
             )
-    # Window the time series.
-    y_frames = frame(waveforms[..., start:], frame_length=n_fft, hop_length=hop_length)
-    shape = list(y_frames.shape)
-    shape[-2] = 1 + n_fft // 2
-    shape[-1] += extra
-    stft_matrix = np.empty(shape, order="F", dtype=np.complex64)
-
-    # Fill in the warm-up
-    if center and extra > 0:
-        off_start = af_frames.shape[-1]
-        stft_matrix[..., :off_start] = fft.rfft(fft_window * af_frames, axis=-2)
-
-        off_end = y_frames_post.shape[-1]
-        if off_end > 0:
-            stft_matrix[..., -off_end:] = fft.rfft(fft_window * y_frames_post, axis=-2)
-    else:
-        off_start = 0
-
-    n_columns = max(
-        int(MAX_MEM_BLOCK // (np.prod(y_frames.shape[:-1]) * y_frames.itemsize)), 1
-    )
+        return 1 + (padded - self.n_fft) // self.hop_length
+
+    def output_shape(self, shape):
+        """Shape of the STFT matrix of an input of shape ``[..., time]``."""
+        return tuple(shape[:-1]) + (1 + self.n_fft // 2, self.num_frames(shape[-1]))
+
+    def frames(self, waveforms):
+        """Strided, read-only ``[..., n_frames, n_fft]`` view of the (padded) waveforms."""
+        n_frames = self.num_frames(waveforms.shape[-1])
+        if self.center:
+            padding = [(0, 0)] * (waveforms.ndim - 1) + [self.padding]
+            waveforms = np.pad(waveforms, padding, mode=self.pad_mode)
+        waveforms = np.ascontiguousarray(waveforms)
+        stride = waveforms.strides[-1]
+        return np.lib.stride_tricks.as_strided(
+            waveforms,
+            shape=waveforms.shape[:-1] + (n_frames, self.n_fft),
+            strides=waveforms.strides[:-1] + (self.hop_length * stride, stride),
+            writeable=False,
+        )
 
-    for bl_s in range(0, y_frames.shape[-1], n_columns):
-        bl_t = min(bl_s + n_columns, y_frames.shape[-1])
-        stft_matrix[..., bl_s + off_start : bl_t + off_start] = fft.rfft(
-            fft_window * y_frames[..., bl_s:bl_t], axis=-2
+    def __call__(self, waveforms, out=None, return_complex=True):
+        """
+        Compute the STFT of a batch of waveforms.
+
+        Args:
+            waveforms (np.ndarray): Signals of shape ``[..., time]``. Floating inputs keep their precision.
+            out (np.ndarray, optional): Complex array of shape :meth:`output_shape` to write the result into.
+            return_complex (bool): Whether to return complex array or a real array for the real and imaginary
+                components. `out` can only be used for complex results.
+
+        Returns:
+            np.ndarray, STFT matrix of shape ``[..., 1 + n_fft // 2, n_frames]``.
+        """
+        waveforms = np.asarray(waveforms)
+        if not np.issubdtype(waveforms.dtype, np.floating):
+            waveforms = waveforms.astype(np.float64)
+        frames = self.frames(waveforms)
+        window = self.window.astype(waveforms.dtype, copy=False)
+
+        shape = self.output_shape(waveforms.shape)
+        if out is None:
+            out = np.empty(shape, dtype=np.complex64)
+        elif not return_complex:
+            raise ValueError("`out` can only be used when return_complex is True")
+        elif out.shape != shape:
+            raise ValueError(f"`out` has shape {out.shape}, expected {shape}")
+
+        # Transform as many frames at once as fit in a memory block
+        n_frames = frames.shape[-2]
+        batch = int(np.prod(frames.shape[:-2]))
+        n_columns = max(
+            int(MAX_MEM_BLOCK // (batch * self.n_fft * waveforms.itemsize)), 1
         )
+        for bl_s in range(0, n_frames, n_columns):
+            bl_t = min(bl_s + n_columns, n_frames)
+            out[..., bl_s:bl_t] = sp_fft.rfft(
+                frames[..., bl_s:bl_t, :] * window, axis=-1, workers=self.workers
+            ).swapaxes(-1, -2)
+
+        if return_complex:
+            return out
+        return np.stack((out.real, out.imag), -1)
 
-    if return_complex:
-        return stft_matrix
-    else:
-        return np.stack((stft_matrix.real, stft_matrix.imag), -1)
+
+@functools.lru_cache(maxsize=32)
+def _stft_engine(n_fft, win_length, hop_length, window, center, pad_mode):
+    return STFT(n_fft, win_length, hop_length, window, center, pad_mode)
 
 
 def frame(x, frame_length=2048, hop_length=64):
@@ -336,11 +357,105 @@ def _pad_center(data, size, axis=-1):
     return np.pad(data, lengths)
 
 
+def overlap_add_frames(frames, hop_length):
+    """
+    Overlap-add a batch of frames into signals.
+
+    Frames are cut into chunks of `hop_length` samples, and the r-th chunk of
+    every frame lands on output chunk ``frame + r``. The sum is therefore
+    ``ceil(frame_length / hop_length)`` vectorized slice additions over all
+    the frames at once, rather than one addition per frame or an unbuffered
+    ``np.add.at``.
+
+    Args:
+        frames (np.ndarray): Frames of shape ``[..., n_frames, frame_length]``.
+        hop_length (int): Offset between consecutive frames, in samples.
+
+    Returns:
+        np.ndarray, signals of shape ``[..., (n_frames - 1) * hop_length + frame_length]``.
+
+    Examples:
+        >>> frames = np.random.randn(8, 100, 512)
+        >>> signals = overlap_add_frames(frames, 128)
+        (8, 13184)
+    """
+    frames = np.asarray(frames)
+    if hop_length < 1:
+        raise ValueError("Invalid hop_length: {:d}".format(hop_length))
+    *outer, n_frames, frame_length = frames.shape
+    n_chunks = -(-frame_length // hop_length)
+    if n_chunks * hop_length != frame_length:
+        padding = [(0, 0)] * (frames.ndim - 1) + [
+            (0, n_chunks * hop_length - frame_length)
+        ]
+        frames = np.pad(frames, padding)
+    chunks = frames.reshape(*outer, n_frames, n_chunks, hop_length)
+
+    out = np.zeros((*outer, n_frames + n_chunks - 1, hop_length), dtype=frames.dtype)
+    for r in range(n_chunks):
+        out[..., r : r + n_frames, :] += chunks[..., r, :]
+    out = out.reshape(*outer, -1)
+    return out[..., : (n_frames - 1) * hop_length + frame_length]
+
+
 def overlap_add(output_buffer, frames, hop_length):
-    n_fft = frames.shape[-2]
-    for sample_frame in range(frames.shape[-1]):
-        sample = sample_frame * hop_length
-        output_buffer[..., sample : (sample + n_fft)] += frames[..., sample_frame]
+    """Overlap-add ``[..., n_fft, n_frames]`` frames at the start of `output_buffer`."""
+    signal = overlap_add_frames(np.swapaxes(frames, -1, -2), hop_length)
+    output_buffer[..., : signal.shape[-1]] += signal[..., : output_buffer.shape[-1]]
+
+
+class StreamingOverlapAdd:
+    """
+    Overlap-add frames arriving block by block.
+
+    The last ``frame_length - hop_length`` samples of every block are still
+    missing the contributions of the next frames: they are kept as a tail and
+    added to the start of the next block. Every call therefore returns
+    ``n_frames * hop_length`` final samples, and the concatenation of all the
+    outputs and of :meth:`flush` equals :func:`overlap_add_frames` of all the
+    frames.
+
+    Args:
+        frame_length (int): Length of the frames.
+        hop_length (int): Offset between consecutive frames, at most `frame_length`.
+
+    Examples:
+        >>> ola = StreamingOverlapAdd(512, 128)
+        >>> for block in vocoder_blocks:  # [batch, n_frames, 512]
+        ...     play(ola(block))
+        >>> play(ola.flush())
+    """
+
+    def __init__(self, frame_length, hop_length):
+        if not 1 <= hop_length <= frame_length:
+            raise ValueError(
+                f"hop_length must be between 1 and frame_length={frame_length}, got {hop_length}"
+            )
+        self.frame_length = frame_length
+        self.hop_length = hop_length
+        self.tail = None
+
+    def __call__(self, frames):
+        """
+        Overlap-add a block of frames.
+
+        Args:
+            frames (np.ndarray): Frames of shape ``[..., n_frames, frame_length]``.
+
+        Returns:
+            np.ndarray, the ``n_frames * hop_length`` completed samples, ``[..., samples]``.
+        """
+        signal = overlap_add_frames(frames, self.hop_length)
+        if self.tail is not None:
+            signal[..., : self.tail.shape[-1]] += self.tail
+        done = frames.shape[-2] * self.hop_length
+        self.tail = signal[..., done:].copy()
+        return signal[..., :done]
+
+    def flush(self):
+        """Return the remaining tail and reset the stream."""
+        tail, self.tail = self.tail, None
+        return tail
 
 
 def istft(
@@ -474,23 +589,19 @@ def istft(
     return y
 
 
+@functools.lru_cache(maxsize=64)
 def _window_sumsquare(window, n_frames, win_length, n_fft, hop_length):
+    """Sum of the squared windows of `n_frames` frames, cached and read-only."""
     if win_length is None:
         win_length = n_fft
 
-    n = n_fft + hop_length * (n_frames - 1)
-    x = np.zeros(n, dtype=np.float_)
-
     # Compute the squared window at the desired length
     win_sq = get_window(window, win_length)
     win_sq = win_sq**2
     win_sq = _pad_center(win_sq, n_fft)
 
-    n = len(x)
-    n_fft = len(win_sq)
-    for i in range(n_frames):
-        sample = i * hop_length
-        x[sample : min(n, sample + n_fft)] += win_sq[: max(0, min(n_fft, n - sample))]
+    x = overlap_add_frames(np.broadcast_to(win_sq, (n_frames, n_fft)), hop_length)
+    x.setflags(write=False)
     return x
 
 
@@ -3,6 +3,7 @@ Data preparation, from mindaudio VoxCeleb recipe.
 """
 
 import csv
+import functools
 import glob
 import logging
 import os
@@ -12,10 +13,10 @@ import shutil
 import time
 
 import numpy as np
-from tqdm.contrib import tqdm
 
-from .io import read
+from .io import InfoIndex, read
 from .processing import stereo_to_mono
+from .sharding import map_shards
 
 __all__ = ["prepare_voxceleb"]
 
@@ -25,6 +26,8 @@ VOX_TRAIN_CSV = "train.csv"
 VOX_DEV_CSV = "dev.csv"
 VOX_TEST_CSV = "test.csv"
 VOX_ENROL_CSV = "enrol.csv"
+VOX_INFO_INDEX = "wav_info_index.pkl"
+VOX_SPLIT_LISTS = "wav_split_lists.pkl"
 SAMPLERATE = 16000
 
 VOX_DEV_WAV = "vox1_dev_wav.zip"
@@ -85,11 +88,17 @@ def prepare_voxceleb(
     source=None,
     split_speaker=False,
     random_segment=False,
+    num_workers=1,
+    shard_size=1000,
 ):
     """
     Prepares the csv files for the Voxceleb1 or Voxceleb2 datasets.
     Please follow the instructions in the readme.md file for
     preparing Voxceleb2.
+
+    The wav files are processed in shards of `shard_size` by `num_workers`
+    processes. If the preparation is interrupted, calling it again with the
+    same arguments resumes from the last completed shard.
     """
 
     if skip_prep:
@@ -135,26 +144,60 @@ def prepare_voxceleb(
     msg = "\tCreating csv file for the VoxCeleb Dataset.."
     logger.info(msg)
 
-    # Split data into 90% train and 10% validation (verification split)
-    wav_lst_train, wav_lst_dev = get_utt_split_lists(
-        data_folder_path, split_ratio, verification_pairs_file, split_speaker
-    )
-
-    # Creating csv file for training data
-    if "train" in splits:
-        prepare_csv_file(seg_dur, wav_lst_train, save_csv_train, random_segment, amp_th)
+    # Split data into 90% train and 10% validation (verification split).
+    # The random split is saved until the preparation is done, so that a
+    # resumed run shards exactly the same file lists.
+    split_conf = [data_folder_path, split_ratio, verification_pairs_file, split_speaker]
+    save_split_lists = os.path.join(save_folder_path, VOX_SPLIT_LISTS)
+    split_lists = None
+    if os.path.isfile(save_split_lists):
+        split_lists = load_pkl(save_split_lists)
+        if split_lists["conf"] != split_conf:
+            split_lists = None
+    if split_lists is None:
+        wav_lst_train, wav_lst_dev = get_utt_split_lists(
+            data_folder_path, split_ratio, verification_pairs_file, split_speaker
+        )
+        split_lists = {"conf": split_conf, "train": wav_lst_train, "dev": wav_lst_dev}
+        save_pkl(split_lists, save_split_lists)
+    wav_lst_train, wav_lst_dev = split_lists["train"], split_lists["dev"]
+
+    # Durations are probed from the wav headers and remembered across runs
+    with InfoIndex(os.path.join(save_folder_path, VOX_INFO_INDEX)) as info_index:
+        # Creating csv file for training data
+        if "train" in splits:
+            prepare_csv_file(
+                seg_dur,
+                wav_lst_train,
+                save_csv_train,
+                random_segment,
+                amp_th,
+                info_index,
+                num_workers,
+                shard_size,
+            )
 
-    if "dev" in splits:
-        prepare_csv_file(seg_dur, wav_lst_dev, save_csv_dev, random_segment, amp_th)
+        if "dev" in splits:
+            prepare_csv_file(
+                seg_dur,
+                wav_lst_dev,
+                save_csv_dev,
+                random_segment,
+                amp_th,
+                info_index,
+                num_workers,
+                shard_size,
+            )
 
-    # For PLDA verification
-    if "test" in splits:
-        prepare_csv_enrol_test(
-            data_folder_path, save_folder_path, verification_pairs_file
-        )
+        # For PLDA verification
+        if "test" in splits:
+            prepare_csv_enrol_test(
+                data_folder_path, save_folder_path, verification_pairs_file, info_index
+            )
 
     # Saving options (useful to skip this phase when already done)
     save_pkl(save_conf, save_option)
+    os.remove(save_split_lists)
 
 
 def skip(splits, save_folder, save_conf):
@@ -262,21 +305,35 @@ def get_chunks(seg_dur, audio_id, audio_duration):
     return chunk_list
 
 
-def prepare_csv_file(seg_dur, wav_lst, csv_file, random_segment=False, amp_th=0):
-    """
-    Creates the csv file given a list of wav files.
-    """
+def _load_signal(wav):
+    # Memory-map the samples so that only the chunks being checked get scaled
+    try:
+        signal, _ = read(wav, mmap=True, dtype="float32")
+    except ValueError:
+        # e.g. 24-bit PCM, which has no numpy dtype to map onto
+        signal, _ = read(wav)
+    return signal
 
-    msg = '\t"Creating csv lists in  %s..."' % (csv_file)
-    logger.info(msg)
 
-    csv_output_header = [["ID", "duration", "wav", "start", "stop", "spk_id"]]
+# Shared with the preparation workers, see `_set_info_index`
+_info_index = None
+
 
+def _set_info_index(info_index):
+    global _info_index
+    _info_index = info_index
+
+
+def _csv_rows(wav_lst, seg_dur, random_segment, amp_th):
+    """
+    Computes the csv lines of a shard of wav files, together with the
+    `InfoIndex` entries of those files so that the caller can persist them.
+    """
     # For assigning unique ID to each chunk
     each_sep = "--"
     entry = []
     # Processing all the wav files in the list
-    for each_wav_file in tqdm(wav_lst, dynamic_ncols=True):
+    for each_wav_file in wav_lst:
         # Getting sentence and speaker ids
         try:
             [spk_id, sess_id, utt_id] = each_wav_file.split("/")[-3:]
@@ -285,19 +342,16 @@ def prepare_csv_file(seg_dur, wav_lst, csv_file, random_segment=False, amp_th=0)
             continue
         audio_id = each_sep.join([spk_id, sess_id, utt_id.split(".")[0]])
 
-        # Reading the signal (to retrieve duration in seconds)
+        # Reading the header (to retrieve duration in seconds)
         try:
-            signal, _ = read(each_wav_file)
+            n_frames = _info_index.info(each_wav_file).frames
         except ValueError:
             continue
-
-        if len(signal.shape) > 1:
-            signal = stereo_to_mono(signal)
+        audio_duration = n_frames / SAMPLERATE
 
         if random_segment:
-            audio_duration = signal.shape[0] / SAMPLERATE
             start_sample_index = 0
-            stop_sample_index = signal.shape[0]
+            stop_sample_index = n_frames
 
             # Composition of the csv_line
             csv_each_line = [
@@ -310,7 +364,8 @@ def prepare_csv_file(seg_dur, wav_lst, csv_file, random_segment=False, amp_th=0)
             ]
             entry.append(csv_each_line)
         else:
-            audio_duration = signal.shape[0] / SAMPLERATE
+            if amp_th > 0:
+                signal = _load_signal(each_wav_file)
 
             uniq_chunks_list = get_chunks(seg_dur, audio_id, audio_duration)
             for chunk in uniq_chunks_list:
@@ -319,9 +374,10 @@ def prepare_csv_file(seg_dur, wav_lst, csv_file, random_segment=False, amp_th=0)
                 end_sample = int(float(e) * SAMPLERATE)
 
                 #  Avoid chunks with very small energy
-                mean_sig = np.mean(np.abs(signal[start_sample_index:end_sample]))
-                if mean_sig < amp_th:
-                    continue
+                if amp_th > 0:
+                    segment = stereo_to_mono(signal[start_sample_index:end_sample])
+                    if np.mean(np.abs(segment)) < amp_th:
+                        continue
 
                 # Composition of the csv_line
                 csv_each_line = [
@@ -334,6 +390,53 @@ def prepare_csv_file(seg_dur, wav_lst, csv_file, random_segment=False, amp_th=0)
                 ]
                 entry.append(csv_each_line)
 
+    return entry, _info_index.export(wav_lst)
+
+
+def prepare_csv_file(
+    seg_dur,
+    wav_lst,
+    csv_file,
+    random_segment=False,
+    amp_th=0,
+    info_index=None,
+    num_workers=1,
+    shard_size=1000,
+):
+    """
+    Creates the csv file given a list of wav files.
+
+    Durations come from the wav headers (through `info_index` if given), the
+    samples are only touched when chunks have to be checked against `amp_th`.
+    The files are processed in shards of `shard_size` by `num_workers`
+    processes; finished shards are kept next to `csv_file` until it is
+    written, so an interrupted run resumes from the last completed shard.
+    """
+    if info_index is None:
+        info_index = InfoIndex()
+
+    msg = '\t"Creating csv lists in  %s..."' % (csv_file)
+    logger.info(msg)
+
+    csv_output_header = [["ID", "duration", "wav", "start", "stop", "spk_id"]]
+
+    shard_dir = os.path.splitext(csv_file)[0] + "_shards"
+    shards = map_shards(
+        functools.partial(
+            _csv_rows, seg_dur=seg_dur, random_segment=random_segment, amp_th=amp_th
+        ),
+        wav_lst,
+        shard_dir,
+        num_workers=num_workers,
+        shard_size=shard_size,
+        initializer=_set_info_index,
+        initargs=(info_index,),
+    )
+    entry = []
+    for rows, probed in shards:
+        entry.extend(rows)
+        info_index.update(probed)
+
     csv_output_header = csv_output_header + entry
 
     # Writing the csv lines
@@ -344,15 +447,21 @@ def prepare_csv_file(seg_dur, wav_lst, csv_file, random_segment=False, amp_th=0)
         for line in csv_output_header:
             csv_writer.writerow(line)
 
+    shutil.rmtree(shard_dir)
+
     # Final prints
     msg_info = "\t%s successfully created!" % (csv_file)
     logger.info(msg_info)
 
 
-def prepare_csv_enrol_test(data_folders, save_folder, verification_pairs_file):
+def prepare_csv_enrol_test(
+    data_folders, save_folder, verification_pairs_file, info_index=None
+):
     """
     Creates the csv file for test data (useful for verification)
     """
+    if info_index is None:
+        info_index = InfoIndex()
 
     csv_output_head = [["ID", "duration", "wav", "start", "stop", "spk_id"]]
 
@@ -377,17 +486,15 @@ def prepare_csv_enrol_test(data_folders, save_folder, verification_pairs_file):
         for e_id in vox_enrol_ids:
             wav = each_data_folder + "/wav/" + e_id + ".wav"
 
-            # Reading the signal (to retrieve duration in seconds)
+            # Reading the header (to retrieve duration in seconds)
             try:
-                signal, _ = read(wav)
+                n_frames = info_index.info(wav).frames
             except ValueError:
                 continue
-            if len(signal.shape) > 1:
-                signal = stereo_to_mono(signal)
 
-            audio_duration = signal.shape[0] / SAMPLERATE
+            audio_duration = n_frames / SAMPLERATE
             start_sample_index = 0
-            stop_sample_index = signal.shape[0]
+            stop_sample_index = n_frames
             [spk_id, _, _] = wav.split("/")[-3:]
 
             csv_line = [
@@ -418,17 +525,15 @@ def prepare_csv_enrol_test(data_folders, save_folder, verification_pairs_file):
         for t_id in vox_test_ids:
             wav = each_data_folder + "/wav/" + t_id + ".wav"
 
-            # Reading the signal (to retrieve duration in seconds)
+            # Reading the header (to retrieve duration in seconds)
             try:
-                signal, _ = read(wav)
+                n_frames = info_index.info(wav).frames
             except ValueError:
                 continue
-            if len(signal.shape) > 1:
-                signal = stereo_to_mono(signal)
 
-            audio_duration = signal.shape[0] / SAMPLERATE
+            audio_duration = n_frames / SAMPLERATE
             start_sample_index = 0
-            stop_sample_index = signal.shape[0]
+            stop_sample_index = n_frames
             [spk_id, _, _] = wav.split("/")[-3:]
 
             csv_line = [
@@ -10,29 +10,87 @@ from mindspore import Tensor
 EPS = 1e-8
 
 
-class Separation_Loss(nn.Cell):
-    def __init__(self):
-        super(Separation_Loss, self).__init__()
+def perms_one_hot(num_spk):
+    """
+    All the permutations of `num_spk` sources and their one-hot matrix.
+
+    Args:
+        num_spk (int): Number of sources C.
+
+    Returns:
+        - np.ndarray, the permutations, [C!, C], estimate perms[p, c] being
+          assigned to source c.
+        - np.ndarray, the one-hot matrix, [C * C, C!]. The flattened
+          (estimate, source) pairwise scores [B, C * C] times this matrix are
+          the total scores of all the permutations [B, C!].
+    """
+    perms = np.array(list(permutations(range(num_spk))), dtype=np.int32)
+    one_hot = np.zeros((num_spk * num_spk, len(perms)), dtype=np.float32)
+    sources = np.arange(num_spk)
+    for p, perm in enumerate(perms):
+        one_hot[perm * num_spk + sources, p] = 1
+    return perms, one_hot
+
+
+class PITLoss(nn.Cell):
+    """
+    Negative SI-SNR loss with permutation invariant training (PIT), for any
+    number of speakers.
+
+    The SI-SNR of every estimate against every source is computed in one
+    broadcast. Up to `max_exhaustive` speakers, the total SI-SNR of all the C!
+    permutations is one matrix multiply by their one-hot matrix, and the best
+    one is taken. Above, enumerating the permutations is impractical and the
+    (estimate, source) pairs are assigned greedily, best remaining pair first,
+    in C steps. The estimates are then reordered with one gather.
+
+    Sources are [B, C, T], or [B, C, K, L] frames with lengths counted in
+    frames; padding beyond the lengths is masked out.
+
+    Args:
+        num_spk (int): Number of speakers C. Default: 2.
+        max_exhaustive (int): Largest number of speakers whose permutations are
+            all scored. Default: 5.
+
+    Inputs:
+        - **source** (Tensor) - Sources, [B, C, T] or [B, C, K, L].
+        - **estimate_source** (Tensor) - Estimates, same shape as `source`.
+        - **source_lengths** (Tensor) - Valid length of every item along the
+          third axis, [B].
+
+    Outputs:
+        - Tensor, the loss, the negative mean SI-SNR.
+        - Tensor, the mean SI-SNR of every item under its best permutation, [B, 1].
+        - Tensor, `estimate_source`.
+        - Tensor, the estimates reordered by the best permutations.
+
+    Examples:
+        >>> loss_fn = PITLoss(num_spk=3)
+        >>> loss, _, _, reordered = loss_fn(source, model(mixture), lengths)
+    """
+
+    def __init__(self, num_spk=2, max_exhaustive=5):
+        super(PITLoss, self).__init__()
+        self.num_spk = num_spk
+        self.exhaustive = num_spk <= max_exhaustive
         self.mean = ops.ReduceMean()
         self.cast = ops.Cast()
         self.sum = ops.ReduceSum(keep_dims=True)
         self._sum = ops.ReduceSum(keep_dims=False)
         self.expand_dims = ops.ExpandDims()
         self.log = ops.Log()
-        # self.scatter = ops.ScatterNd()
         self.matmul = ops.MatMul()
-        self.transpose = ops.Transpose()
         self.Argmax = ops.Argmax(axis=1, output_type=mindspore.int32)
         self.argmax = ops.ArgMaxWithValue(axis=1, keep_dims=True)
-        self.ones = ops.Ones()
+        self.one_hot = ops.OneHot()
         self.zeros_like = ops.ZerosLike()
-        self.Print = ops.Print()
-        # self.source_lengths_with_list = get_input_with_list(dir)
+        self.on_value = Tensor(1.0, mindspore.float32)
+        self.off_value = Tensor(0.0, mindspore.float32)
         self.log10 = Tensor(np.array([10.0]), mindspore.float32)
-        self.perms = Tensor(list(permutations(range(2))), dtype=mindspore.int32)
-        self.perms_ones_hot = Tensor(
-            np.array([[1, 0], [0, 1], [0, 1], [1, 0]]), mindspore.float32
-        )
+        if self.exhaustive:
+            perms, one_hot = perms_one_hot(num_spk)
+            self.perms = Tensor(perms, mindspore.int32)
+            self.perms_one_hot = Tensor(one_hot, mindspore.float32)
 
     def construct(self, source, estimate_source, source_lengths):
         return self.cal_loss(source, estimate_source, source_lengths)
@@ -40,41 +98,47 @@ class Separation_Loss(nn.Cell):
     def cal_loss(self, source, estimate_source, source_lengths):
         """
         Args:
-            source: [B, C, K, L]
-            estimate_source: [B, C, K, L]
+            source: [B, C, T] or [B, C, K, L]
+            estimate_source: same shape as source
             source_lengths: [B]
         """
-        max_snr, perms, max_snr_idx = self.cal_si_snr_with_pit(
+        max_snr, max_snr_perm = self.cal_si_snr_with_pit(
             source, estimate_source, source_lengths
         )
         loss_final = 0 - self.mean(max_snr)
-        reorder_estimate_source = self.reorder_source(
-            estimate_source, perms, max_snr_idx
-        )
+        reorder_estimate_source = self.reorder_source(estimate_source, max_snr_perm)
         return loss_final, max_snr, estimate_source, reorder_estimate_source
 
     def cal_si_snr_with_pit(self, source, estimate_source, source_lengths):
         """
-        Calculate SI-SNR with PIT training.
+        Calculate SI-SNR with PIT.
         Args:
-            source: [B, C, K, L]
-            estimate_source: [B, C, K, L]
-            source_lengths: [B], each item is between [0, K]
+            source: [B, C, T] or [B, C, K, L]
+            estimate_source: same shape as source
+            source_lengths: [B], each item is between [0, source.shape[2]]
+        Returns:
+            max_snr: [B, 1], mean SI-SNR under the best permutation
+            max_snr_perm: [B, C], estimate assigned to every source
         """
-        B, C, _, L = source.shape
-        num_samples = (L * source_lengths).view(-1, 1, 1, 1)  # [B, 1, 1, 1]
-        mean_target = self.sum(source, [2, 3]) / num_samples
-        mean_estimate = self.sum(estimate_source, [2, 3]) / num_samples
-        zero_mean_target = source - mean_target
-        zero_mean_estimate = estimate_source - mean_estimate
-
-        # SI-SNR with PIT
-        # flat K, L to T (T = K * L)
-        flat_target = zero_mean_target.view(B, C, -1)  # [B, C, T]
-        flat_estimate = zero_mean_estimate.view(B, C, -1)  # [B, C, T]
-        # reshape to use broadcast
-        s_target = self.expand_dims(flat_target, 1)  # [B, 1, C, T]
-        s_estimate = self.expand_dims(flat_estimate, 2)  # [B, C, 1, T]
+        B, C = source.shape[0], source.shape[1]
+        # flat K, L to T (T = K * L), lengths are counted in frames
+        frame_length = source.size // (B * C * source.shape[2])
+        source = source.view(B, C, -1)  # [B, C, T]
+        estimate_source = estimate_source.view(B, C, -1)  # [B, C, T]
+
+        # Step 1. Zero-mean norm, masking padding position along T
+        mask = self.get_mask(source, source_lengths * frame_length)  # [B, 1, T]
+        num_samples = self.sum(mask, 2)  # [B, 1, 1]
+        source = source * mask
+        estimate_source = estimate_source * mask
+        zero_mean_target = (source - self.sum(source, 2) / num_samples) * mask
+        zero_mean_estimate = (
+            estimate_source - self.sum(estimate_source, 2) / num_samples
+        ) * mask
+
+        # Step 2. SI-SNR of every estimate against every source
+        s_target = self.expand_dims(zero_mean_target, 1)  # [B, 1, C, T]
+        s_estimate = self.expand_dims(zero_mean_estimate, 2)  # [B, C, 1, T]
         # s_target = <s', s>s / ||s||^2
         pair_wise_dot = self.sum(s_estimate * s_target, 3)  # [B, C, C, 1]
         s_target_energy = self.sum(s_target**2, 3) + EPS  # [B, 1, C, 1]
@@ -87,167 +151,56 @@ class Separation_Loss(nn.Cell):
         )
         pair_wise_si_snr = (
             10 * self.log(pair_wise_si_snr + EPS) / self.log(self.log10)
-        )  # [B, C, C]
-
-        # Get max_snr of each utterance
-        # permutations, [C!, C]
-        perms = self.perms
-        perms_one_hot = self.perms_ones_hot
-        snr_set = self.matmul(pair_wise_si_snr.view(B, -1), perms_one_hot)
-        max_snr_idx = self.Argmax(snr_set)
-        _, max_snr = self.argmax(snr_set)
+        )  # [B, C, C], estimate x source
+
+        # Step 3. Best assignment of the estimates to the sources
+        if self.exhaustive:
+            # [B, C!], SI-SNR sum of every permutation
+            snr_set = self.matmul(pair_wise_si_snr.view(B, -1), self.perms_one_hot)
+            max_snr_idx = self.Argmax(snr_set)  # [B]
+            _, max_snr = self.argmax(snr_set)
+            max_snr_perm = ops.gather(self.perms, max_snr_idx, 0)  # [B, C]
+        else:
+            max_snr, max_snr_perm = self.greedy_assign(pair_wise_si_snr)
         max_snr /= C
-        return max_snr, perms, max_snr_idx
-
-    def get_mask(self, source):
-        """Calculate mask"""
-        B, _, K, _ = source.shape
-        mask = self.ones((B, 1, K, 1), mindspore.float32)
-        for i in range(B):
-            mask[i, :, 3320:, :] = 0
-        return mask
+        return max_snr, max_snr_perm
 
-    def reorder_source(self, source, perms, max_snr_idx):
+    def greedy_assign(self, pair_wise_si_snr):
         """
+        Assign the estimates to the sources greedily, best remaining pair first.
         Args:
-            source: [B, C, K, L]
-            perms: [C!, C], permutations
-            max_snr_idx: [B], each item is between [0, C!)
+            pair_wise_si_snr: [B, C, C], estimate x source
         Returns:
-            reorder_source: [B, C, K, L]
+            max_snr: [B, 1], SI-SNR sum of the assignment
+            max_snr_perm: [B, C], estimate assigned to every source
         """
-        B, C, _, _ = source.shape
-        # [B, C], permutation whose SI-SNR is max of each utterance
-        # for each utterance, reorder estimate source according this permutation
-        max_snr_perm = perms[max_snr_idx, :]
-        reorder_source = self.zeros_like(source)
-        for b in range(B):
-            for c in range(C):
-                if max_snr_perm[b][c] == 1:
-                    reorder_source[b, c] = source[b, 1]
-                else:
-                    reorder_source[b, c] = source[b, 0]
-        return reorder_source
-
-
-class Convtasnet_Loss(nn.Cell):
-    def __init__(self):
-        super(Convtasnet_Loss, self).__init__()
-        self.mean = ops.ReduceMean()
-        self.cast = ops.Cast()
-        self.sum = ops.ReduceSum(keep_dims=True)
-        self.expand_dims = ops.ExpandDims()
-        self._sum = ops.ReduceSum(keep_dims=False)
-        self.log = ops.Log()
-        self.scatter = ops.ScatterNd()
-        self.matmul = ops.MatMul()
-        self.transpose = ops.Transpose()
-        self.Argmax = ops.Argmax(axis=1, output_type=mindspore.int32)
-        self.argmax = ops.ArgMaxWithValue(axis=1, keep_dims=True)
-        self.ones = ops.Ones()
-        self.zeros_like = ops.ZerosLike()
-        self.log10 = Tensor(np.array([10.0]), mindspore.float32)
-        self.perms = Tensor(list(permutations(range(2))), dtype=mindspore.int64)
-        self.perms_one_hot = Tensor(
-            np.array([[1, 0], [0, 1], [0, 1], [1, 0]]), mindspore.float32
-        )
-
-        self.print = ops.Print()
-
-    def construct(self, source, estimate_source, source_lengths):
-        return self.cal_loss(source, estimate_source, source_lengths)
-
-    def cal_loss(self, source, estimate_source, source_lengths):
+        B, C, _ = pair_wise_si_snr.shape
+        scores = ops.stop_gradient(pair_wise_si_snr)
+        assign = self.zeros_like(scores)  # [B, C, C], one-hot pairs
+        for _ in range(C):
+            # rule out the estimates and sources already assigned
+            taken = self.sum(assign, 2) + self.sum(assign, 1)  # [B, C, C]
+            masked = scores - 1e6 * taken
+            pair = self.Argmax(masked.view(B, -1))  # [B]
+            assign += self.one_hot(pair, C * C, self.on_value, self.off_value).view(
+                B, C, C
+            )
+        max_snr = self._sum(assign * pair_wise_si_snr, (1, 2)).view(B, 1)
+        max_snr_perm = self.Argmax(assign)  # [B, C]
+        return max_snr, max_snr_perm
+
+    def reorder_source(self, source, max_snr_perm):
         """
         Args:
-            source: [B, C, T], B is batch size
-            estimate_source: [B, C, T]
-            source_lengths: [B]
-        """
-        max_snr, perms, max_snr_idx = self.cal_si_snr_with_pit(
-            source, estimate_source, source_lengths
-        )
-        loss_cal = 0 - self.mean(max_snr)
-        reorder_estimate_source = self.reorder_source(
-            estimate_source, perms, max_snr_idx
-        )
-        return loss_cal, max_snr, estimate_source, reorder_estimate_source
-
-    def cal_si_snr_with_pit(self, source, estimate_source, source_lengths):
-        """Calculate SI-SNR with PIT training.
-        Args:
-            source: [B, C, T], B is batch size
-            estimate_source: [B, C, T]
-            source_lengths: [B], each item is between [0, T]
-        """
-        B, C, _ = source.shape
-        # mask padding position along T
-        mask = self.get_mask(source, source_lengths)
-        estimate_source *= mask
-
-        # Step 1. Zero-mean norm
-        num_samples = self.cast(
-            source_lengths.view(-1, 1, 1), mindspore.float32
-        )  # [B, 1, 1]
-        mean_target = self.sum(source, 2) / num_samples
-        mean_estimate = self.sum(estimate_source, 2) / num_samples
-        zero_mean_target = source - mean_target
-        zero_mean_estimate = estimate_source - mean_estimate
-        # mask padding position along T
-        zero_mean_target *= mask
-        zero_mean_estimate *= mask
-
-        # Step 2. SI-SNR with PIT
-        # reshape to use broadcast
-        s_target = self.expand_dims(zero_mean_target, 1)  # [B, 1, C, T]
-        s_estimate = self.expand_dims(zero_mean_estimate, 2)  # [B, C, 1, T]
-        # s_target = <s', s>s / ||s||^2
-        pair_wise_dot = self.sum(s_estimate * s_target, 3)  # [B, C, C, 1]
-        s_target_energy = self.sum(s_target**2, 3) + EPS  # [B, 1, C, 1]
-        pair_wise_proj = pair_wise_dot * s_target / s_target_energy  # [B, C, C, T]
-        # e_noise = s' - s_target
-        e_noise = s_estimate - pair_wise_proj  # [B, C, C, T]
-        # SI-SNR = 10 * log_10(||s_target||^2 / ||e_noise||^2)
-        pair_wise_si_snr = self._sum(pair_wise_proj**2, 3) / (
-            self._sum(e_noise**2, 3) + EPS
-        )
-        pair_wise_si_snr = (
-            10 * self.log(pair_wise_si_snr + EPS) / self.log(self.log10)
-        )  # [B, C, C]
-
-        # Get max_snr of each utterance
-        # permutations, [C!, C]
-        perms = self.perms
-        # [B, C!] <- [B, C, C] einsum [C!, C, C], SI-SNR sum of each permutation
-        perms_one_hot = self.perms_one_hot
-        snr_set = self.matmul(pair_wise_si_snr.view(B, -1), perms_one_hot)
-        max_snr_idx = self.Argmax(snr_set)  # [B]
-        # max_snr = torch.gather(snr_set, 1, max_snr_idx.view(-1, 1))  # [B, 1]
-        _, max_snr = self.argmax(snr_set)
-        max_snr /= C
-        return max_snr, perms, max_snr_idx
-
-    def reorder_source(self, source, perms, max_snr_idx):
-        """
-        Args:
-            source: [B, C, T]
-            perms: [C!, C], permutations
-            max_snr_idx: [B], each item is between [0, C!)
+            source: [B, C, T] or [B, C, K, L]
+            max_snr_perm: [B, C], estimate assigned to every source
         Returns:
-            reorder_source: [B, C, T]
+            reorder_source: same shape as source
         """
-        B, C, _ = source.shape
-        # [B, C], permutation whose SI-SNR is max of each utterance
-        # for each utterance, reorder estimate source according this permutation
-        max_snr_perm = perms[max_snr_idx, :]
-        reorder_source = self.zeros_like(source)
-        for b in range(B):
-            for c in range(C):
-                if max_snr_perm[b][c] == 1:
-                    reorder_source[b, c] = source[b, 1]
-                else:
-                    reorder_source[b, c] = source[b, 0]
-        return reorder_source
+        B, C = source.shape[0], source.shape[1]
+        flat_source = source.view(B, C, -1)
+        index = ops.broadcast_to(self.expand_dims(max_snr_perm, 2), flat_source.shape)
+        return ops.gather_elements(flat_source, 1, index).view(source.shape)
 
     def get_mask(self, source, source_lengths):
         """
@@ -257,11 +210,23 @@ class Convtasnet_Loss(nn.Cell):
         Returns:
             mask: [B, 1, T]
         """
-        B, _, T = source.shape
-        mask = self.ones((B, 1, T), mindspore.float32)
-        for i in range(B):
-            mask[i, :, 46400:] = 0
-        return mask
+        T = source.shape[-1]
+        positions = ops.arange(T).view(1, 1, T)
+        mask = positions < source_lengths.view(-1, 1, 1)
+        return self.cast(mask, mindspore.float32)
+
+
+class Separation_Loss(PITLoss):
+    """
+    PIT loss of TasNet, whose sources are [B, C, K, L] frames and lengths
+    numbers of frames K. See `PITLoss`.
+    """
+
+
+class Convtasnet_Loss(PITLoss):
+    """
+    PIT loss of Conv-TasNet, whose sources are [B, C, T] samples. See `PITLoss`.
+    """
 
 
 class NetWithLoss(nn.Cell):
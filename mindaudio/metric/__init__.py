@@ -1,3 +1,4 @@
 from .eer import *
+from .scoring import *
 from .snr import *
 from .wer import *
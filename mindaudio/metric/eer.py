@@ -1,30 +1,88 @@
+import numpy as np
+
+
+def _fa_miss_from_counts(pos_counts, neg_counts):
+    """P_fa and P_miss when accepting the trials of bin k and above, for every k.
+
+    `pos_counts` and `neg_counts` count the target and non-target trials of
+    bins sorted by increasing score. One more operating point, rejecting all
+    trials, is appended at the end.
+    """
+    num_pos, num_neg = pos_counts.sum(), neg_counts.sum()
+    if num_pos == 0 or num_neg == 0:
+        raise ValueError(
+            "Both target and non-target trials are needed, "
+            f"got {num_pos} targets and {num_neg} non-targets."
+        )
+    # targets rejected below every threshold, non-targets accepted above it
+    miss = np.concatenate([[0], np.cumsum(pos_counts)])
+    fa = np.concatenate([np.cumsum(neg_counts[::-1])[::-1], [0]])
+    return fa / num_neg, miss / num_pos
+
+
 def compute_fa_miss(scores, labels, pos_label=1, return_thresholds=True):
-    """Returns P_fa, P_miss, [thresholds]"""
-    from sklearn.metrics import roc_curve
+    """Returns P_fa, P_miss, [thresholds]
 
-    fpr, tpr, thresholds = roc_curve(labels, scores, pos_label=pos_label)
-    P_fa = fpr[::-1]
-    P_miss = 1.0 - tpr[::-1]
-    thresholds = thresholds[::-1]
+    The operating points of every distinct score are found with one sort and
+    cumulative sums, in O(N log N) time and O(N) memory. A trial is accepted
+    when its score is greater or equal to the threshold, thresholds increase,
+    and the last one (inf) rejects all trials.
+    """
+    scores = np.asarray(scores).ravel()
+    labels = np.asarray(labels).ravel() == pos_label
+    thresholds, inverse = np.unique(scores, return_inverse=True)
+    pos_counts = np.bincount(inverse, weights=labels, minlength=len(thresholds))
+    neg_counts = np.bincount(inverse, minlength=len(thresholds)) - pos_counts
+    P_fa, P_miss = _fa_miss_from_counts(pos_counts, neg_counts)
     if return_thresholds:
-        return P_fa, P_miss, thresholds
+        return P_fa, P_miss, np.append(thresholds, np.inf)
     return P_fa, P_miss
 
 
 def get_eer(P_fa, P_miss, thresholds=None):
-    """Compute EER given false alarm and miss probabilities"""
-    from scipy.interpolate import interp1d
-    from scipy.optimize import brentq
+    """Compute EER given false alarm and miss probabilities
 
-    eer = brentq(lambda x: x - interp1d(P_fa, P_miss)(x), 0.0, 1.0)
+    The operating points must be ordered by increasing threshold, as returned by
+    `compute_fa_miss`. The EER is where the linear interpolation of the DET
+    curve crosses P_fa == P_miss.
+    """
+    P_fa, P_miss = np.asarray(P_fa, dtype=np.float64), np.asarray(P_miss, np.float64)
+    diff = P_miss - P_fa  # non-decreasing
+    index = int(np.searchsorted(diff, 0.0, side="left"))
+    if index == 0:
+        weight, index = 0.0, 1
+    elif index == len(diff):
+        weight, index = 1.0, len(diff) - 1
+    else:
+        weight = diff[index - 1] / (diff[index - 1] - diff[index])
+    eer = P_fa[index - 1] + weight * (P_fa[index] - P_fa[index - 1])
     eer = float(eer)
     if thresholds is None:
         return eer
-    thresh_eer = interp1d(P_fa, thresholds)(eer)
-    thresh_eer = float(thresh_eer)
+    low, high = thresholds[index - 1], thresholds[index]
+    if not np.isfinite(high):
+        high = low
+    thresh_eer = float(low + weight * (high - low))
     return eer, thresh_eer
 
 
+def get_min_dcf(P_fa, P_miss, thresholds=None, p_target=0.01, c_miss=1.0, c_fa=1.0):
+    """Compute the normalized minimum detection cost given false alarm and miss
+    probabilities
+
+    DCF = c_miss * P_miss * p_target + c_fa * P_fa * (1 - p_target), normalized
+    by the cost of the best trivial system, min(c_miss * p_target, c_fa * (1 - p_target)).
+    """
+    dcf = c_miss * np.asarray(P_miss) * p_target + c_fa * np.asarray(P_fa) * (
+        1 - p_target
+    )
+    index = int(np.argmin(dcf))
+    min_dcf = float(dcf[index] / min(c_miss * p_target, c_fa * (1 - p_target)))
+    if thresholds is None:
+        return min_dcf
+    return min_dcf, float(thresholds[index])
+
+
 def get_eer_from_scores(scores, labels, pos_label=1):
     """Compute EER given scores and labels"""
     P_fa, P_miss, thresholds = compute_fa_miss(
@@ -32,3 +90,90 @@ def get_eer_from_scores(scores, labels, pos_label=1):
     )
     eer, thresh_eer = get_eer(P_fa, P_miss, thresholds)
     return eer, thresh_eer
+
+
+def get_min_dcf_from_scores(
+    scores, labels, pos_label=1, p_target=0.01, c_miss=1.0, c_fa=1.0
+):
+    """Compute minDCF given scores and labels"""
+    P_fa, P_miss, thresholds = compute_fa_miss(
+        scores, labels, pos_label, return_thresholds=True
+    )
+    return get_min_dcf(P_fa, P_miss, thresholds, p_target, c_miss, c_fa)
+
+
+class ScoreAccumulator:
+    """
+    Accumulate verification trial scores chunk by chunk and compute EER / minDCF.
+
+    By default the scores are kept and the metrics are exact. With `num_bins`,
+    only a histogram of the target and non-target scores over `score_range` is
+    kept, so the memory no longer grows with the number of trials and the
+    thresholds are quantized to the bin edges. Scores outside the range are
+    counted in the first or last bin.
+
+    Args:
+        num_bins (int, optional): Number of histogram bins, None to keep the
+            exact scores. Default: None.
+        score_range (tuple, optional): (low, high) range of the histogram.
+            Default: (-1.0, 1.0), the range of cosine scores.
+        pos_label (int, optional): Label of the target trials. Default: 1.
+
+    Examples:
+        >>> acc = ScoreAccumulator(num_bins=100000)
+        >>> for scores, labels in score_chunks:
+        ...     acc.update(scores, labels)
+        >>> eer, thresh_eer = acc.eer()
+        >>> min_dcf, thresh_dcf = acc.min_dcf(p_target=0.01)
+    """
+
+    def __init__(self, num_bins=None, score_range=(-1.0, 1.0), pos_label=1):
+        self.num_bins = num_bins
+        self.score_range = score_range
+        self.pos_label = pos_label
+        self.reset()
+
+    def reset(self):
+        """Forget all the accumulated trials."""
+        if self.num_bins is None:
+            self._scores, self._labels = [], []
+        else:
+            self._pos_counts = np.zeros(self.num_bins, dtype=np.int64)
+            self._neg_counts = np.zeros(self.num_bins, dtype=np.int64)
+
+    def update(self, scores, labels):
+        """Add a chunk of trials.
+
+        Args:
+            scores (np.ndarray): Scores of the trials.
+            labels (np.ndarray): Labels of the trials.
+        """
+        scores = np.asarray(scores, dtype=np.float64).ravel()
+        labels = np.asarray(labels).ravel() == self.pos_label
+        if self.num_bins is None:
+            self._scores.append(scores)
+            self._labels.append(labels)
+            return
+        low, high = self.score_range
+        bins = np.floor((scores - low) * (self.num_bins / (high - low)))
+        bins = np.clip(bins, 0, self.num_bins - 1).astype(np.int64)
+        self._pos_counts += np.bincount(bins[labels], minlength=self.num_bins)
+        self._neg_counts += np.bincount(bins[~labels], minlength=self.num_bins)
+
+    def compute_fa_miss(self):
+        """Returns P_fa, P_miss and thresholds of the trials seen so far."""
+        if self.num_bins is None:
+            return compute_fa_miss(
+                np.concatenate(self._scores), np.concatenate(self._labels), True
+            )
+        P_fa, P_miss = _fa_miss_from_counts(self._pos_counts, self._neg_counts)
+        thresholds = np.linspace(*self.score_range, self.num_bins + 1)
+        return P_fa, P_miss, thresholds
+
+    def eer(self):
+        """Returns the EER and its threshold."""
+        return get_eer(*self.compute_fa_miss())
+
+    def min_dcf(self, p_target=0.01, c_miss=1.0, c_fa=1.0):
+        """Returns the normalized minDCF and its threshold."""
+        return get_min_dcf(*self.compute_fa_miss(), p_target, c_miss, c_fa)
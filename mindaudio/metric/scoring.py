@@ -0,0 +1,132 @@
+"""Batched cosine scoring of speaker verification trials."""
+
+import numpy as np
+
+__all__ = ["cohort_stats", "cosine_scoring"]
+
+
+def _normalize(embeddings, eps=1e-12):
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norm = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    return embeddings / np.maximum(norm, eps)
+
+
+def _stack(embeddings, ids):
+    """Normalized embeddings of `ids` from a dict, or rows of an array."""
+    if isinstance(embeddings, dict):
+        return _normalize(np.stack([np.ravel(embeddings[i]) for i in ids]))
+    return _normalize(np.asarray(embeddings)[ids])
+
+
+def cohort_stats(embeddings, cohort, cohort_size=None, chunk_size=4096):
+    """
+    Mean and standard deviation of the cosine scores of every embedding against
+    an impostor cohort.
+
+    The scores of a chunk of embeddings against the whole cohort are one matrix
+    multiply, and the `cohort_size` closest impostors of every row are selected
+    with `np.argpartition`, as used by adaptive S-norm.
+
+    Args:
+        embeddings (np.ndarray): Embeddings, (N, D).
+        cohort (np.ndarray): Cohort embeddings, (C, D).
+        cohort_size (int, optional): Number of top scoring cohort embeddings used
+            for the statistics, None to use the whole cohort. Default: None.
+        chunk_size (int, optional): Number of embeddings scored at once, bounds
+            the (chunk_size, C) score matrix. Default: 4096.
+
+    Returns:
+        - np.ndarray, the mean of every embedding, (N,).
+        - np.ndarray, the standard deviation of every embedding, (N,).
+
+    Examples:
+        >>> mean, std = cohort_stats(np.random.randn(10, 192), np.random.randn(500, 192), 100)
+    """
+    embeddings = _normalize(embeddings)
+    cohort = _normalize(cohort)
+    if cohort_size is not None and cohort_size >= cohort.shape[0]:
+        cohort_size = None
+    mean = np.empty(embeddings.shape[0], dtype=np.float64)
+    std = np.empty(embeddings.shape[0], dtype=np.float64)
+    for start in range(0, embeddings.shape[0], chunk_size):
+        scores = embeddings[start : start + chunk_size] @ cohort.T
+        if cohort_size is not None:
+            scores = np.partition(scores, -cohort_size, axis=1)[:, -cohort_size:]
+        mean[start : start + chunk_size] = scores.mean(axis=1)
+        std[start : start + chunk_size] = scores.std(axis=1)
+    return mean, std
+
+
+def cosine_scoring(
+    enrol,
+    test,
+    trials,
+    cohort=None,
+    score_norm=None,
+    cohort_size=None,
+    chunk_size=4096,
+):
+    """
+    Cosine scores of a list of verification trials, optionally normalized.
+
+    Enrolment and test ids are deduplicated, so every embedding is normalized and
+    scored against the cohort once however many trials it appears in. All trials
+    are then scored with vectorized row-wise dot products.
+
+    Args:
+        enrol (Union[dict, np.ndarray]): Enrolment embeddings, a mapping from id
+            to embedding, or an (N, D) array indexed by integer ids.
+        test (Union[dict, np.ndarray]): Test embeddings, same as `enrol`.
+        trials (list): (enrol_id, test_id) pairs.
+        cohort (np.ndarray, optional): Impostor cohort embeddings (C, D), needed by
+            `score_norm`. Default: None.
+        score_norm (str, optional): Score normalization, one of "z-norm" (enrolment
+            statistics), "t-norm" (test statistics), "s-norm" (average of both) or
+            None. With `cohort_size`, "s-norm" is adaptive S-norm. Default: None.
+        cohort_size (int, optional): Number of top scoring cohort embeddings used
+            for the statistics, None for the whole cohort. Default: None.
+        chunk_size (int, optional): Number of embeddings or trials processed at
+            once. Default: 4096.
+
+    Returns:
+        np.ndarray, the score of every trial, (len(trials),).
+
+    Examples:
+        >>> trials = [("spk1", "utt1"), ("spk1", "utt2"), ("spk2", "utt1")]
+        >>> scores = cosine_scoring(spk2emb, utt2emb, trials, cohort, "s-norm", 300)
+    """
+    if score_norm not in (None, "z-norm", "t-norm", "s-norm"):
+        raise ValueError(
+            f"score_norm must be z-norm, t-norm, s-norm or None, got {score_norm}."
+        )
+    if score_norm is not None and cohort is None:
+        raise ValueError(f"A cohort is needed for {score_norm}.")
+    if len(trials) == 0:
+        return np.zeros(0, dtype=np.float64)
+
+    enrol_ids, test_ids = zip(*trials)
+    enrol_keys, enrol_index = np.unique(np.asarray(enrol_ids), return_inverse=True)
+    test_keys, test_index = np.unique(np.asarray(test_ids), return_inverse=True)
+    enrol_embs = _stack(enrol, enrol_keys)
+    test_embs = _stack(test, test_keys)
+
+    scores = np.empty(len(trials), dtype=np.float64)
+    for start in range(0, len(trials), chunk_size):
+        e = enrol_embs[enrol_index[start : start + chunk_size]]
+        t = test_embs[test_index[start : start + chunk_size]]
+        scores[start : start + chunk_size] = np.einsum("ij,ij->i", e, t)
+
+    if score_norm in ("z-norm", "s-norm"):
+        mean, std = cohort_stats(enrol_embs, cohort, cohort_size, chunk_size)
+        score_e = (scores - mean[enrol_index]) / std[enrol_index]
+    if score_norm in ("t-norm", "s-norm"):
+        mean, std = cohort_stats(test_embs, cohort, cohort_size, chunk_size)
+        score_t = (scores - mean[test_index]) / std[test_index]
+
+    if score_norm == "z-norm":
+        return score_e
+    if score_norm == "t-norm":
+        return score_t
+    if score_norm == "s-norm":
+        return 0.5 * (score_e + score_t)
+    return scores
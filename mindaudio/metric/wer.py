@@ -1,5 +1,245 @@
 """Metric function."""
 
+from collections import namedtuple
+from multiprocessing import Pool
+
+import numpy as np
+
+__all__ = ["wer", "edit_distance", "edit_ops", "corpus_wer", "corpus_cer", "ErrorRate"]
+
+# largest number of Levenshtein table cells held at once, 64 MB of int32
+_MAX_DP_CELLS = 1 << 24
+
+ErrorRate = namedtuple(
+    "ErrorRate",
+    [
+        "error_rate",
+        "substitutions",
+        "deletions",
+        "insertions",
+        "num_tokens",
+        "utterances",
+    ],
+)
+ErrorRate.__doc__ = """Corpus-level error rate.
+
+    `utterances` is an int array of shape (N, 4) holding the substitutions,
+    deletions, insertions and reference length of every utterance.
+"""
+
+
+def _edit_ops_batch(batch):
+    """S/D/I counts of a batch of (ref, hyp) id sequences, (B, 3)."""
+    refs, hyps = batch
+    size = len(refs)
+    ref_lens = np.array([len(r) for r in refs])
+    hyp_lens = np.array([len(h) for h in hyps])
+    n, m = ref_lens.max(initial=0), hyp_lens.max(initial=0)
+    # pad with ids that never match each other, with at least one padding
+    # column so the backtrace can index a batch of empty sequences
+    ref = np.full((size, n + 1), -1, dtype=np.int64)
+    hyp = np.full((size, m + 1), -2, dtype=np.int64)
+    for b in range(size):
+        ref[b, : ref_lens[b]] = refs[b]
+        hyp[b, : hyp_lens[b]] = hyps[b]
+
+    # dp[:, i, j] is the distance between ref[:i] and hyp[:j], filled one ref
+    # token at a time for all utterances and hyp positions at once
+    dp = np.empty((size, n + 1, m + 1), dtype=np.int32)
+    columns = np.arange(m + 1)
+    dp[:, 0] = columns
+    for i in range(1, n + 1):
+        prev = dp[:, i - 1]
+        candidates = np.empty((size, m + 1), dtype=np.int32)
+        candidates[:, 0] = i
+        # substitution (or match) and deletion
+        np.minimum(
+            prev[:, :-1] + (ref[:, i - 1, None] != hyp[:, :m]),
+            prev[:, 1:] + 1,
+            out=candidates[:, 1:],
+        )
+        # insertions chain along the row: dp[i][j] = min_k(cand[k] + j - k)
+        dp[:, i] = np.minimum.accumulate(candidates - columns, axis=1) + columns
+
+    # backtrace all utterances together, preferring substitutions
+    rows = np.arange(size)
+    i, j = ref_lens.copy(), hyp_lens.copy()
+    counts = np.zeros((size, 3), dtype=np.int64)
+    while True:
+        active = (i > 0) | (j > 0)
+        if not active.any():
+            break
+        cost = dp[rows, i, j]
+        pi, pj = np.maximum(i - 1, 0), np.maximum(j - 1, 0)
+        mismatch = ref[rows, pi] != hyp[rows, pj]
+        diagonal = (i > 0) & (j > 0) & (dp[rows, pi, pj] + mismatch == cost)
+        deletion = ~diagonal & (i > 0) & (dp[rows, pi, j] + 1 == cost)
+        insertion = active & ~diagonal & ~deletion
+        counts[:, 0] += diagonal & mismatch
+        counts[:, 1] += deletion
+        counts[:, 2] += insertion
+        i -= diagonal | deletion
+        j -= diagonal | insertion
+    return counts
+
+
+def _to_ids(refs, hyps):
+    """Map the tokens of all sequences to integer ids shared by the corpus."""
+    vocab = {}
+    ref_ids = [
+        np.array([vocab.setdefault(t, len(vocab)) for t in r], dtype=np.int64)
+        for r in refs
+    ]
+    hyp_ids = [
+        np.array([vocab.setdefault(t, len(vocab)) for t in h], dtype=np.int64)
+        for h in hyps
+    ]
+    return ref_ids, hyp_ids
+
+
+def edit_ops(refs, hyps, num_workers=1, batch_size=128):
+    """
+    Count the substitutions, deletions and insertions turning every reference
+    into its hypothesis.
+
+    Utterances are sorted by length and scored in batches: the Levenshtein table
+    of a whole batch is filled one reference token at a time with numpy, the
+    insertions along a row being resolved by a running minimum, so the number
+    of interpreted operations grows with the length of the longest reference
+    rather than with the product of the lengths. A batch is cut short when its
+    table would exceed 2^24 cells, so long utterances are scored in smaller
+    batches and memory stays bounded. Batches can be spread over a process pool.
+
+    Args:
+        refs (list): Reference token sequences, e.g. lists of words.
+        hyps (list): Hypothesis token sequences, in the same order.
+        num_workers (int, optional): Number of worker processes. Default: 1.
+        batch_size (int, optional): Number of utterances scored at once. Default: 128.
+
+    Returns:
+        np.ndarray, (N, 3) int array of the substitutions, deletions and insertions.
+
+    Examples:
+        >>> edit_ops([["who's", "there"]], [["what's", "over", "there"]])
+        array([[1, 0, 1]])
+    """
+    if len(refs) != len(hyps):
+        raise ValueError(
+            f"Got {len(refs)} references but {len(hyps)} hypotheses, they must match."
+        )
+    if not refs:
+        return np.zeros((0, 3), dtype=np.int64)
+    ref_ids, hyp_ids = _to_ids(refs, hyps)
+    order = np.lexsort(([len(h) for h in hyp_ids], [len(r) for r in ref_ids]))
+    batches = []
+    index, n, m = [], 0, 0
+    for k in order:
+        n_k, m_k = max(n, len(ref_ids[k])), max(m, len(hyp_ids[k]))
+        cells = (len(index) + 1) * (n_k + 1) * (m_k + 1)
+        if index and (len(index) == batch_size or cells > _MAX_DP_CELLS):
+            batches.append(([ref_ids[i] for i in index], [hyp_ids[i] for i in index]))
+            index, n_k, m_k = [], len(ref_ids[k]), len(hyp_ids[k])
+        index.append(k)
+        n, m = n_k, m_k
+    batches.append(([ref_ids[i] for i in index], [hyp_ids[i] for i in index]))
+
+    if num_workers > 1 and len(batches) > 1:
+        with Pool(num_workers) as pool:
+            results = pool.map(_edit_ops_batch, batches)
+    else:
+        results = [_edit_ops_batch(batch) for batch in batches]
+
+    counts = np.empty((len(order), 3), dtype=np.int64)
+    counts[order] = np.concatenate(results)
+    return counts
+
+
+def edit_distance(ref, hyp):
+    """
+    Levenshtein distance between two token sequences.
+
+    Args:
+        ref (Union[list, str]): Reference sequence.
+        hyp (Union[list, str]): Hypothesis sequence.
+
+    Returns:
+        int, minimum number of substitutions, deletions and insertions.
+
+    Examples:
+        >>> edit_distance("kitten", "sitting")
+        3
+    """
+    return int(edit_ops([ref], [hyp]).sum())
+
+
+def _error_rate(refs, hyps, num_workers, batch_size):
+    counts = edit_ops(refs, hyps, num_workers, batch_size)
+    ref_lens = np.array([len(r) for r in refs], dtype=np.int64)
+    num_tokens = int(ref_lens.sum())
+    if num_tokens == 0:
+        raise ValueError("The references must not be all empty.")
+    substitutions, deletions, insertions = (int(c) for c in counts.sum(axis=0))
+    return ErrorRate(
+        (substitutions + deletions + insertions) / num_tokens,
+        substitutions,
+        deletions,
+        insertions,
+        num_tokens,
+        np.concatenate([counts, ref_lens[:, None]], axis=1),
+    )
+
+
+def corpus_wer(refs, hyps, num_workers=1, batch_size=128):
+    """
+    Word error rate of a whole test set.
+
+    Unlike averaging `wer` over utterances, the errors and reference words are
+    summed over the corpus first, i.e. :math:`WER = (S+D+I)/N` with every term
+    counted on the full set.
+
+    Args:
+        refs (list): Reference utterances, strings of space separated words or
+            lists of words.
+        hyps (list): Hypothesis utterances, in the same order.
+        num_workers (int, optional): Number of worker processes. Default: 1.
+        batch_size (int, optional): Number of utterances scored at once. Default: 128.
+
+    Returns:
+        ErrorRate, the aggregate WER, its substitutions, deletions, insertions and
+        number of reference words, and the per-utterance counts.
+
+    Examples:
+        >>> result = corpus_wer(["who's there", "hello"], ["who's over there", "hello"])
+        >>> result.error_rate, result.insertions
+        (0.3333333333333333, 1)
+    """
+    refs = [r.split() if isinstance(r, str) else r for r in refs]
+    hyps = [h.split() if isinstance(h, str) else h for h in hyps]
+    return _error_rate(refs, hyps, num_workers, batch_size)
+
+
+def corpus_cer(refs, hyps, num_workers=1, batch_size=128):
+    """
+    Character error rate of a whole test set, spaces are ignored.
+
+    Args:
+        refs (list): Reference strings.
+        hyps (list): Hypothesis strings, in the same order.
+        num_workers (int, optional): Number of worker processes. Default: 1.
+        batch_size (int, optional): Number of utterances scored at once. Default: 128.
+
+    Returns:
+        ErrorRate, the aggregate CER, its substitutions, deletions, insertions and
+        number of reference characters, and the per-utterance counts.
+
+    Examples:
+        >>> corpus_cer(["abc d"], ["abd"]).error_rate
+        0.25
+    """
+    refs = [list(r.replace(" ", "")) for r in refs]
+    hyps = [list(h.replace(" ", "")) for h in hyps]
+    return _error_rate(refs, hyps, num_workers, batch_size)
+
 
 def wer(ref, hyp):
     r"""
@@ -17,7 +257,8 @@ def wer(ref, hyp):
     We now use dynamic algorithm to find the minimum edits. Define dp, dp[i][j] means minimum edits between ref[:i] and
     hyp[:j]. The transition equation is thus ``dp[i][j] = dp[i-1][j-1] if ref[i-1]==hyp[j-1] else
     min(dp[i-1][j-1] + 1, dp[i][j-1] + 1, dp[i-1][j] + 1)``. The three terms mean through substitution, insertion,
-    and deletion respectively.
+    and deletion respectively. See `edit_ops` for how the table is filled, and `corpus_wer` to score a
+    whole test set.
 
     Args:
         ref (list): Reference utterance.
@@ -36,22 +277,4 @@ def wer(ref, hyp):
     """
     if not ref:
         raise ValueError("The reference utterance must not be empty.")
-    dp = [[0 for _ in range(len(hyp) + 1)] for j in range(len(ref) + 1)]
-    for i in range(len(ref) + 1):
-        for j in range(len(hyp) + 1):
-            if i == 0:
-                dp[0][j] = j
-            elif j == 0:
-                dp[i][0] = i
-
-    # computation
-    for i in range(1, len(ref) + 1):
-        for j in range(1, len(hyp) + 1):
-            if ref[i - 1] == hyp[j - 1]:
-                dp[i][j] = dp[i - 1][j - 1]
-            else:
-                substitution = dp[i - 1][j - 1] + 1
-                insertion = dp[i][j - 1] + 1
-                deletion = dp[i - 1][j] + 1
-                dp[i][j] = min(substitution, insertion, deletion)
-    return dp[-1][-1] / len(ref)
+    return edit_distance(ref, hyp) / len(ref)
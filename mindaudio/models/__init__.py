@@ -1,4 +1,8 @@
-from mindaudio.models.conformer import ConformerEncoder, TransformerDecoder
+from mindaudio.models.conformer import (
+    ConformerEncoder,
+    EncoderStream,
+    TransformerDecoder,
+)
 from mindaudio.models.decoders import MSGreedyDecoder
 from mindaudio.models.deepspeech2 import DeepSpeechModel
 from mindaudio.models.fastspeech2 import FastSpeech2, FastSpeech2WithLoss
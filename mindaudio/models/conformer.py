@@ -1,11 +1,13 @@
 """Definition of ASR model."""
 
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 
 import mindspore
 import mindspore.common.dtype as mstype
 import mindspore.nn as nn
 import mindspore.ops as ops
+import numpy as np
+from mindspore import Tensor
 
 from .layers.attention import MultiHeadedAttention, RelPositionMultiHeadedAttention
 from .layers.convolution import ConvolutionModule
@@ -160,6 +162,71 @@ class ConformerEncoderLayer(nn.Cell):
 
         return x, mask
 
+    def forward_chunk(
+        self,
+        x: mindspore.Tensor,
+        pos_emb: mindspore.Tensor,
+        att_cache: Optional[mindspore.Tensor] = None,
+        cnn_cache: Optional[mindspore.Tensor] = None,
+    ) -> Tuple[mindspore.Tensor, mindspore.Tensor, mindspore.Tensor]:
+        """Compute encoded features of a chunk of a stream.
+
+        Args:
+            x (minspore.Tensor): Chunk of the input (#batch, time, size).
+            pos_emb (minspore.Tensor): positional encoding of the cached and the
+                current frames (1, cache_t + time, size).
+            att_cache (minspore.Tensor): Keys and values of the previous chunks
+                (#batch, head, cache_t, d_k * 2).
+            cnn_cache (minspore.Tensor): Left context of the convolution module
+                (#batch, size, lorder).
+        Returns:
+            minspore.Tensor: Output tensor (#batch, time, size).
+            minspore.Tensor: Updated attention cache (#batch, head, cache_t + time, d_k * 2).
+            minspore.Tensor: Updated convolution cache (#batch, size, lorder).
+        """
+        # Macaron-Net Feedforward module
+        residual = x
+        if self.normalize_before:
+            x = self.norm_ff_macaron(x)
+        x = residual + self.ff_scale * self.dropout(self.feed_forward_macaron(x))
+        if not self.normalize_before:
+            x = self.norm_ff_macaron(x)
+
+        # Multi-headed self-attention module over the cached keys and values
+        residual = x
+        if self.normalize_before:
+            x = self.norm_mha(x)
+        x_att, new_att_cache = self.self_attn.forward_cache(x, pos_emb, att_cache)
+        if self.concat_after:
+            x_concat = self.cat_f1((x, self.cast(x_att, x.dtype)))
+            x = residual + self.concat_linear(x_concat)
+        else:
+            x = residual + self.dropout(x_att)
+        if not self.normalize_before:
+            x = self.norm_mha(x)
+
+        # Convolution module with the left context of the previous chunks
+        residual = x
+        if self.normalize_before:
+            x = self.norm_conv(x)
+        x_conv, new_cnn_cache = self.conv_module.forward_chunk(x, cnn_cache)
+        x = residual + self.dropout(x_conv)
+        if not self.normalize_before:
+            x = self.norm_conv(x)
+
+        # Feedforward module
+        residual = x
+        if self.normalize_before:
+            x = self.norm_ff(x)
+        x = residual + self.ff_scale * self.dropout(self.feed_forward(x))
+        if not self.normalize_before:
+            x = self.norm_ff(x)
+
+        # Final normalization
+        x = self.norm_final(x)
+
+        return x, new_att_cache, new_cnn_cache
+
 
 class BaseEncoder(nn.Cell):
     """Base encode instance.
@@ -257,6 +324,214 @@ class BaseEncoder(nn.Cell):
         # for cross attention with decoder later
         return xs, masks
 
+    def forward_chunk(
+        self,
+        xs: mindspore.Tensor,
+        offset: int,
+        required_cache_size: int,
+        att_cache: Optional[List[mindspore.Tensor]] = None,
+        cnn_cache: Optional[List[mindspore.Tensor]] = None,
+    ) -> Tuple[mindspore.Tensor, List[mindspore.Tensor], List[mindspore.Tensor]]:
+        """Encode one chunk of a stream, reusing the states of the previous chunks.
+
+        Args:
+            xs (mindspore.Tensor): input features of the chunk, including the
+                right context of the subsampling layer,
+                (B, (decoding_chunk_size - 1) * subsample_rate + right_context + 1, D)
+            offset (int): number of encoder frames already emitted for the stream.
+            required_cache_size (int): number of encoder frames the attention
+                keeps for the next chunk.
+                <0: keep all the history.
+                0: keep nothing, every chunk only attends to itself.
+            att_cache (List[mindspore.Tensor]): attention key/value caches of
+                every layer, (B, head, cache_t, d_k * 2).
+            cnn_cache (List[mindspore.Tensor]): convolution module caches of
+                every layer, (B, output_size, lorder).
+        Returns:
+            mindspore.Tensor: encoder output of the chunk (B, decoding_chunk_size, output_size)
+            List[mindspore.Tensor]: attention caches for the next chunk
+            List[mindspore.Tensor]: convolution caches for the next chunk
+        """
+        if self.global_cmvn:
+            xs = self.global_cmvn(xs)
+
+        xs, _ = self.embed(xs, offset)
+        chunk_size = xs.shape[1]
+        cache_size = 0 if att_cache is None else att_cache[0].shape[2]
+        attention_size = cache_size + chunk_size
+        # positional encoding of the cached frames and the current chunk
+        pos_emb = self.embed.position_encoding(offset - cache_size, attention_size)
+        if required_cache_size < 0:
+            next_cache_start = 0
+        elif required_cache_size == 0:
+            next_cache_start = attention_size
+        else:
+            next_cache_start = max(attention_size - required_cache_size, 0)
+
+        r_att_cache = []
+        r_cnn_cache = []
+        for i, layer in enumerate(self.encoders):
+            xs, new_att_cache, new_cnn_cache = layer.forward_chunk(
+                xs,
+                pos_emb,
+                None if att_cache is None else att_cache[i],
+                None if cnn_cache is None else cnn_cache[i],
+            )
+            r_att_cache.append(new_att_cache[:, :, next_cache_start:, :])
+            r_cnn_cache.append(new_cnn_cache)
+        if self.normalize_before:
+            xs = self.after_norm(xs)
+
+        return xs, r_att_cache, r_cnn_cache
+
+    def forward_chunk_by_chunk(
+        self,
+        xs: mindspore.Tensor,
+        decoding_chunk_size: int,
+        num_decoding_left_chunks: int = -1,
+    ) -> Tuple[mindspore.Tensor, mindspore.Tensor]:
+        """Encode a whole utterance the way it is encoded when it is streamed.
+
+        Args:
+            xs (mindspore.Tensor): input features (B, T, D)
+            decoding_chunk_size (int): number of encoder frames per chunk.
+            num_decoding_left_chunks (int): number of previous chunks the
+                attention can see, <0 for all of them.
+        Returns:
+            encoder output tensor xs, and masks
+            xs: output tensor (B, T' ~= T/subsample_rate, D)
+            masks: mindspore.Tensor all-ones mask (B, 1, T')
+        """
+        stream = EncoderStream(self, decoding_chunk_size, num_decoding_left_chunks)
+        ys = stream.accept(xs)
+        ys_tail = stream.flush()
+        if ys is None:
+            ys = ys_tail
+        elif ys_tail is not None:
+            ys = ops.concat((ys, ys_tail), axis=1)
+        masks = ops.ones((ys.shape[0], 1, ys.shape[1]), mstype.float32)
+        return ys, masks
+
+
+class EncoderStream:
+    """Streaming inference of an encoder over consecutive feature chunks.
+
+    Features are buffered until a full chunk, plus the right context of the
+    subsampling layer, is available. Every chunk is then encoded once with
+    `BaseEncoder.forward_chunk`, carrying over the attention key/value caches and
+    the left context of the convolution modules, so the latency of a new output
+    is bounded by the chunk size and never grows with the stream.
+
+    The outputs equal those of the full forward pass under a
+    `subsequent_chunk_mask` of the same chunk size when the convolution modules
+    are causal, e.g. a `ConformerEncoder` built with `causal=True`. Non-causal
+    convolution modules see zeros instead of the frames after every chunk, so
+    the streamed outputs only approximate the full forward pass.
+
+    Args:
+        encoder (BaseEncoder): encoder to run, in inference mode.
+        decoding_chunk_size (int): number of encoder frames per chunk.
+        num_decoding_left_chunks (int): number of previous chunks the attention
+            can see, <0 for all of them.
+        ctc (nn.Cell, optional): CTC module. If given, the log posteriors of
+            `ctc.compute_log_softmax_out` are emitted instead of the encoder
+            output.
+
+    Examples:
+        >>> stream = EncoderStream(encoder, decoding_chunk_size=16, ctc=ctc)
+        >>> for feats in feature_chunks:  # (1, T_i, D) each, any T_i
+        ...     logp = stream.accept(feats)
+        ...     if logp is not None:
+        ...         update_captions(logp)
+        >>> logp = stream.flush()
+    """
+
+    def __init__(
+        self,
+        encoder: BaseEncoder,
+        decoding_chunk_size: int,
+        num_decoding_left_chunks: int = -1,
+        ctc: nn.Cell = None,
+    ):
+        assert decoding_chunk_size > 0
+        self.encoder = encoder
+        self.ctc = ctc
+        subsampling = getattr(encoder.embed, "subsampling_rate", 1)
+        # input frames needed before the first encoder frame can be computed
+        self.context = getattr(encoder.embed, "right_context", 0) + 1
+        # input frames consumed by one chunk and input frames seen by one chunk
+        self.stride = subsampling * decoding_chunk_size
+        self.window = (decoding_chunk_size - 1) * subsampling + self.context
+        if num_decoding_left_chunks < 0:
+            self.required_cache_size = -1
+        else:
+            self.required_cache_size = decoding_chunk_size * num_decoding_left_chunks
+        self.reset()
+
+    def reset(self):
+        """Forget the stream, the next chunk starts a new one."""
+        self.offset = 0
+        self.att_cache = None
+        self.cnn_cache = None
+        self.buffer = None
+
+    def _encode(self, xs):
+        ys, self.att_cache, self.cnn_cache = self.encoder.forward_chunk(
+            Tensor(xs, mstype.float32),
+            self.offset,
+            self.required_cache_size,
+            self.att_cache,
+            self.cnn_cache,
+        )
+        self.offset += ys.shape[1]
+        if self.ctc is not None:
+            ys = self.ctc.compute_log_softmax_out(ys)
+        return ys
+
+    def _emit(self, outputs):
+        if not outputs:
+            return None
+        if len(outputs) == 1:
+            return outputs[0]
+        return ops.concat(outputs, axis=1)
+
+    def accept(self, feats) -> Optional[mindspore.Tensor]:
+        """Feed the next features of the stream.
+
+        Args:
+            feats (Union[numpy.ndarray, mindspore.Tensor]): features (B, T, D).
+        Returns:
+            mindspore.Tensor: outputs of the chunks completed by `feats`,
+                (B, T', output_size) or (B, T', vocab_size) with `ctc`, or None
+                if no chunk was completed yet.
+        """
+        if isinstance(feats, Tensor):
+            feats = feats.asnumpy()
+        if self.buffer is None:
+            self.buffer = feats
+        else:
+            self.buffer = np.concatenate((self.buffer, feats), axis=1)
+
+        outputs = []
+        while self.buffer.shape[1] >= self.window:
+            outputs.append(self._encode(self.buffer[:, : self.window]))
+            # keep the frames shared with the next window, i.e. the subsampling state
+            self.buffer = self.buffer[:, self.stride :]
+        return self._emit(outputs)
+
+    def flush(self) -> Optional[mindspore.Tensor]:
+        """Encode the buffered frames of a finished stream and reset it.
+
+        Returns:
+            mindspore.Tensor: outputs of the last, partial chunk, or None if
+                there were not enough frames left.
+        """
+        outputs = []
+        if self.buffer is not None and self.buffer.shape[1] >= self.context:
+            outputs.append(self._encode(self.buffer))
+        self.reset()
+        return self._emit(outputs)
+
 
 class ConformerEncoder(BaseEncoder):
     """conformer encoder module.
@@ -288,6 +563,8 @@ class ConformerEncoder(BaseEncoder):
         cnn_module_kernel (int): kernel size for CNN module
         cnn_module_norm (str): normalize type for CNN module, batch norm or layer norm.
         compute_type (dtype): whether to use mix precision training.
+        causal (bool): whether the depthwise conv of the CNN module only looks at
+            past frames, as needed for exact streaming with `EncoderStream`.
     """
 
     def __init__(
@@ -310,6 +587,7 @@ class ConformerEncoder(BaseEncoder):
         cnn_module_norm: str = "batch_norm",
         global_cmvn: mindspore.nn.Cell = None,
         compute_type=mstype.float32,
+        causal: bool = False,
     ):
         """Construct ConformerEncoder."""
         super().__init__(
@@ -359,6 +637,7 @@ class ConformerEncoder(BaseEncoder):
             1,
             True,
             compute_type,
+            causal,
         )
 
         self.encoders = nn.CellList(
@@ -504,6 +783,76 @@ class DecoderLayer(nn.Cell):
 
         return x, tgt_mask, memory, memory_mask
 
+    def forward_one_step(
+        self,
+        tgt: mindspore.Tensor,
+        memory: mindspore.Tensor,
+        memory_mask: mindspore.Tensor,
+        cache: Optional[mindspore.Tensor] = None,
+        memory_kv: Optional[Tuple[mindspore.Tensor, mindspore.Tensor]] = None,
+    ) -> Tuple[
+        mindspore.Tensor,
+        mindspore.Tensor,
+        Tuple[mindspore.Tensor, mindspore.Tensor],
+    ]:
+        """Compute decoded features of the newest position only.
+
+        Args:
+            tgt (mindspore.Tensor): Input of the new position (#batch, 1, size).
+            memory (mindspore.Tensor): Encoded memory (#batch, maxlen_in, size).
+            memory_mask (mindspore.Tensor): Encoded memory mask
+                (#batch, 1, maxlen_in).
+            cache (mindspore.Tensor): Self-attention keys and values of the
+                previous positions (#batch, head, i, d_k * 2).
+            memory_kv (Tuple[mindspore.Tensor, mindspore.Tensor]): Src-attention
+                keys and values of `memory`, computed if None.
+
+        Returns:
+            mindspore.Tensor: Output tensor (#batch, 1, size).
+            mindspore.Tensor: Updated cache (#batch, head, i + 1, d_k * 2).
+            Tuple[mindspore.Tensor, mindspore.Tensor]: Src-attention keys and values.
+        """
+        # Self-attention module, the new position attends to all previous ones
+        residual = tgt
+        if self.normalize_before:
+            tgt = self.norm1(tgt)
+
+        x_att, new_cache = self.self_attn.forward_cache(tgt, None, cache)
+        if self.concat_after:
+            tgt_concat = self.cat1((tgt, self.cast(x_att, tgt.dtype)))
+            x = residual + self.concat_linear1(tgt_concat)
+        else:
+            x = residual + self.dropout(x_att)
+        if not self.normalize_before:
+            x = self.norm1(x)
+
+        # Src-attention module
+        residual = x
+        if self.normalize_before:
+            x = self.norm2(x)
+
+        if memory_kv is None:
+            memory_kv = self.src_attn.forward_kv(memory, memory)
+        x_src = self.src_attn.forward_memory(x, memory_kv, memory_mask)
+        if self.concat_after:
+            x_concat = self.cat1((x, self.cast(x_src, x.dtype)))
+            x = residual + self.concat_linear2(x_concat)
+        else:
+            x = residual + self.dropout(x_src)
+        if not self.normalize_before:
+            x = self.norm2(x)
+
+        # Feedforward module
+        residual = x
+        if self.normalize_before:
+            x = self.norm3(x)
+
+        x = residual + self.dropout(self.feed_forward(x))
+        if not self.normalize_before:
+            x = self.norm3(x)
+
+        return x, new_cache, memory_kv
+
 
 class TransformerDecoder(nn.Cell):
     """Base class of Transformer decoder module.
@@ -601,6 +950,7 @@ class TransformerDecoder(nn.Cell):
         )
         self.expand_dims = ops.ExpandDims()
         self.log_softmax = nn.LogSoftmax()
+        self.gather = ops.Gather()
         self.tensor0 = mindspore.Tensor((0,))
 
     def construct(
@@ -637,3 +987,69 @@ class TransformerDecoder(nn.Cell):
             x = self.output_layer(x)
 
         return x, self.tensor0
+
+    def forward_one_step(
+        self,
+        memory: mindspore.Tensor,
+        memory_mask: mindspore.Tensor,
+        tgt: mindspore.Tensor,
+        cache: Optional[List[mindspore.Tensor]] = None,
+        memory_cache: Optional[List[Tuple[mindspore.Tensor, mindspore.Tensor]]] = None,
+    ) -> Tuple[mindspore.Tensor, List[mindspore.Tensor], List[Tuple]]:
+        """Forward one step of incremental decoding.
+
+        Only the newest token is fed, the self-attention keys and values of the
+        previous tokens are read from `cache`, so a step costs the same at any
+        output length. After a beam search step, `reorder_cache` the caches to
+        follow the selected hypotheses.
+
+        Args:
+            memory: encoded memory, float32  (batch, maxlen_in, feat)
+            memory_mask: encoder memory mask, (batch, 1, maxlen_in)
+            tgt: last token of every hypothesis, int32 (batch, 1)
+            cache: self-attention keys and values of every layer,
+                (batch, head, i, d_k * 2), None at the first step
+            memory_cache: keys and values of `memory` for the src-attention of
+                every layer, computed at the first step and reused afterwards
+        Returns:
+            (tuple): tuple containing:
+                y: log probabilities of the next token (batch, vocab_size)
+                cache: updated self-attention caches (batch, head, i + 1, d_k * 2)
+                memory_cache: keys and values of `memory`
+        """
+        offset = 0 if cache is None else cache[0].shape[2]
+        x = self.embed[0](tgt)
+        x, _ = self.embed[1](x, offset)
+        new_cache = []
+        new_memory_cache = []
+        for i, layer in enumerate(self.decoders):
+            x, layer_cache, memory_kv = layer.forward_one_step(
+                x,
+                memory,
+                memory_mask,
+                None if cache is None else cache[i],
+                None if memory_cache is None else memory_cache[i],
+            )
+            new_cache.append(layer_cache)
+            new_memory_cache.append(memory_kv)
+
+        y = x[:, -1]
+        if self.normalize_before:
+            y = self.after_norm(y)
+        if self.use_output_layer:
+            y = self.output_layer(y)
+        y = self.log_softmax(y)
+        return y, new_cache, new_memory_cache
+
+    def reorder_cache(
+        self, cache: List[mindspore.Tensor], index: mindspore.Tensor
+    ) -> List[mindspore.Tensor]:
+        """Select the self-attention caches of the surviving hypotheses.
+
+        Args:
+            cache: self-attention caches returned by `forward_one_step`.
+            index: hypothesis each row continues, int32 (batch,)
+        Returns:
+            List[mindspore.Tensor]: reordered caches.
+        """
+        return [self.gather(layer_cache, index, 0) for layer_cache in cache]
@@ -233,9 +233,9 @@ class CTCPrefixBeamSearch(nn.Cell):
             xs_pad, xs_masks, xs_masks
         )
         ctc_prbs = self.backbone.acc_net.ctc.compute_log_softmax_out(encoder_out)
-        ctc_prbs = ctc_prbs.squeeze(0)
+        # keep the batch axis, the prefix beam search decodes all utterances at once
         top_k_logp_list, top_k_index_list = self.topk(ctc_prbs, self.beam_size)
-        encoder_mask = encoder_mask.squeeze()
+        encoder_mask = encoder_mask.squeeze(1)
         return encoder_out, encoder_mask, top_k_logp_list, top_k_index_list
 
 
@@ -1,7 +1,8 @@
-import Levenshtein as Lev
 import numpy as np
 from six.moves import xrange
 
+from mindaudio.metric.wer import edit_distance
+
 
 class Decoder:
     """
@@ -32,17 +33,7 @@ class Decoder:
             s1 (string): space-separated sentence
             s2 (string): space-separated sentence
         """
-
-        # build mapping of words to integers
-        b = set(s1.split() + s2.split())
-        word2char = dict(zip(b, range(len(b))))
-
-        # map the words to a char array (Levenshtein packages only accepts
-        # strings)
-        w1 = [chr(word2char[w]) for w in s1.split()]
-        w2 = [chr(word2char[w]) for w in s2.split()]
-
-        return Lev.distance("".join(w1), "".join(w2))
+        return edit_distance(s1.split(), s2.split())
 
     def cer(self, s1, s2):
         """
@@ -58,7 +49,7 @@ class Decoder:
         ) = s1.replace(
             " ", ""
         ), s2.replace(" ", "")
-        return Lev.distance(s1, s2)
+        return edit_distance(s1, s2)
 
     def decode(self, probs, sizes=None):
         """
@@ -1,5 +1,6 @@
 import mindspore as ms
 import mindspore.nn as nn
+import mindspore.ops as ops
 import numpy as np
 
 from mindaudio.models.fastspeech2.utils import get_mask_from_lengths
@@ -227,6 +228,9 @@ class FastSpeech2WithLoss(FastSpeech2):
         self.mel_predictions = ms.Parameter(
             ms.Tensor(np.ones([1, 742, 128]), dtype=self.dtype), requires_grad=False
         )
+        self.mel_prediction_len = ms.Parameter(
+            ms.Tensor(742, dtype=ms.int32), requires_grad=False
+        )
 
     def construct(
         self,
@@ -276,5 +280,10 @@ class FastSpeech2WithLoss(FastSpeech2):
         self.duration_loss = duration_loss
         self.pitch_loss = pitch_loss
         self.energy_loss = energy_loss
-        self.mel_predictions = yh["mel_predictions"][:1]
+        # batches come in several padded lengths, the kept prediction is
+        # padded to the fixed shape of the parameter
+        mel_prediction = yh["mel_predictions"][:1]
+        pad = self.mel_predictions.shape[1] - mel_prediction.shape[1]
+        self.mel_predictions = ops.pad(mel_prediction, (0, 0, 0, pad))
+        self.mel_prediction_len = mel_lens[0].astype(ms.int32)
         return total_loss
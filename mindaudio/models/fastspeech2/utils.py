@@ -20,6 +20,29 @@ def get_mask_from_lengths_np(lengths, max_len=None):
     return mask
 
 
+def expand_phonemes(phonemes, duration, lengths, max_len):
+    """
+    Repeat every phoneme of a padded batch by its duration, all rows at once.
+
+    Args:
+        phonemes (np.ndarray): Padded phonemes, [B, S].
+        duration (np.ndarray): Duration of every phoneme in frames, 0 on padding, [B, S].
+        lengths (np.ndarray): Number of frames kept per row, [B].
+        max_len (int): Padded number of frames.
+
+    Returns:
+        np.ndarray, the phoneme of every frame, [B, max_len].
+    """
+    flat = np.repeat(phonemes.ravel(), duration.ravel())
+    totals = duration.sum(axis=1)
+    starts = np.cumsum(totals) - totals
+    frames = np.arange(max_len)
+    valid = frames < np.minimum(totals, lengths)[:, None]
+    expanded = np.zeros((len(phonemes), max_len), phonemes.dtype)
+    expanded[valid] = flat[(starts[:, None] + frames)[valid]]
+    return expanded
+
+
 def pad(input_ele, mel_max_length=None):
     # [b t c]
     axis = 0
@@ -48,6 +48,8 @@ class MultiHeadedAttention(nn.Cell):
         self.mul = ops.Mul()
         self.add = ops.Add()
         self.get_dtype = ops.DType()
+        self.cat_time = ops.Concat(2)
+        self.cat_f1 = ops.Concat(-1)
 
     def forward_qkv(
         self, query: mindspore.Tensor, key: mindspore.Tensor, value: mindspore.Tensor
@@ -77,6 +79,24 @@ class MultiHeadedAttention(nn.Cell):
 
         return q, k, v
 
+    def forward_kv(
+        self, key: mindspore.Tensor, value: mindspore.Tensor
+    ) -> Tuple[mindspore.Tensor, mindspore.Tensor]:
+        """Transform key and value only, e.g. to project an encoder memory once.
+
+        Args:
+            key (mindspore.Tensor): Key tensor (#batch, time2, size).
+            value (mindspore.Tensor): Value tensor (#batch, time2, size).
+
+        Returns:
+            mindspore.Tensor: Transformed key tensor (#batch, n_head, time2, d_k).
+            mindspore.Tensor: Transformed value tensor (#batch, n_head, time2, d_k).
+        """
+        n_batch = key.shape[0]
+        k = self.linear_k(key).view(n_batch, -1, self.h, self.d_k)
+        v = self.linear_v(value).view(n_batch, -1, self.h, self.d_k)
+        return k.transpose(0, 2, 1, 3), v.transpose(0, 2, 1, 3)
+
     def forward_attention(
         self,
         value: mindspore.Tensor,
@@ -146,10 +166,83 @@ class MultiHeadedAttention(nn.Cell):
             mindspore.Tensor: Output tensor (#batch, time1, d_model).
         """
         q, k, v = self.forward_qkv(query, key, value)
-        scores = self.matmul(
+        scores = self.compute_scores(q, k, pos_emb)
+
+        return self.forward_attention(v, scores, mask)
+
+    def compute_scores(
+        self,
+        q: mindspore.Tensor,
+        k: mindspore.Tensor,
+        pos_emb: Optional[mindspore.Tensor] = None,
+    ) -> mindspore.Tensor:  # pylint: disable=W0613
+        """Compute attention scores.
+
+        Args:
+            q (mindspore.Tensor): Transformed query (#batch, n_head, time1, d_k).
+            k (mindspore.Tensor): Transformed key (#batch, n_head, time2, d_k).
+            pos_emb (mindspore.Tensor): Positional embedding tensor
+                (#batch, time2, size).
+        Returns:
+            mindspore.Tensor: Attention score (#batch, n_head, time1, time2).
+        """
+        return self.matmul(
             q * self.scores_mul, k.transpose(0, 1, 3, 2) * self.scores_mul
         )
 
+    def forward_cache(
+        self,
+        x: mindspore.Tensor,
+        pos_emb: Optional[mindspore.Tensor] = None,
+        cache: Optional[mindspore.Tensor] = None,
+    ) -> Tuple[mindspore.Tensor, mindspore.Tensor]:
+        """Self attention of a chunk over itself and the cached previous chunks.
+
+        The keys and values of the previous chunks are not recomputed, they are
+        read from `cache` and the ones of the current chunk are appended to it.
+
+        Args:
+            x (mindspore.Tensor): Chunk of the input (#batch, time1, size).
+            pos_emb (mindspore.Tensor): Positional embedding tensor covering the
+                cached and the current frames (#batch, cache_t + time1, size).
+            cache (mindspore.Tensor): Keys and values of the previous chunks,
+                concatenated on the last axis (#batch, n_head, cache_t, d_k * 2).
+        Returns:
+            mindspore.Tensor: Output tensor (#batch, time1, d_model).
+            mindspore.Tensor: Updated cache (#batch, n_head, cache_t + time1, d_k * 2).
+        """
+        q, k, v = self.forward_qkv(x, x, x)
+        if cache is not None and cache.shape[2] > 0:
+            k = self.cat_time((cache[:, :, :, : self.d_k], k))
+            v = self.cat_time((cache[:, :, :, self.d_k :], v))
+        new_cache = self.cat_f1((k, v))
+        scores = self.compute_scores(q, k, pos_emb)
+
+        return self.forward_attention(v, scores, None), new_cache
+
+    def forward_memory(
+        self,
+        query: mindspore.Tensor,
+        memory_kv: Tuple[mindspore.Tensor, mindspore.Tensor],
+        mask: Optional[mindspore.Tensor],
+    ) -> mindspore.Tensor:
+        """Attention over keys and values already transformed by `forward_kv`.
+
+        Args:
+            query (mindspore.Tensor): Query tensor (#batch, time1, size).
+            memory_kv (Tuple[mindspore.Tensor, mindspore.Tensor]): Transformed
+                key and value, (#batch, n_head, time2, d_k) each.
+            mask (mindspore.Tensor): Mask tensor (#batch, 1, time2) or
+                (#batch, time1, time2).
+        Returns:
+            mindspore.Tensor: Output tensor (#batch, time1, d_model).
+        """
+        n_batch = query.shape[0]
+        q = self.linear_q(query).view(n_batch, -1, self.h, self.d_k)
+        q = q.transpose(0, 2, 1, 3)  # (batch, head, time1, d_k)
+        k, v = memory_kv
+        scores = self.compute_scores(q, k)
+
         return self.forward_attention(v, scores, mask)
 
 
@@ -201,10 +294,30 @@ class RelPositionMultiHeadedAttention(MultiHeadedAttention):
         Returns:
             mindspore.Tensor: Output tensor (#batch, time1, d_model).
         """
-        n_batch = query.shape[0]
+        q, k, v = self.forward_qkv(query, key, value)
+        scores = self.compute_scores(q, k, pos_emb)
+
+        return self.forward_attention(v, scores, mask)
+
+    def compute_scores(
+        self,
+        q: mindspore.Tensor,
+        k: mindspore.Tensor,
+        pos_emb: Optional[mindspore.Tensor] = None,
+    ) -> mindspore.Tensor:
+        """Compute attention scores with relative positional encoding.
+
+        Args:
+            q (mindspore.Tensor): Transformed query (#batch, n_head, time1, d_k).
+            k (mindspore.Tensor): Transformed key (#batch, n_head, time2, d_k).
+            pos_emb (mindspore.Tensor): Positional embedding tensor
+                (#batch, time2, size).
+        Returns:
+            mindspore.Tensor: Attention score (#batch, n_head, time1, time2).
+        """
+        n_batch = q.shape[0]
         n_batch_pos = pos_emb.shape[0]
 
-        q, k, v = self.forward_qkv(query, key, value)
         q = q.transpose(0, 2, 1, 3)  # (batch, time1, head, d_k)
 
         p = self.linear_pos(pos_emb).view(n_batch_pos, -1, self.h, self.d_k)
@@ -232,6 +345,4 @@ class RelPositionMultiHeadedAttention(MultiHeadedAttention):
         # Remove relative shift of matrix_bd since it is useless in speech recognition,
         # and it requires special attention for streaming.
         scores = matrix_ac + matrix_bd
-        scores = self.mul(scores, self.scores_mul)
-
-        return self.forward_attention(v, scores, mask)
+        return self.mul(scores, self.scores_mul)
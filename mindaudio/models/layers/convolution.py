@@ -22,6 +22,9 @@ class ConvolutionModule(nn.Cell):
         glu_dim (int): Dimension of GLU activation function.
         bias (bool): Whether use bias for CNN layer.
         compute_type (bool): Whether use mix precision computation.
+        causal (bool): Whether the depthwise conv only looks at past frames,
+            padding `kernel_size - 1` frames on the left. Streaming with
+            `forward_chunk` is then exact.
     """
 
     def __init__(
@@ -33,6 +36,7 @@ class ConvolutionModule(nn.Cell):
         glu_dim: int = 1,
         bias: bool = True,
         compute_type=mindspore.float32,
+        causal: bool = False,
     ):
         super().__init__()
         self.pointwise_conv1 = Conv1d(
@@ -45,15 +49,17 @@ class ConvolutionModule(nn.Cell):
             pad_mode="valid",
             enable_mask_padding_feature=False,
         ).to_float(compute_type)
+        # a causal conv is left padded in construct, a non-causal one on both sides
+        self.causal = causal
         self.depthwise_conv = Conv1d(
             channels,
             channels,
             kernel_size,
             stride=1,
-            padding=(kernel_size - 1) // 2,
+            padding=0 if causal else (kernel_size - 1) // 2,
             group=channels,
             has_bias=bias,
-            pad_mode="pad",
+            pad_mode="valid" if causal else "pad",
             enable_mask_padding_feature=False,
         ).to_float(compute_type)
 
@@ -75,10 +81,13 @@ class ConvolutionModule(nn.Cell):
             enable_mask_padding_feature=False,
         ).to_float(compute_type)
         self.channels = channels
+        # number of past frames the depthwise conv looks at
+        self.lorder = kernel_size - 1 if causal else (kernel_size - 1) // 2
         self.activation = activation
         self.glu = GLU(dim=glu_dim)
         self.reshape = ops.Reshape()
         self.cast = ops.Cast()
+        self.cat_time = ops.Concat(2)
 
     def construct(
         self, x: mindspore.Tensor, mask: mindspore.Tensor = None
@@ -102,6 +111,8 @@ class ConvolutionModule(nn.Cell):
         x = self.glu(x)  # (batch, channels, time)
 
         # 1D Depthwise Conv
+        if self.causal and self.lorder > 0:
+            x = ops.pad(x, (self.lorder, 0))
         x = self.depthwise_conv(x)  # (batch, channels, time)
 
         if self.use_layer_norm:
@@ -127,3 +138,60 @@ class ConvolutionModule(nn.Cell):
             x = x * mask
 
         return x.transpose(0, 2, 1)
+
+    def forward_chunk(
+        self, x: mindspore.Tensor, cache: mindspore.Tensor = None
+    ) -> Tuple[mindspore.Tensor, mindspore.Tensor]:
+        """Compute convolution module on a chunk of a stream.
+
+        The depthwise conv sees the last `lorder` frames of the previous chunks
+        through `cache` instead of zero padding. A causal module thus gives the
+        same output as `construct` on the whole stream. A non-causal one also
+        looks at future frames, which are zero padded beyond the chunk, so its
+        output only approximates `construct` near the end of every chunk.
+
+        Args:
+            x (mindspore.Tensor): Input chunk (#batch, time, channels).
+            cache (mindspore.Tensor): Left context of the depthwise conv, i.e. the
+                GLU outputs of the previous frames (#batch, channels, cache_t),
+                cache_t <= lorder. None at the beginning of a stream.
+        Returns:
+            mindspore.Tensor: Output tensor (#batch, time, channels).
+            mindspore.Tensor: Updated cache (#batch, channels, cache_t'), to be
+                passed with the next chunk.
+        """
+        x = x.transpose(0, 2, 1)  # (batch, channels, time)
+
+        # GLU mechanism
+        x = self.pointwise_conv1(x)  # (batch, 2 * channels, time)
+        x = self.glu(x)  # (batch, channels, time)
+
+        cache_t = 0
+        if cache is not None and cache.shape[2] > 0:
+            cache_t = cache.shape[2]
+            x = self.cat_time((cache, x))
+        if self.causal:
+            # the frames before the stream are zeros, as in construct
+            if self.lorder > cache_t:
+                x = ops.pad(x, (self.lorder - cache_t, 0))
+            cache_t = 0
+        new_cache = x[:, :, max(x.shape[2] - self.lorder, 0) :]
+
+        # 1D Depthwise Conv, the outputs of the cached frames are dropped
+        x = self.depthwise_conv(x)[:, :, cache_t:]  # (batch, channels, time)
+
+        if self.use_layer_norm:
+            x = x.transpose(0, 2, 1)
+            x = self.activation(self.norm(x))
+            x = x.transpose(0, 2, 1)
+        else:
+            x = x.transpose(0, 2, 1)
+            batch, length, channel = x.shape
+            x = self.reshape(x, (batch * length, channel))
+            x = self.activation(self.norm(x))
+            x = self.reshape(x, (batch, length, channel))
+            x = x.transpose(0, 2, 1)
+
+        x = self.pointwise_conv2(x)
+
+        return x.transpose(0, 2, 1), new_cache
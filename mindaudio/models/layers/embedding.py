@@ -140,6 +140,9 @@ class ConvPositionalEncoding(nn.Cell):
         pos_emb = self.pe[:, offset : offset + x.shape[1]]
         return self.dropout(x), self.dropout(pos_emb)
 
+    def position_encoding(self, offset: int, size: int) -> mindspore.Tensor:
+        return self.dropout(self.pe[:, offset : offset + size])
+
 
 class NoPositionalEncoding(nn.Cell):
     """No position encoding
@@ -164,3 +167,8 @@ class NoPositionalEncoding(nn.Cell):
         """
         pos_emb = self.zeros((1, x.shape[1], self.d_model), mstype.float32)
         return self.dropout(x), pos_emb
+
+    def position_encoding(
+        self, offset: int, size: int
+    ) -> mindspore.Tensor:  # pylint: disable=W0613
+        return self.zeros((1, size, self.d_model), mstype.float32)
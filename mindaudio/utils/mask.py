@@ -187,7 +187,7 @@ def subsequent_chunk_mask(size: int, chunk_size: int, num_left_chunks: int = -1)
          [1, 1, 1, 1],
          [1, 1, 1, 1]]
     """
-    ret = np.zeros((size, size), dtype=np.bool)
+    ret = np.zeros((size, size), dtype=np.bool_)
     for i in range(size):
         if num_left_chunks < 0:
             start = 0
@@ -230,7 +230,7 @@ def add_optional_chunk_mask(
         numpy.array: chunk mask of the input xs.
     """
     # Whether to use chunk mask or not
-    masks = masks.astype(np.bool)
+    masks = masks.astype(np.bool_)
     if use_dynamic_chunk:
         max_len = xs_len
         if decoding_chunk_size < 0:
@@ -1,12 +1,10 @@
 """Apply beam search on attention decoder."""
 
-from collections import defaultdict
-
 import mindspore.common.dtype as mstype
 import numpy as np
 from mindspore import Tensor
 
-from .common import add_sos_eos, log_add, pad_sequence, remove_duplicates_and_blank
+from .common import add_sos_eos, pad_sequence, remove_duplicates_and_blank
 from .mask import make_pad_mask, subsequent_mask
 
 
@@ -184,66 +182,65 @@ def recognize(
             (running_size, 1, maxlen)
         )  # (10, 1, 124)
 
-        hyps_sub_masks = [[[False]]]
-        for i in range(1, maxlen + 1):
-            hyps_sub_masks.append(
-                np.pad(
-                    subsequent_mask(i),
-                    ((0, maxlen - i), (0, maxlen - i)),
-                    "constant",
-                    constant_values=(False, False),
-                )
-            )
-
         # (B*N, 1)
         hyps = np.tile(np.expand_dims(start_token, 1), (running_size, 1))  # (10, 1)
-        pad_length = maxlen - start_token.shape[-1]  # 124-1=123
-        input_ids = np.pad(
-            hyps, ((0, 0), (0, pad_length)), "constant", constant_values=(0, 0)
-        )
         # (B*N, 1)
-        scores = Tensor(np.expand_dims(np.tile(scores, (batch_size,)), 1))  # (10, 1)
+        scores = np.expand_dims(np.tile(scores, (batch_size,)), 1)  # (10, 1)
         # (B*N, 1)
         end_flag = np.expand_dims(np.tile(end_flag, (batch_size,)), 1)  # (10, 1)
 
-        # 2. Decoder forward step by step
-        valid_length = 0
-        for i in range(1, maxlen + 1):
-            # exit when the length of prediction is larger than maxlen
-            if valid_length >= maxlen - 1:
-                break
+        # 2. Decoder forward step by step, only the newest token is fed and the
+        # self-attention keys/values of the previous ones are kept in a cache
+        decoder = model.predict_network.backbone.acc_net.decoder
+        encoder_out = Tensor(encoder_out_np)
+        encoder_mask = Tensor(encoder_mask_np)
+        cache = None
+        memory_cache = None
+        for _ in range(1, maxlen):
             # Stop if all batch and all beam produce eos
             if end_flag.sum() == running_size:
                 break
             # 2.1 Forward decoder step
-            hyps_mask = np.expand_dims(hyps_sub_masks[i], 0)
-            hyps_mask = np.tile(hyps_mask, (running_size, 1, 1))  # (B*N, i, i)
-            if i == 1:
-                model.predict_network.add_flags_recursive(is_first_iteration=True)
-            else:
-                model.predict_network.add_flags_recursive(is_first_iteration=False)
-
-            input_ids, valid_length, end_flag, scores, best_k_pred = model.predict(
-                Tensor(encoder_out_np),
-                Tensor(encoder_mask_np),
-                Tensor(input_ids),
-                Tensor(hyps_mask),
-                Tensor(valid_length),
-                Tensor(end_flag),
-                scores,
-                Tensor(base_index),
+            logp, cache, memory_cache = decoder.forward_one_step(
+                encoder_out,
+                encoder_mask,
+                Tensor(hyps[:, -1:], mstype.int32),
+                cache,
+                memory_cache,
             )
-            input_ids = input_ids.asnumpy()
-            valid_length = valid_length.asnumpy()
-            input_ids[:, valid_length] = best_k_pred.asnumpy()
-            # 2.6 Update end flag
-            end_flag = (
-                (input_ids[:, valid_length] == eos).astype(np.float32).reshape(-1, 1)
+            logp = logp.asnumpy()  # (B*N, vocab)
+            # 2.2 First beam prune: select topk best prob at current time
+            top_k_index = np.argsort(-logp, axis=-1, kind="stable")[:, :beam_size]
+            top_k_logp = np.take_along_axis(logp, top_k_index, axis=-1)  # (B*N, N)
+            top_k_logp = mask_finished_scores(top_k_logp, end_flag)
+            top_k_index = mask_finished_preds(top_k_index, end_flag, eos)
+            # 2.3 Second beam prune: select topk score with history
+            scores = (scores + top_k_logp).reshape(batch_size, beam_size * beam_size)
+            offset_k_index = np.argsort(-scores, axis=-1, kind="stable")[
+                :, :beam_size
+            ]  # (B, N)
+            scores = np.take_along_axis(scores, offset_k_index, axis=-1).reshape(-1, 1)
+            # 2.4 Compute base index in top_k_index (B*N*N)
+            best_k_index = (
+                base_index * beam_size * beam_size + offset_k_index
+            ).reshape(-1)
+            best_k_pred = top_k_index.reshape(-1)[best_k_index]  # (B*N)
+            best_hyps_index = best_k_index // beam_size
+            # 2.5 Update best hyps and make the caches follow them
+            hyps = np.concatenate(
+                (hyps[best_hyps_index], best_k_pred.reshape(-1, 1)), axis=1
+            )
+            cache = decoder.reorder_cache(
+                cache, Tensor(best_hyps_index.astype(np.int32))
             )
+            # 2.6 Update end flag
+            end_flag = (hyps[:, -1] == eos).astype(np.float32).reshape(-1, 1)
+        input_ids = np.pad(hyps, ((0, 0), (0, maxlen - hyps.shape[1])), "constant")
+
         # 3. Select best of best
-        scores = scores.view(batch_size, beam_size)  # (B, N)
+        scores = scores.reshape(batch_size, beam_size)  # (B, N)
         # TODO: length normalization
-        best_scores, best_index = topk_fun(scores.asnumpy(), 1)  # (B, 1)
+        best_scores, best_index = topk_fun(scores, 1)  # (B, 1)
         best_hyps_index = best_index + base_index * beam_size
 
     best_hyps = input_ids[best_hyps_index.squeeze(0)]
@@ -270,6 +267,171 @@ def ctc_greedy_search(model, xs_pad, xs_masks, xs_lengths):
     return hyps, scores
 
 
+# multiplier of the rolling hash that identifies a prefix by a single integer
+_PREFIX_HASH_BASE = np.uint64(1000003)
+
+
+def ctc_prefix_beam_search_batch(top_k_logp, top_k_index, encoder_mask, beam_size):
+    """Apply CTC prefix beam search on a batch of utterances at once.
+
+    The hypotheses of all utterances are kept in arrays of shape (batch, beam):
+    the blank / non-blank ending scores, the last token and a rolling hash of
+    every prefix. At each frame all (beam x top-k) extensions are scored at
+    once, identical prefixes are merged by sorting on their hash and summing
+    their scores with ``np.logaddexp.reduceat``, and the best `beam_size`
+    prefixes of every utterance are kept. The token sequences themselves are
+    only rebuilt at the end from the per-frame back pointers.
+
+    Args:
+        top_k_logp (numpy.ndarray): top-k CTC log probabilities, (batch, max_len, k).
+        top_k_index (numpy.ndarray): token ids of `top_k_logp`, (batch, max_len, k).
+            Id 0 is the blank.
+        encoder_mask (numpy.ndarray): valid frames of every utterance, (batch, max_len).
+        beam_size (int): beam size for beam search.
+
+    Returns:
+        List[List[Tuple(Tuple[int], float)]]: for every utterance, the decoding
+        results and their scores sorted from best to worst.
+
+    Examples:
+        >>> logp = np.log(np.random.dirichlet(np.ones(10), size=(2, 50)))
+        >>> top_k_index = np.argsort(-logp, axis=-1)[..., :5]
+        >>> top_k_logp = np.take_along_axis(logp, top_k_index, axis=-1)
+        >>> hyps = ctc_prefix_beam_search_batch(top_k_logp, top_k_index, np.ones((2, 50)), 5)
+        >>> best_prefix, best_score = hyps[0][0]
+    """
+    top_k_logp = np.asarray(top_k_logp, dtype=np.float64)
+    top_k_index = np.asarray(top_k_index, dtype=np.int64)
+    active = np.asarray(encoder_mask).reshape(top_k_logp.shape[:2]) > 0
+    batch_size, maxlen, k = top_k_logp.shape
+    n = beam_size
+    neg_inf = -np.inf
+
+    # only the empty prefix is alive at the beginning
+    pb = np.full((batch_size, n), neg_inf)
+    pb[:, 0] = 0.0
+    pnb = np.full((batch_size, n), neg_inf)
+    last = np.full((batch_size, n), -1, dtype=np.int64)
+    prefix_hash = np.zeros((batch_size, n), dtype=np.uint64)
+
+    batch_index = np.repeat(np.arange(batch_size), 2 * n * k)
+    beam_index = np.tile(np.repeat(np.arange(n), k), 2)
+    parents, tokens = [], []
+    for t in range(maxlen):
+        if not active[:, t].any():
+            continue
+        # (B, N, K) views of the current beams against the top-k tokens
+        s = top_k_index[:, t, None, :]
+        ps = top_k_logp[:, t, None, :]
+        blank = s == 0
+        repeat = s == last[:, :, None]
+        total = np.logaddexp(pb, pnb)[:, :, None]
+
+        # staying on the same prefix: *- -> * and *s -> *s (s == last)
+        stay_pb = np.where(blank, total + ps, neg_inf)
+        stay_pnb = np.where(repeat, pnb[:, :, None] + ps, neg_inf)
+        # extending the prefix by s: *-s -> *ss and *x -> *xs
+        ext_pnb = np.where(repeat, pb[:, :, None] + ps, total + ps)
+        ext_pnb = np.where(blank, neg_inf, ext_pnb)
+        ext_hash = prefix_hash[:, :, None] * _PREFIX_HASH_BASE + (s + 1).astype(
+            np.uint64
+        )
+
+        cand_pb = np.concatenate(
+            [stay_pb.reshape(batch_size, -1), np.full((batch_size, n * k), neg_inf)],
+            axis=1,
+        ).ravel()
+        cand_pnb = np.concatenate(
+            [stay_pnb.reshape(batch_size, -1), ext_pnb.reshape(batch_size, -1)],
+            axis=1,
+        ).ravel()
+        cand_hash = np.concatenate(
+            [
+                np.repeat(prefix_hash, k, axis=1),
+                ext_hash.reshape(batch_size, -1),
+            ],
+            axis=1,
+        ).ravel()
+        cand_token = np.concatenate(
+            [
+                np.full((batch_size, n * k), -1),
+                np.broadcast_to(s, (batch_size, n, k)).reshape(batch_size, -1),
+            ],
+            axis=1,
+        ).ravel()
+
+        # merge the candidates sharing a prefix
+        order = np.lexsort((cand_hash, batch_index))
+        sorted_batch = batch_index[order]
+        sorted_hash = cand_hash[order]
+        first = np.ones(order.shape[0], dtype=bool)
+        first[1:] = (sorted_batch[1:] != sorted_batch[:-1]) | (
+            sorted_hash[1:] != sorted_hash[:-1]
+        )
+        starts = np.flatnonzero(first)
+        group_pb = np.logaddexp.reduceat(cand_pb[order], starts)
+        group_pnb = np.logaddexp.reduceat(cand_pnb[order], starts)
+        group_batch = sorted_batch[starts]
+        group_source = order[starts] % (2 * n * k)
+
+        # second beam prune: keep the best n merged prefixes of every utterance
+        counts = np.bincount(group_batch, minlength=batch_size)
+        offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        column = np.arange(starts.shape[0]) - offsets[group_batch]
+        width = max(counts.max(), n)
+        padded = np.full((batch_size, width), neg_inf)
+        padded[group_batch, column] = np.logaddexp(group_pb, group_pnb)
+        best = np.argsort(-padded, axis=1, kind="stable")[:, :n]
+        valid = best < counts[:, None]
+        group = np.where(valid, offsets[:, None] + best, 0)
+
+        source = group_source[group]
+        new_pb = np.where(valid, group_pb[group], neg_inf)
+        new_pnb = np.where(valid, group_pnb[group], neg_inf)
+        new_hash = sorted_hash[starts][group]
+        new_token = np.where(
+            valid,
+            cand_token.reshape(batch_size, -1)[np.arange(batch_size)[:, None], source],
+            -1,
+        )
+        parent = np.where(valid, beam_index[source], 0)
+        new_last = np.where(
+            new_token >= 0,
+            new_token,
+            np.take_along_axis(last, parent, axis=1),
+        )
+
+        # utterances that already ended keep their beams untouched
+        keep = ~active[:, t, None]
+        pb = np.where(keep, pb, new_pb)
+        pnb = np.where(keep, pnb, new_pnb)
+        last = np.where(keep, last, new_last)
+        prefix_hash = np.where(keep, prefix_hash, new_hash)
+        parents.append(np.where(keep, np.arange(n), parent))
+        tokens.append(np.where(keep, -1, new_token))
+
+    # follow the back pointers to rebuild the token sequences
+    scores = np.logaddexp(pb, pnb)
+    beam = np.tile(np.arange(n), (batch_size, 1))
+    sequences = [[[] for _ in range(n)] for _ in range(batch_size)]
+    for parent, token in zip(reversed(parents), reversed(tokens)):
+        token = np.take_along_axis(token, beam, axis=1)
+        for b, i in zip(*np.nonzero(token >= 0)):
+            sequences[b][i].append(int(token[b, i]))
+        beam = np.take_along_axis(parent, beam, axis=1)
+
+    hyps = []
+    for b in range(batch_size):
+        hyps.append(
+            [
+                (tuple(reversed(sequences[b][i])), float(scores[b, i]))
+                for i in range(n)
+                if np.isfinite(scores[b, i])
+            ]
+        )
+    return hyps
+
+
 def ctc_prefix_beam_search(model, xs_pad, xs_masks, beam_size, xs_lengths):
     """Apply CTC prefix beam search
     Args:
@@ -277,61 +439,20 @@ def ctc_prefix_beam_search(model, xs_pad, xs_masks, beam_size, xs_lengths):
         xs_mask (numpy.ndarray): (batch, )
         beam_size (int): beam size for beam search
     Returns:
-        Tuple(Tuple[int], float): decoding result and its score
+        List[List[Tuple(Tuple[int], float)]]: decoding results and their scores of
+            every utterance, best first
+        mindspore.Tensor: encoder output, (batch, maxlen, encoder_dim)
+        numpy.ndarray: encoder mask, (batch, maxlen)
     """
     xs_pad = Tensor(xs_pad, mstype.float32)  # (B, T, D)
     xs_masks = Tensor(xs_masks, mstype.float32)  # (B, 1, T)
-    batch_size = xs_pad.shape[0]
-    # for CTC prefix beam search, only support batch_size = 1
-    assert batch_size == 1
-    encoder_out, encoder_mask, top_k_logp_list, top_k_index_list = model.predict(
+    encoder_out, encoder_mask, top_k_logp, top_k_index = model.predict(
         xs_pad, xs_masks, xs_lengths
     )
-    maxlen = encoder_out.asnumpy().shape[1]
-    encoder_mask = encoder_mask.asnumpy().tolist()
-    top_k_logp_list = top_k_logp_list.asnumpy().tolist()
-    top_k_index_list = top_k_index_list.asnumpy().tolist()
-    # cur_hyps: (prefix, (blank_ending_score, none_blank_ending_score))
-    cur_hyps = [(tuple(), (0.0, -float("inf")))]
-    # 3. CTC prefix beam search step by step
-    for t in range(0, maxlen):
-        if encoder_mask[t] == 0:
-            continue
-        # key: prefix, value (pb, pnb), default value(-inf, -inf)
-        next_hyps = defaultdict(lambda: (-float("inf"), -float("inf")))
-        # 2.1 First beam prune: select topk best
-        top_k_logp = top_k_logp_list[t]
-        top_k_index = top_k_index_list[t]
-        for index, s in enumerate(top_k_index):
-            ps = top_k_logp[index]
-            for prefix, (pb, pnb) in cur_hyps:
-                prefix_len = len(prefix)
-                last = prefix[-1] if prefix_len > 0 else None
-                if s == 0:  # blank
-                    n_pb, n_pnb = next_hyps[prefix]
-                    n_pb = log_add([n_pb, pb + ps, pnb + ps])
-                    next_hyps[prefix] = (n_pb, n_pnb)
-                elif s == last:
-                    #  Update *ss -> *s;
-                    n_pb, n_pnb = next_hyps[prefix]
-                    n_pnb = log_add([n_pnb, pnb + ps])
-                    next_hyps[prefix] = (n_pb, n_pnb)
-                    # Update *s-s -> *ss, - is for blank
-                    n_prefix = prefix + (s,)
-                    n_pb, n_pnb = next_hyps[n_prefix]
-                    n_pnb = log_add([n_pnb, pb + ps])
-                    next_hyps[n_prefix] = (n_pb, n_pnb)
-                else:
-                    n_prefix = prefix + (s,)
-                    n_pb, n_pnb = next_hyps[n_prefix]
-                    n_pnb = log_add([n_pnb, pb + ps, pnb + ps])
-                    next_hyps[n_prefix] = (n_pb, n_pnb)
-        # 3.2 Second beam prune
-        next_hyps = sorted(
-            next_hyps.items(), key=lambda x: log_add(list(x[1])), reverse=True
-        )
-        cur_hyps = next_hyps[:beam_size]
-    hyps = [(y[0], log_add([y[1][0], y[1][1]])) for y in cur_hyps]
+    encoder_mask = encoder_mask.asnumpy()
+    hyps = ctc_prefix_beam_search_batch(
+        top_k_logp.asnumpy(), top_k_index.asnumpy(), encoder_mask, beam_size
+    )
 
     return hyps, encoder_out, encoder_mask
 
@@ -354,19 +475,25 @@ def attention_rescoring(
         xs_mask (numpy.ndarray): (batch, )
         beam_size (int): beam size for beam search
     Returns:
-        Tuple(Tuple[int], float): decoding result and its score
+        List[Tuple[int]]: best decoding result of every utterance
+        numpy.ndarray: their scores, (batch,)
     """
     # 1.1 ctc prefix beamsearch
-    # len(hyps) = beam_size, encoder_out.shape = (1, maxlen, encoder_dim)
+    # encoder_out.shape = (B, maxlen, encoder_dim)
     hyps, encoder_out, encoder_mask = ctc_prefix_beam_search(
         model_ctc, xs_pad, xs_masks, beam_size, xs_lengths
     )
-    assert len(hyps) == beam_size
-    hyps_lens = np.array([len(hyp[0]) for hyp in hyps])
+    batch_size = len(hyps)
+    # pad every utterance to beam_size hyps so that all of them are rescored
+    # in a single (B * N) decoder pass, the padding can never be selected
+    hyps = [h + [(tuple(), -float("inf"))] * (beam_size - len(h)) for h in hyps]
+    flat_hyps = [np.array(hyp[0], dtype=np.int32) for h in hyps for hyp in h]
+    ctc_scores = np.array([[hyp[1] for hyp in h] for h in hyps])
+    hyps_lens = np.array([len(hyp) for hyp in flat_hyps])
 
     # generate the input sequence for ASR decoder
-    # hyps_in: add <sos> label to the hyps
-    hyps_in, _ = add_sos_eos([np.array(hyp[0]) for hyp in hyps], sos, eos)
+    # hyps_in: add <sos> label to the hyps, hyps_out: add <eos> label to the hyps
+    hyps_in, hyps_out = add_sos_eos(flat_hyps, sos, eos)
     # the padding_max_len should be increase by 1, since y is paded with a <sos>
     hyps_in_pad = pad_sequence(
         hyps_in,
@@ -375,6 +502,13 @@ def attention_rescoring(
         padding_max_len=max_tgt_len + 1,
         atype=np.int32,
     )
+    hyps_out_pad = pad_sequence(
+        hyps_out,
+        batch_first=True,
+        padding_value=eos,
+        padding_max_len=max_tgt_len + 1,
+        atype=np.int32,
+    )
 
     hyps_in_pad = Tensor(hyps_in_pad, mstype.int32)
     hyps_mask = np.expand_dims(
@@ -384,23 +518,25 @@ def attention_rescoring(
     hyps_sub_masks = (hyps_mask & m).astype(np.float32)
     hyps_sub_masks = Tensor(hyps_sub_masks)
 
-    encoder_out = encoder_out.repeat(beam_size, axis=0)
-    encoder_mask = Tensor([[encoder_mask]]).repeat(beam_size, axis=0)
+    encoder_out = Tensor(np.repeat(encoder_out.asnumpy(), beam_size, axis=0))
+    encoder_mask = Tensor(
+        np.expand_dims(encoder_mask, 1).repeat(beam_size, axis=0), mstype.float32
+    )
     decoder_out = model_rescore.predict(
         encoder_out, encoder_mask, hyps_in_pad, hyps_sub_masks
     )
-
-    # only use decoder score for rescoring
-    best_score = -float("inf")
-    best_index = 0
-    for i, hyp in enumerate(hyps):
-        score = 0.0
-        for j, w in enumerate(hyp[0]):
-            score += decoder_out[i][j][w]
-        score += decoder_out[i][len(hyp[0])][eos]
-        # add ctc score
-        score += hyp[1] * ctc_weight
-        if score > best_score:
-            best_score = score
-            best_index = i
-    return hyps[best_index][0], best_score
+    if isinstance(decoder_out, Tensor):
+        decoder_out = decoder_out.asnumpy()
+
+    # decoder score of hyp + <eos>, then add the weighted ctc score
+    token_scores = np.take_along_axis(
+        decoder_out[:, : max_tgt_len + 1], hyps_out_pad[:, :, None], axis=-1
+    ).squeeze(-1)
+    valid = ~make_pad_mask(hyps_lens + 1, max_len=max_tgt_len + 1)
+    scores = (token_scores * valid).sum(-1).reshape(batch_size, beam_size)
+    scores = np.where(
+        np.isfinite(ctc_scores), scores + ctc_weight * ctc_scores, -float("inf")
+    )
+    best_index = scores.argmax(-1)
+    best_hyps = [hyps[b][i][0] for b, i in enumerate(best_index)]
+    return best_hyps, scores[np.arange(batch_size), best_index]
@@ -0,0 +1,134 @@
+"""Segment-wise source separation of long recordings."""
+
+import mindspore as ms
+import numpy as np
+from mindspore import Tensor
+
+from mindaudio.data.processing import overlap_and_add
+from mindaudio.metric.snr import best_permutation
+
+
+def _taper(segment, overlap):
+    """Cross-fade weights of a segment, ramping up and down over `overlap`."""
+    if overlap == 0:
+        return np.ones(segment, dtype=np.float32)
+    position = np.arange(segment) + 0.5
+    ramp = np.minimum(position, segment - position) / overlap
+    return np.minimum(ramp, 1).astype(np.float32)
+
+
+def _align(windows, overlap, previous=None):
+    """
+    Reorder the sources of consecutive windows consistently.
+
+    The sources of every window are matched to those of the window before by
+    the cosine similarity of their overlap, and the permutations composed from
+    `previous`, the last window already aligned, or the first window.
+
+    Args:
+        windows (np.ndarray): Separated windows, [n, C, segment].
+        overlap (int): Overlap of consecutive windows in samples.
+        previous (np.ndarray, optional): Last aligned window, [C, segment].
+
+    Returns:
+        np.ndarray, the windows with aligned sources, [n, C, segment].
+    """
+    chain = windows if previous is None else np.concatenate([previous[None], windows])
+    if len(chain) < 2 or overlap == 0:
+        return windows
+    tail = chain[:-1, :, -overlap:]
+    head = chain[1:, :, :overlap]
+    tail_norm = np.linalg.norm(tail, axis=-1)[:, :, None]
+    head_norm = np.linalg.norm(head, axis=-1)[:, None, :]
+    norm = tail_norm * head_norm
+    similarity = tail @ head.transpose(0, 2, 1) / np.maximum(norm, 1e-8)
+    relative = best_permutation(similarity)  # [n - 1, C]
+
+    perm = np.arange(windows.shape[1])
+    perms = [perm] if previous is None else []
+    for step in relative:
+        perm = step[perm]
+        perms.append(perm)
+    return np.take_along_axis(windows, np.stack(perms)[..., None], axis=1)
+
+
+def separate_in_segments(
+    model, mixture, segment, overlap=None, batch_size=8, frame_length=None
+):
+    """
+    Separate a long recording with a model trained on short segments.
+
+    The mixture is split into windows of `segment` samples overlapping by
+    `overlap` samples, which go through the model `batch_size` at a time, so
+    the memory used by the network does not grow with the recording. The
+    sources of adjacent windows come in arbitrary order: they are matched by
+    correlating the overlapping parts of the windows. The aligned windows are
+    then cross-faded with `overlap_and_add`. Without overlap, the windows
+    cannot be aligned and are simply concatenated.
+
+    Args:
+        model (Callable): Separation network, e.g. a ConvTasNet, mapping a
+            [batch, segment] Tensor to [batch, C, segment] estimates, or, with
+            `frame_length`, [batch, K, frame_length] frames to
+            [batch, C, K, frame_length], as TasNet does.
+        mixture (np.ndarray): Mixture, [T].
+        segment (int): Length of the windows in samples, usually the length of
+            the training segments.
+        overlap (int, optional): Overlap of adjacent windows in samples, at most
+            `segment` // 2. Default: `segment` // 4.
+        batch_size (int, optional): Number of windows run at once. The last batch
+            is padded, so the model always sees the same shape. Default: 8.
+        frame_length (int, optional): Frame length L of a model taking framed
+            input, `segment` must be a multiple of it. Default: None.
+
+    Returns:
+        np.ndarray, the separated sources, [C, T].
+
+    Examples:
+        >>> model = ConvTasNet(512, 20, 256, 512, 3, 8, 4, 2)
+        >>> sources = separate_in_segments(model, mixture, segment=32000, batch_size=16)
+    """
+    mixture = np.asarray(mixture, dtype=np.float32)
+    if overlap is None:
+        overlap = segment // 4
+    if not 0 <= overlap <= segment // 2:
+        raise ValueError(
+            f"overlap must be between 0 and segment // 2 = {segment // 2}, got {overlap}."
+        )
+    if frame_length is not None and segment % frame_length != 0:
+        raise ValueError(
+            f"segment {segment} must be a multiple of frame_length {frame_length}."
+        )
+    hop = segment - overlap
+    num_windows = max(int(np.ceil((len(mixture) - segment) / hop)) + 1, 1)
+    padded = np.zeros((num_windows - 1) * hop + segment, dtype=np.float32)
+    padded[: len(mixture)] = mixture[: len(padded)]
+    windows = np.lib.stride_tricks.sliding_window_view(padded, segment)[::hop]
+    taper = _taper(segment, overlap)
+
+    sources = None
+    previous = None
+    for start in range(0, num_windows, batch_size):
+        batch = np.zeros((batch_size, segment), dtype=np.float32)
+        n = min(batch_size, num_windows - start)
+        batch[:n] = windows[start : start + n]
+        if frame_length is not None:
+            batch = batch.reshape(batch_size, -1, frame_length)
+        estimate = model(Tensor(batch, ms.float32))
+        if isinstance(estimate, Tensor):
+            estimate = estimate.asnumpy()
+        estimate = np.asarray(estimate)[:n]
+        estimate = estimate.reshape(n, estimate.shape[1], -1)[..., :segment]
+        estimate = _align(estimate, overlap, previous)
+        previous = estimate[-1]
+        if sources is None:
+            sources = np.zeros((estimate.shape[1] + 1, len(padded)), np.float32)
+
+        # the summed weights are overlap-added along with the sources
+        weighted = np.concatenate(
+            [estimate * taper, np.broadcast_to(taper, (n, 1, segment))], axis=1
+        )
+        stitched = overlap_and_add(weighted.transpose(1, 0, 2), hop)
+        offset = start * hop
+        sources[:, offset : offset + stitched.shape[-1]] += stitched
+    return sources[:-1, : len(mixture)] / sources[-1:, : len(mixture)]
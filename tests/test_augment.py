@@ -45,12 +45,80 @@ class TestOperators:
         masked = augment.timemasking(orignal, frequency_mask_param=80)
         print(masked)
 
+    def test_spec_augment(self):
+        feats = np.random.rand(4, 300, 40).astype(np.float32) + 1.0
+        lengths = np.array([300, 250, 120, 60])
+        for i, length in enumerate(lengths):
+            feats[i, length:] = 0.0
+        masked = augment.SpecAugment(max_t=30, max_f=8, max_w=20, seed=0)(
+            feats.copy(), lengths
+        )
+        again = augment.SpecAugment(max_t=30, max_f=8, max_w=20, seed=0)(
+            feats.copy(), lengths
+        )
+        other = augment.SpecAugment(max_t=30, max_f=8, max_w=20, seed=0, worker_id=1)
+        assert np.array_equal(masked, again)
+        assert not np.array_equal(masked, other(feats.copy(), lengths))
+        for i, length in enumerate(lengths):
+            assert not masked[i, length:].any()
+            # at most 2 masks of 30 frames and 2 masks of 8 bins
+            assert (~masked[i, :length].any(axis=1)).sum() <= 60
+            assert (~masked[i, :length].any(axis=0)).sum() <= 16
+        assert not masked.all()
+
+        # time warping keeps the frames in order
+        ramp = np.tile(np.arange(300, dtype=np.float32)[None, :, None], (4, 1, 2))
+        warp = augment.SpecAugment(0, 0, max_w=20, seed=0)(ramp.copy(), lengths)
+        assert np.all(np.diff(warp[:, :, 0], axis=1)[:, :59] >= 0)
+        assert not np.array_equal(warp, ramp)
+
     def test_reverberate(self):
         samples, _ = io.read(self.data_path)
         rirs, _ = io.read(self.rir_list[0])
         addnoise = augment.reverberate(samples, rirs)
         print(addnoise.shape)
 
+    def test_batch_convolve(self):
+        waveforms = np.random.randn(3, 2, 5003)
+        kernels = np.random.randn(3, 1, 400)
+        full = augment.batch_convolve(waveforms, kernels)
+        for i in range(3):
+            for j in range(2):
+                expected = np.convolve(waveforms[i, j], kernels[i, 0])
+                assert np.allclose(full[i, j], expected)
+                assert np.allclose(
+                    augment.batch_convolve(
+                        waveforms[i, j], kernels[i, 0, :20], mode="valid"
+                    ),
+                    np.convolve(waveforms[i, j], kernels[i, 0, :20], mode="valid"),
+                )
+
+        # one waveform convolved with many kernels, e.g. room impulse responses
+        for method in ["direct", "fft"]:
+            many = augment.batch_convolve(
+                waveforms[0, :1, :1000], kernels[:, 0, :100], method=method
+            )
+            assert many.shape == (3, 1099)
+            for i in range(3):
+                expected = np.convolve(waveforms[0, 0, :1000], kernels[i, 0, :100])
+                assert np.allclose(many[i], expected)
+
+        # a kernel longer than the signal has no valid output
+        for method in ["direct", "fft"]:
+            short = augment.batch_convolve(
+                waveforms[..., :10], kernels[..., :20], mode="valid", method=method
+            )
+            assert short.shape == (3, 2, 0)
+
+        # convolve1d keeps the circular convolution of the kernel rolled by
+        # rotation_index
+        signal, rir = waveforms[0, 0], kernels[0, 0]
+        padded_rir = np.roll(np.pad(rir, (0, len(signal) - len(rir))), -10)
+        circular = np.fft.irfft(
+            np.fft.rfft(signal) * np.fft.rfft(padded_rir), n=len(signal)
+        )
+        assert np.allclose(augment.convolve1d(signal, rir, rotation_index=10), circular)
+
     def test_1d(self):
         samples, _ = io.read(self.data_path)
         # test add noise for 1d
@@ -93,6 +161,33 @@ class TestOperators:
         addrir = augment.add_reverb(samples, self.rir_list, 1.0)
         print(addrir.shape)
 
+    def test_audio_bank(self, tmp_path):
+        import pickle
+
+        from mindaudio.data.audio_bank import NoiseBank, RIRBank
+
+        noises = NoiseBank.build(str(tmp_path / "noise"), self.background_list)
+        assert len(noises) == 2
+        first, _ = io.read(self.background_list[0])
+        assert np.allclose(noises[0], first / np.sqrt(np.mean(first**2)), atol=1e-4)
+        assert len(noises.crop(16000)) == 16000
+        # crops longer than the corpus wrap around
+        assert len(noises.crop(3 * len(noises.data))) == 3 * len(noises.data)
+        # a built bank is reused, and the memory map is reopened after pickling
+        data_file = str(tmp_path / "noise" / "audio.f32")
+        mtime = os.path.getmtime(data_file)
+        NoiseBank.build(str(tmp_path / "noise"), self.background_list)
+        assert os.path.getmtime(data_file) == mtime
+        assert np.array_equal(pickle.loads(pickle.dumps(noises))[1], noises[1])
+
+        rirs = RIRBank.build(str(tmp_path / "rir"), self.rir_list[:2], num_workers=2)
+        rir, _ = io.read(self.rir_list[1])
+        assert np.allclose(rirs[1], rir, atol=1e-6)
+
+        samples = np.random.rand(4, 1, 32000) - 0.5
+        assert augment.add_noise(samples, noises, 3, 30).shape == samples.shape
+        assert augment.add_reverb(samples, rirs).shape == samples.shape
+
     def test_add_babble(self):
         wav_num = 0
         maxlen = 0
@@ -157,6 +252,23 @@ class TestOperators:
         print(signal.shape)
         print(y_fast.shape)
 
+    def test_phase_vocoder(self):
+        from mindaudio.data.augment import _phase_vocoder
+
+        spec = spectrum.stft(np.random.randn(2, 16000)).astype(np.complex128)
+        assert spec.ndim == 3
+        stretched = _phase_vocoder(spec, rate=0.8)
+        assert stretched.shape == spec.shape[:-1] + (
+            len(np.arange(0, spec.shape[-1], 0.8)),
+        )
+        # every item of the batch is stretched as if alone
+        assert np.allclose(_phase_vocoder(spec[1], rate=0.8), stretched[1])
+        # a rate of 1 keeps the magnitudes
+        assert np.allclose(np.abs(_phase_vocoder(spec, rate=1.0)), np.abs(spec))
+        empty = _phase_vocoder(spec[..., :0], rate=0.8)
+        assert empty.shape == spec.shape[:-1] + (0,)
+        assert empty.dtype == spec.dtype
+
     def test_pitch_shift(self):
         signal, _ = io.read(self.background_list[0])
         signal2 = np.random.rand(192, 48000)
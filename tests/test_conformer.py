@@ -0,0 +1,87 @@
+import sys
+
+import mindspore as ms
+import numpy as np
+from mindspore import Tensor
+
+sys.path.append(".")
+
+
+def test_stream_causal_encoder():
+    from mindaudio.models.conformer import ConformerEncoder
+    from mindaudio.utils.mask import subsequent_chunk_mask
+
+    ms.set_seed(0)
+    feats = np.random.RandomState(0).randn(1, 67, 20).astype(np.float32)
+    for pos_enc_layer_type in ["rel_pos", "abs_pos"]:
+        encoder = ConformerEncoder(
+            20,
+            output_size=32,
+            attention_heads=2,
+            linear_units=64,
+            num_blocks=2,
+            dropout_rate=0.0,
+            positional_dropout_rate=0.0,
+            pos_enc_layer_type=pos_enc_layer_type,
+            feature_norm=False,
+            cnn_module_kernel=15,
+            causal=True,
+        )
+        encoder.set_train(False)
+        streamed, _ = encoder.forward_chunk_by_chunk(Tensor(feats), 4)
+
+        # streaming a causal encoder is the full forward pass with chunk masks
+        num_frames = streamed.shape[1]
+        chunk_masks = subsequent_chunk_mask(num_frames, 4)[None].astype(np.float32)
+        full, _ = encoder(
+            Tensor(feats),
+            ms.ops.ones((1, 1, num_frames), ms.float32),
+            Tensor(chunk_masks),
+        )
+        assert np.allclose(full.asnumpy(), streamed.asnumpy(), atol=1e-5)
+
+
+def test_decoder_one_step():
+    from mindaudio.models.conformer import TransformerDecoder
+    from mindaudio.utils.mask import subsequent_mask
+
+    ms.set_seed(0)
+    rng = np.random.RandomState(0)
+    decoder = TransformerDecoder(
+        12,
+        16,
+        attention_heads=2,
+        linear_units=32,
+        num_blocks=2,
+        dropout_rate=0.0,
+        positional_dropout_rate=0.0,
+    )
+    decoder.set_train(False)
+    # the hypotheses of a beam search share the memory of one utterance
+    beam, steps = 4, 5
+    memory = np.tile(rng.randn(1, 7, 16).astype(np.float32), (beam, 1, 1))
+    memory_mask = np.ones((beam, 1, 7), np.float32)
+    memory_mask[..., 5:] = 0
+    memory, memory_mask = Tensor(memory), Tensor(memory_mask)
+
+    hyps = rng.randint(1, 12, (beam, 1))
+    logps = np.zeros((beam, 0, 12), np.float32)
+    cache, memory_cache = None, None
+    for _ in range(steps):
+        logp, cache, memory_cache = decoder.forward_one_step(
+            memory, memory_mask, Tensor(hyps[:, -1:], ms.int32), cache, memory_cache
+        )
+        logps = np.concatenate([logps, logp.asnumpy()[:, None]], axis=1)
+        # the hypotheses continue from random rows, as after a beam prune
+        index = rng.randint(0, beam, beam)
+        cache = decoder.reorder_cache(cache, Tensor(index.astype(np.int32)))
+        hyps = np.concatenate([hyps[index], rng.randint(1, 12, (beam, 1))], axis=1)
+        logps = logps[index]
+
+    # the full forward pass on the final hypotheses gives the same steps
+    ys_masks = np.tile(subsequent_mask(steps)[None], (beam, 1, 1)).astype(np.float32)
+    logits, _ = decoder(
+        memory, memory_mask, Tensor(hyps[:, :-1], ms.int32), Tensor(ys_masks)
+    )
+    expected = ms.ops.log_softmax(logits, -1).asnumpy()
+    assert np.allclose(logps, expected, atol=1e-5)
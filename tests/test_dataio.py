@@ -53,6 +53,198 @@ def test_read_write():
     assert sr_fromtest == sr
 
 
+def test_read_mmap():
+    from mindaudio.data.io import read
+
+    data_dir = os.path.join(os.path.dirname(scipy.io.__file__), "tests", "data")
+    wav_fname = os.path.join(data_dir, "test-44100Hz-le-1ch-4bytes.wav")
+    y, sr = read(wav_fname)
+
+    native, sr_native = read(wav_fname, mmap=True)
+    assert isinstance(native, np.memmap)
+    assert native.dtype == np.int32
+    assert sr_native == sr
+
+    lazy, _ = read(wav_fname, mmap=True, dtype="float32")
+    crop = lazy[100:200]
+    assert crop.dtype == np.float32
+    assert np.allclose(crop, y[100:200])
+
+    clip, _ = read(wav_fname, offset=0.01, duration=0.02, mmap=True)
+    assert clip.shape[0] == int(0.02 * sr)
+    assert np.array_equal(clip, native[int(0.01 * sr) : int(0.03 * sr)])
+
+
+def test_info(tmp_path):
+    from mindaudio.data.io import InfoIndex, info, read
+
+    data_dir = os.path.join(os.path.dirname(scipy.io.__file__), "tests", "data")
+    wav_fname = os.path.join(data_dir, "test-44100Hz-2ch-32bit-float-be.wav")
+    y, sr = read(wav_fname)
+
+    meta = info(wav_fname)
+    assert meta.samplerate == sr
+    assert meta.channels == y.shape[1]
+    assert meta.bit_depth == 32
+    assert meta.frames == y.shape[0]
+
+    index_file = str(tmp_path / "info_index.pkl")
+    with InfoIndex(index_file) as index:
+        assert index.info(wav_fname) == meta
+    reloaded = InfoIndex(index_file)
+    assert len(reloaded) == 1
+    assert reloaded.info(wav_fname) == meta
+    assert not reloaded.dirty
+
+
+def test_stream_blocks(tmp_path):
+    from mindaudio.data.io import iter_blocks, open_write, read
+
+    data = np.random.RandomState(0).randint(-32768, 32767, (1050, 2)).astype(np.int16)
+    wav_fname = str(tmp_path / "stream.wav")
+    with open_write(wav_fname, 16000, channels=2, dtype="int16") as writer:
+        for start in range(0, len(data), 300):
+            writer.write(data[start : start + 300])
+    audio, sr = read(wav_fname, dtype="float32")
+    assert sr == 16000
+    assert np.array_equal(audio, data.astype(np.float32) / 32768)
+
+    # blocks overlap by 100 frames, the last one is shorter
+    blocks = [block.copy() for block in iter_blocks(wav_fname, 400, overlap=100)]
+    assert [len(block) for block in blocks] == [400, 400, 400, 150]
+    for i, block in enumerate(blocks):
+        assert np.array_equal(block, data[i * 300 : i * 300 + 400])
+    # the buffer is reused, blocks must be copied to be kept
+    scaled = [block.copy() for block in iter_blocks(wav_fname, 256, dtype="float32")]
+    assert np.array_equal(np.concatenate(scaled), audio)
+
+
+def _square(items):
+    return [x * x for x in items]
+
+
+def test_map_shards(tmp_path):
+    from mindaudio.data.sharding import map_shards
+
+    shard_dir = str(tmp_path / "shards")
+    shards = map_shards(_square, range(10), shard_dir, num_workers=2, shard_size=3)
+    assert [x for shard in shards for x in shard] == [x * x for x in range(10)]
+    assert len(os.listdir(shard_dir)) == 4
+
+    # Completed shards are loaded, not recomputed, when resuming
+    resumed = map_shards(_square, range(10), shard_dir, num_workers=2, shard_size=3)
+    assert resumed == shards
+    changed = map_shards(_square, range(1, 11), shard_dir, shard_size=3)
+    assert changed[0] == [1, 4, 9]
+
+
+def _random_feature(length):
+    return np.random.RandomState(length).randn(length, 5).astype(np.float32)
+
+
+def test_feature_store(tmp_path, monkeypatch):
+    from mindaudio.data.feature_store import (
+        FeatureStore,
+        FeatureStoreWriter,
+        merge_feature_stores,
+        write_feature_store,
+    )
+
+    items = [("utt{:02d}".format(i), 3 + i) for i in range(10)]
+    store = write_feature_store(
+        str(tmp_path / "a"), items, _random_feature, num_workers=2, shard_size=3
+    )
+    assert len(store) == 10
+    assert np.array_equal(store["utt04"], _random_feature(7))
+    assert np.array_equal(store[0], _random_feature(3))
+    assert "utt10" not in store
+
+    with FeatureStoreWriter(str(tmp_path / "b"), shard_size=2) as writer:
+        for i in range(10, 13):
+            writer.add("utt{:02d}".format(i), _random_feature(3 + i))
+    merged = merge_feature_stores(str(tmp_path / "a"), [str(tmp_path / "b")])
+    assert len(merged) == 13
+    assert np.array_equal(merged["utt12"], _random_feature(15))
+
+    # interrupted after updating the index, before clearing the progress
+    def interrupt(path):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(os, "remove", interrupt)
+    try:
+        write_feature_store(str(tmp_path / "c"), items, _random_feature, shard_size=3)
+    except KeyboardInterrupt:
+        pass
+    monkeypatch.undo()
+    resumed = write_feature_store(
+        str(tmp_path / "c"), items, _random_feature, shard_size=3
+    )
+    assert len(resumed) == 10
+    assert not os.path.exists(str(tmp_path / "c" / ".progress"))
+
+    pairs = list(merged.iterate(readahead=100))
+    assert sorted(key for key, _ in pairs) == merged.keys.tolist()
+    for key, feature in pairs:
+        assert np.array_equal(feature, FeatureStore(str(tmp_path / "a"))[key])
+
+
+def test_bucket_batch_sampler():
+    from mindaudio.data.bucketing import BucketBatchSampler
+
+    rng = np.random.RandomState(0)
+    lengths = np.stack([rng.randint(5, 60, 200), rng.randint(50, 800, 200)], 1)
+    # the 192 bucket holds fewer utterances than its batch size
+    lengths[:10, 1] = 100
+    lengths[10:, 1] = np.maximum(lengths[10:, 1], 200)
+    bucket_lens = [192, 384, 742]
+    sampler = BucketBatchSampler(lengths, bucket_lens, max_batch_frames=35616 // 4)
+    assert sampler.batch_sizes == [46, 23, 12]
+
+    epochs = []
+    for _ in range(2):
+        batches = [sampler.batch(index) for index in sampler]
+        assert len(batches) == len(sampler)
+        for bucket, ids in batches:
+            assert bucket > 0
+            assert len(ids) == sampler.batch_sizes[bucket]
+            assert np.all(lengths[ids, 1] <= sampler.tgt_pads[bucket])
+            assert np.all(lengths[ids, 0] <= sampler.src_pads[bucket])
+            assert sampler.src_pads[bucket] % 8 == 0
+        ids = np.concatenate([ids for _, ids in batches])
+        assert len(np.unique(ids)) == len(ids)
+        assert np.all(lengths[ids, 1] <= 742)
+        epochs.append(ids)
+    assert not np.array_equal(epochs[0], epochs[1])
+
+    # ranks take disjoint batches
+    ranks = [
+        BucketBatchSampler(lengths, bucket_lens, batch_size=8, rank=r, group_size=2)
+        for r in range(2)
+    ]
+    ids = [np.concatenate([s.batch(i)[1] for i in s]) for s in ranks]
+    assert len(ids[0]) == len(ids[1])
+    assert len(np.intersect1d(ids[0], ids[1])) == 0
+
+
+def test_expand_phonemes():
+    from mindaudio.models.fastspeech2.utils import expand_phonemes
+
+    rng = np.random.RandomState(0)
+    phonemes = rng.randint(1, 300, (4, 12))
+    duration = rng.randint(0, 6, (4, 12))
+    duration[1, 8:] = 0
+    duration[2] = 0
+    lengths = duration.sum(1)
+    lengths[3] -= 4
+    expanded = expand_phonemes(phonemes, duration, lengths, 80)
+    assert expanded.shape == (4, 80)
+    for p, d, n, e in zip(phonemes, duration, lengths, expanded):
+        x = np.repeat(p, d)[:n]
+        assert np.array_equal(e[: len(x)], x)
+        assert not e[len(x) :].any()
+
+
 if __name__ == "__main__":
     test_read_2chanel()
     test_read_write()
+    test_read_mmap()
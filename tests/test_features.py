@@ -47,6 +47,34 @@ class TestOperators:
         feats = features.mfcc(inputs)
         print(feats.shape)
 
+    def test_feature_extractor(self):
+        extractor = features.FeatureExtractor(
+            self.sr,
+            window="povey",
+            mel_scale="kaldi",
+            f_min=20,
+            preemphasis=0.97,
+            remove_dc_offset=True,
+        )
+        waveform = self.test_data[:32000]
+        single = extractor(waveform)
+        assert single.shape == (80, 198)
+        assert single.dtype == np.float32
+
+        # rows of a padded batch match the unpadded waveforms
+        batch = np.stack([waveform, np.pad(waveform[:12000], (0, 20000))])
+        feats, feat_lengths = extractor(batch, lengths=[32000, 12000])
+        assert feats.shape == (2, 80, 198)
+        assert feat_lengths.tolist() == [198, 73]
+        assert np.allclose(feats[0], single, atol=1e-4)
+        assert np.allclose(feats[1, :, :73], extractor(waveform[:12000]), atol=1e-4)
+        assert not feats[1, :, 73:].any()
+
+        mfcc = features.FeatureExtractor(self.sr, n_mfcc=13, center=True)
+        logmel = features.FeatureExtractor(self.sr, center=True)(waveform)
+        assert mfcc(waveform).shape == (13, 201)
+        assert np.allclose(mfcc(waveform), mfcc.dct @ logmel, atol=1e-3)
+
     def test_complex_norm(self):
         inputs_arr = spectrum.stft(self.test_data, return_complex=False)
         norm = features.complex_norm(inputs_arr)
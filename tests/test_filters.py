@@ -1,6 +1,8 @@
 import os
 import sys
 
+import numpy as np
+
 sys.path.append(".")
 import mindaudio.data.filters as filters
 import mindaudio.data.io as io
@@ -36,6 +38,17 @@ class TestOperators:
         )
         print(out_waveform)
 
+    def test_mel_filterbank(self):
+        melfb = filters.mel_filterbank(sr=16000, n_fft=512, n_mels=80)
+        assert melfb is filters.mel_filterbank(sr=16000, n_fft=512, n_mels=80)
+        assert np.array_equal(
+            melfb.weights, filters.mel(sr=16000, n_fft=512, n_mels=80)
+        )
+        # small inputs use the dense product, large ones the bands
+        for shape in [(2, 257, 30), (8, 257, 600)]:
+            spec = np.random.rand(*shape)
+            assert np.allclose(melfb(spec), melfb.weights @ spec)
+
 
 if __name__ == "__main__":
     test = TestOperators()
@@ -0,0 +1,39 @@
+import sys
+
+import numpy as np
+from mindspore import Tensor
+
+sys.path.append(".")
+from mindaudio.loss.separation_loss import PITLoss, perms_one_hot
+from mindaudio.metric.snr import pit_si_snr
+
+
+def test_perms_one_hot():
+    perms, one_hot = perms_one_hot(3)
+    assert perms.shape == (6, 3) and one_hot.shape == (9, 6)
+    scores = np.random.randn(9)
+    for p, perm in enumerate(perms):
+        assert np.isclose(scores @ one_hot[:, p], scores[perm * 3 + np.arange(3)].sum())
+
+
+def test_pit_loss():
+    rng = np.random.RandomState(0)
+    lengths = np.array([800, 600, 500], dtype=np.int32)
+    for num_spk in (2, 4):
+        sources = rng.randn(3, num_spk, 800).astype(np.float32)
+        sources *= np.arange(800) < lengths[:, None, None]
+        estimates = sources[:, rng.permutation(num_spk)]
+        estimates = (estimates + 0.5 * rng.randn(*estimates.shape)).astype(np.float32)
+        expected, perm = pit_si_snr(sources, estimates, lengths)
+        reordered = np.take_along_axis(estimates, perm[..., None], axis=1)
+        # all the permutations, then the greedy assignment
+        for max_exhaustive in (num_spk, 1):
+            loss_fn = PITLoss(num_spk, max_exhaustive)
+            loss, max_snr, _, reorder = loss_fn(
+                Tensor(sources), Tensor(estimates), Tensor(lengths)
+            )
+            assert np.allclose(
+                max_snr.asnumpy()[:, 0], expected.mean(axis=1), atol=1e-4
+            )
+            assert np.isclose(loss.asnumpy(), -expected.mean(), atol=1e-4)
+            assert np.array_equal(reorder.asnumpy(), reordered)
@@ -0,0 +1,130 @@
+import importlib
+import sys
+
+import numpy as np
+
+sys.path.append(".")
+import mindaudio.metric as metric
+
+
+def test_wer():
+    assert metric.wer(["who's", "there"], ["who's"]) == 0.5
+    assert metric.wer(["who's", "there"], ["what's", "there"]) == 0.5
+    assert metric.wer(["who's", "there"], ["who's", "over", "there"]) == 0.5
+    assert metric.edit_distance("kitten", "sitting") == 3
+    # empty hypotheses or references are all deletions or all insertions
+    assert metric.edit_distance("abc", "") == 3
+    assert metric.edit_distance("", "abc") == 3
+    assert metric.edit_distance("", "") == 0
+    assert metric.wer(["hello", "world"], []) == 1.0
+
+
+def test_corpus_wer():
+    refs = ["who's there", "hello world", "a b c d"]
+    hyps = ["who's over there", "hello", "a x c d e"]
+    result = metric.corpus_wer(refs, hyps, batch_size=2)
+    assert (result.substitutions, result.deletions, result.insertions) == (1, 1, 2)
+    assert result.num_tokens == 8
+    assert np.isclose(result.error_rate, 4 / 8)
+    assert result.utterances.tolist() == [[0, 0, 1, 2], [0, 1, 0, 2], [1, 0, 1, 4]]
+    cer = metric.corpus_cer(["abc d"], ["abd"])
+    assert np.isclose(cer.error_rate, 0.25)
+    empty = metric.corpus_wer(["hello world"], [""])
+    assert empty.deletions == 2 and empty.error_rate == 1.0
+
+
+def test_edit_ops_bounded_memory(monkeypatch):
+    # the module, shadowed by the wer function in mindaudio.metric
+    wer_module = importlib.import_module("mindaudio.metric.wer")
+
+    rng = np.random.RandomState(0)
+    refs = [rng.randint(0, 5, rng.randint(0, 40)).tolist() for _ in range(50)]
+    hyps = [rng.randint(0, 5, rng.randint(0, 40)).tolist() for _ in range(50)]
+    expected = metric.edit_ops(refs, hyps)
+    # long utterances are scored in smaller batches
+    monkeypatch.setattr(wer_module, "_MAX_DP_CELLS", 2000)
+    assert np.array_equal(metric.edit_ops(refs, hyps, batch_size=32), expected)
+    for r, h, counts in zip(refs, hyps, expected):
+        assert counts.sum() == metric.edit_distance(r, h)
+
+
+def test_eer():
+    scores = np.array([0.9, 0.8, 0.7, 0.4, 0.3, 0.6, 0.2, 0.1])
+    labels = np.array([1, 1, 1, 1, 0, 0, 0, 0])
+    eer, threshold = metric.get_eer_from_scores(scores, labels)
+    assert np.isclose(eer, 0.25)
+    assert 0.4 <= threshold <= 0.6
+    min_dcf, _ = metric.get_min_dcf_from_scores(scores, labels, p_target=0.5)
+    assert np.isclose(min_dcf, 0.25)
+
+    exact = metric.ScoreAccumulator()
+    binned = metric.ScoreAccumulator(num_bins=1000, score_range=(0.0, 1.0))
+    for start in range(0, 8, 3):
+        exact.update(scores[start : start + 3], labels[start : start + 3])
+        binned.update(scores[start : start + 3], labels[start : start + 3])
+    assert np.isclose(exact.eer()[0], eer)
+    assert np.isclose(binned.eer()[0], eer)
+    assert np.isclose(binned.min_dcf(p_target=0.5)[0], min_dcf)
+
+
+def test_cosine_scoring():
+    enrol = {"a": np.array([1.0, 0.0]), "b": np.array([0.0, 2.0])}
+    test = {"x": np.array([3.0, 0.0]), "y": np.array([1.0, 1.0])}
+    trials = [("a", "x"), ("a", "y"), ("b", "y"), ("b", "x")]
+    scores = metric.cosine_scoring(enrol, test, trials)
+    assert np.allclose(scores, [1.0, np.sqrt(0.5), np.sqrt(0.5), 0.0])
+
+    cohort = np.random.randn(50, 2)
+    mean, std = metric.cohort_stats(np.array([[1.0, 0.0]]), cohort, cohort_size=10)
+    snorm = metric.cosine_scoring(enrol, test, trials, cohort, "s-norm", 10)
+    znorm = metric.cosine_scoring(enrol, test, trials, cohort, "z-norm", 10)
+    assert np.isclose(znorm[0], (1.0 - mean[0]) / std[0])
+    assert snorm.shape == (4,)
+
+
+def test_separation_metrics():
+    rng = np.random.RandomState(0)
+    sources = rng.randn(3, 3, 2000)
+    mixture = sources.sum(axis=1)
+    order = [2, 0, 1]
+    estimates = sources[:, order] + 0.3 * rng.randn(3, 3, 2000)
+    lengths = np.array([2000, 1500, 800])
+
+    scores, perm = metric.pit_si_snr(sources, estimates, lengths)
+    assert perm.tolist() == [[1, 2, 0]] * 3
+    for c in range(3):
+        single = metric.cal_SISNR(sources[1, c, :1500], estimates[1, perm[1, c], :1500])
+        assert np.isclose(scores[1, c], single)
+    ordered = metric.si_snr(sources, estimates[:, perm[0]], lengths)
+    assert ordered.shape == (3, 3)
+    assert np.allclose(ordered, scores)
+    full = metric.si_snr(sources[:, 0], estimates[:, 2], [2000] * 3)
+    assert np.allclose(full, metric.si_snr(sources[:, 0], estimates[:, 2]))
+    improvement = metric.si_snri(sources, estimates, mixture, lengths)
+    assert np.allclose(
+        improvement[1].mean(),
+        metric.cal_SISNRi(
+            sources[1, :, :1500], estimates[1, perm[1], :1500], mixture[1, :1500]
+        ),
+    )
+
+    # an estimate filtered by a short filter is mostly explained by the projection
+    filtered = sources + 0.5 * np.roll(sources, 3, axis=-1)
+    filtered[..., :3] = sources[..., :3]
+    sdr, perm = metric.bss_eval_sdr(sources, filtered[:, order], filter_length=8)
+    assert perm.tolist() == [[1, 2, 0]] * 3
+    assert np.all(sdr > 30)
+    sdr, _ = metric.bss_eval_sdr(sources, estimates, lengths, filter_length=32)
+    assert np.all((sdr > 5) & (sdr < 15))
+
+    items = [
+        (sources[i, :, :n], estimates[i, :, :n], mixture[i, :n])
+        for i, n in enumerate(lengths)
+    ]
+    corpus = metric.evaluate_separation(items, num_workers=2, filter_length=32)
+    assert corpus["sdr"].shape == (3, 3)
+    assert np.allclose(corpus["sdr"], sdr)
+    assert np.allclose(corpus["si_snri"], improvement)
+    assert np.allclose(
+        corpus["sdri"], metric.sdri(sources, estimates, mixture, lengths, 32)
+    )
@@ -31,6 +31,22 @@ def test_resample():
     print(y_8k.shape)
 
 
+def test_polyphase_resample():
+    t = np.arange(16000 * 2) / 16000
+    waveform = np.stack([np.sin(2 * np.pi * 440 * t), np.sin(2 * np.pi * 1000 * t)])
+    y = processing.resample(waveform, 16000, 14400, res_type="polyphase")
+    assert y.shape == (2, 28800)
+    t_new = np.arange(28800) / 14400
+    ref = np.stack([np.sin(2 * np.pi * 440 * t_new), np.sin(2 * np.pi * 1000 * t_new)])
+    assert np.allclose(y[:, 100:-100], ref[:, 100:-100], atol=1e-4)
+
+    # streaming gives the same output as the whole signal
+    resampler = processing.Resampler(16000, 14400)
+    blocks = [resampler.process(x) for x in np.array_split(waveform, 5, axis=-1)]
+    blocks.append(resampler.flush())
+    assert np.allclose(np.concatenate(blocks, axis=-1), y)
+
+
 def test_rescale():
     root_path = sys.path[0]
     data_path = os.path.join(root_path, "samples", "ASR", "BAC009S0002W0122.wav")
@@ -148,6 +164,32 @@ def test_overlap_add():
     ma_signal = mindspore.Tensor(np_signal, mindspore.float32)
     overlapped = processing.overlap_and_add(ma_signal, 40)
     print(overlapped)
+    assert np.allclose(overlapped.asnumpy(), np_signal.reshape(3, 120), atol=1e-6)
+
+    overlapped = processing.overlap_and_add(ma_signal, 30).asnumpy()
+    assert overlapped.shape == (3, 100)
+    assert np.allclose(
+        overlapped[:, 30:40], np_signal[:, 0, 30:] + np_signal[:, 1, :10]
+    )
+
+
+def test_separate_in_segments():
+    from mindaudio.utils.separate import separate_in_segments
+
+    rng = np.random.RandomState(0)
+    mixture = rng.randn(20000).astype(np.float32)
+    sources = np.stack([np.maximum(mixture, 0), np.minimum(mixture, 0)])
+
+    def model(windows):
+        # separates exactly, but in a random speaker order in every window
+        windows = windows.asnumpy()
+        estimates = np.stack([np.maximum(windows, 0), np.minimum(windows, 0)], 1)
+        return [e[rng.permutation(2)] for e in estimates]
+
+    separated = separate_in_segments(model, mixture, 4000, 1000, batch_size=3)
+    if separated[0].min() < 0:
+        separated = separated[::-1]
+    assert np.allclose(separated, sources, atol=1e-5)
 
 
 if __name__ == "__main__":
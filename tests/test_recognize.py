@@ -0,0 +1,75 @@
+import sys
+from collections import defaultdict
+
+import numpy as np
+
+sys.path.append(".")
+
+
+def _reference_prefix_beam_search(top_k_logp, top_k_index, beam_size):
+    """Prefix beam search of one utterance, one prefix at a time."""
+    cur_hyps = [(tuple(), (0.0, -np.inf))]
+    for logp, index in zip(top_k_logp, top_k_index):
+        next_hyps = defaultdict(lambda: (-np.inf, -np.inf))
+        for s, ps in zip(index.tolist(), logp.tolist()):
+            for prefix, (pb, pnb) in cur_hyps:
+                last = prefix[-1] if prefix else None
+                if s == 0:
+                    n_pb, n_pnb = next_hyps[prefix]
+                    n_pb = np.logaddexp(n_pb, np.logaddexp(pb, pnb) + ps)
+                    next_hyps[prefix] = (n_pb, n_pnb)
+                elif s == last:
+                    n_pb, n_pnb = next_hyps[prefix]
+                    next_hyps[prefix] = (n_pb, np.logaddexp(n_pnb, pnb + ps))
+                    n_prefix = prefix + (s,)
+                    n_pb, n_pnb = next_hyps[n_prefix]
+                    next_hyps[n_prefix] = (n_pb, np.logaddexp(n_pnb, pb + ps))
+                else:
+                    n_prefix = prefix + (s,)
+                    n_pb, n_pnb = next_hyps[n_prefix]
+                    n_pnb = np.logaddexp(n_pnb, np.logaddexp(pb, pnb) + ps)
+                    next_hyps[n_prefix] = (n_pb, n_pnb)
+        cur_hyps = sorted(
+            next_hyps.items(), key=lambda x: np.logaddexp(*x[1]), reverse=True
+        )[:beam_size]
+    return [(prefix, np.logaddexp(pb, pnb)) for prefix, (pb, pnb) in cur_hyps]
+
+
+def _top_k(logp, k):
+    top_k_index = np.argsort(-logp, axis=-1, kind="stable")[..., :k]
+    return np.take_along_axis(logp, top_k_index, axis=-1), top_k_index
+
+
+def test_ctc_prefix_beam_search_batch():
+    from mindaudio.utils.recognize import ctc_prefix_beam_search_batch
+
+    rng = np.random.RandomState(0)
+    # random posteriors with a few repeated tokens, over padded utterances
+    logp = np.log(rng.dirichlet(np.ones(8) * 0.3, size=(3, 30)))
+    top_k_logp, top_k_index = _top_k(logp, 4)
+    lengths = np.array([30, 17, 5])
+    mask = np.arange(30) < lengths[:, None]
+    hyps = ctc_prefix_beam_search_batch(top_k_logp, top_k_index, mask, 5)
+    assert len(hyps) == 3
+    for b, length in enumerate(lengths):
+        expected = _reference_prefix_beam_search(
+            top_k_logp[b, :length], top_k_index[b, :length], 5
+        )
+        assert [prefix for prefix, _ in hyps[b]] == [p for p, _ in expected]
+        assert np.allclose([score for _, score in hyps[b]], [s for _, s in expected])
+
+    # uniform posteriors tie every prefix with its relabelings, the kept
+    # prefixes may differ from the reference but not their scores
+    logp = np.full((2, 6, 5), np.log(0.2))
+    top_k_logp, top_k_index = _top_k(logp, 5)
+    mask = np.arange(6) < np.array([6, 4])[:, None]
+    hyps = ctc_prefix_beam_search_batch(top_k_logp, top_k_index, mask, 7)
+    for b, length in enumerate([6, 4]):
+        expected = _reference_prefix_beam_search(
+            top_k_logp[b, :length], top_k_index[b, :length], 7
+        )
+        prefixes = [prefix for prefix, _ in hyps[b]]
+        assert len(set(prefixes)) == len(prefixes) == 7
+        assert np.allclose(
+            sorted(score for _, score in hyps[b]), sorted(s for _, s in expected)
+        )
@@ -35,11 +35,37 @@ class TestOperators:
         matrix = spectrum.stft(self.test_data)
         print(matrix.shape)
 
+    def test_stft_engine(self):
+        engine = spectrum.STFT(n_fft=400, hop_length=160)
+        waveforms = np.stack([self.test_data, self.test_data[::-1]])
+        out = np.empty(engine.output_shape(waveforms.shape), dtype=np.complex64)
+        matrix = engine(waveforms, out=out)
+        assert matrix is out
+        single = spectrum.stft(self.test_data, n_fft=400, hop_length=160)
+        assert np.allclose(matrix[0], single, atol=1e-4)
+
     def test_istft(self):
         matrix = spectrum.stft(self.test_data)
         res = spectrum.istft(matrix)
         assert np.allclose(self.test_data[: res.shape[0]], res)
 
+    def test_overlap_add_frames(self):
+        frames = np.random.randn(2, 30, 400)
+        expected = np.zeros((2, 29 * 160 + 400))
+        for i in range(30):
+            expected[:, i * 160 : i * 160 + 400] += frames[:, i]
+        assert np.allclose(spectrum.overlap_add_frames(frames, 160), expected)
+
+        stream = spectrum.StreamingOverlapAdd(400, 160)
+        blocks = [
+            stream(frames[:, :1]),
+            stream(frames[:, 1:12]),
+            stream(frames[:, 12:]),
+        ]
+        streamed = np.concatenate(blocks + [stream.flush()], axis=-1)
+        assert [block.shape[-1] for block in blocks] == [160, 1760, 2880]
+        assert np.allclose(streamed, expected)
+
     def test_compute_amplitude(self):
         waveform, sr = io.read(self.data_path)
         amp_avg = spectrum.compute_amplitude(